@@ -0,0 +1,229 @@
+"""
+Offline batch runner.
+
+Runs a JSONL file of chat completion requests through LLMService in-process
+and appends the results to an output JSONL file in the same format as the
+``/models/{provider}/{model_id}/batch`` endpoint. The output file doubles as
+the checkpoint: on restart, lines that already have a successful result are
+skipped, so an interrupted run resumes without paying for them again.
+
+Usage:
+    llm-batch prompts.jsonl -o results.jsonl --model azure/gpt-4.1-mini --concurrency 32
+"""
+from typing import AsyncGenerator, Dict, List, Optional, Set, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from .config.config import Config
+from .services.batch import iter_lines, prepare_line, run_batch
+from .services.serialization import completion_to_dict
+from .services.circuit_breaker import CircuitOpenError
+from .services.llm_service import LLMService
+from .services.preflight import ContextWindowExceededError
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BOUNDS_MS = [100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, float("inf")]
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def load_checkpoint(output_path: str) -> Set[int]:
+    """
+    Return the input line numbers that already have a successful result.
+
+    A partially written last line (from a crash mid-write) is truncated so
+    appended results start on a fresh line.
+    """
+    done: Set[int] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        valid_bytes = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            valid_bytes += len(raw)
+            try:
+                result = json.loads(raw)
+            except ValueError:
+                continue
+            if result.get("status") == 200 and isinstance(result.get("line"), int):
+                done.add(result["line"])
+        f.truncate(valid_bytes)
+    return done
+
+
+async def read_chunks(path: str) -> AsyncGenerator[bytes, None]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+class Progress:
+    """Counters for the live throughput line and the final latency histogram"""
+
+    def __init__(self, skipped: int):
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.tokens = 0
+        self.histogram = [0] * len(HISTOGRAM_BOUNDS_MS)
+        self.latency_total = 0.0
+        self.started_at = time.perf_counter()
+
+    def record(self, latency: float, tokens: int, ok: bool) -> None:
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.tokens += tokens
+        self.latency_total += latency
+        latency_ms = latency * 1000
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if latency_ms <= bound:
+                self.histogram[index] += 1
+                break
+
+    def status_line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        processed = self.succeeded + self.failed
+        return (
+            f"{processed} done ({self.failed} failed, {self.skipped} resumed) | "
+            f"{processed / elapsed:.1f} req/s | {self.tokens / elapsed:.0f} tokens/s"
+        )
+
+    def histogram_lines(self) -> List[str]:
+        processed = self.succeeded + self.failed
+        if not processed:
+            return ["No requests were run"]
+        lines = [f"Latency (mean {self.latency_total / processed * 1000:.0f} ms):"]
+        peak = max(self.histogram)
+        lower = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.histogram):
+            label = f"{lower:>6}-{bound:<6}" if bound != float("inf") else f"{lower:>6}+      "
+            bar = "#" * round(40 * count / peak) if peak else ""
+            lines.append(f"  {label} ms | {bar:<40} {count} ({100 * count / processed:.1f}%)")
+            lower = bound
+        return lines
+
+
+def parse_provider_limits(values: List[str]) -> Dict[str, int]:
+    limits = {}
+    for value in values:
+        provider_name, _, limit = value.partition("=")
+        if not limit.isdigit():
+            raise argparse.ArgumentTypeError(f"Expected provider=N, got {value}")
+        limits[provider_name] = int(limit)
+    return limits
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="llm-batch", description="Run a JSONL file of chat completion requests")
+    parser.add_argument("input", help="JSONL file, one chat completion request per line")
+    parser.add_argument("-o", "--output", help="Results JSONL, also used to resume (default: <input>.results.jsonl)")
+    parser.add_argument("--model", help="provider/model for every line, overriding the model of each request")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at the same time")
+    parser.add_argument(
+        "--provider-limit", action="append", default=[], metavar="PROVIDER=N",
+        help="Max in-flight calls for a provider, overriding max_concurrency (repeatable)"
+    )
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping finished lines")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+    if args.output is None:
+        root, _ = os.path.splitext(args.input)
+        args.output = root + ".results.jsonl"
+    try:
+        args.provider_limit = parse_provider_limits(args.provider_limit)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if args.provider_limit:
+        unknown = sorted(set(args.provider_limit) - set(Config().providers))
+        if unknown:
+            parser.error(f"Unknown provider in --provider-limit: {', '.join(unknown)}")
+    return args
+
+
+async def run(args: argparse.Namespace, service: Optional[LLMService] = None) -> Progress:
+    owned = service is None
+    if owned:
+        service = LLMService()
+        await service.start()
+    try:
+        return await _run(args, service)
+    finally:
+        if owned:
+            await service.aclose()
+
+
+async def _run(args: argparse.Namespace, service: LLMService) -> Progress:
+    for provider_name, limit in args.provider_limit.items():
+        service.config.get_provider(provider_name).max_concurrency = limit
+
+    if args.no_resume and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output)
+    progress = Progress(skipped=len(done))
+
+    async def pending_lines() -> AsyncGenerator[Tuple[int, bytes], None]:
+        async for number, line in iter_lines(read_chunks(args.input), service.config.batch.max_line_bytes):
+            if number not in done:
+                yield number, line
+
+    async def handle(number: int, line: bytes) -> dict:
+        result, request = prepare_line(number, line, model=args.model)
+        if request is None:
+            progress.failed += 1
+            return result
+        started_at = time.perf_counter()
+        try:
+            completion = await service.create_chat_completion(request)
+        except CircuitOpenError as e:
+            result.update(status=503, error={"message": str(e)})
+        except ContextWindowExceededError as e:
+            result.update(status=400, error={"message": str(e)})
+        except Exception as e:
+            result.update(status=500, error={"message": str(e)})
+        else:
+            result.update(status=200, response=completion_to_dict(completion))
+        latency = time.perf_counter() - started_at
+        result["latency_ms"] = round(latency * 1000, 1)
+        tokens = result["response"]["usage"]["total_tokens"] if result["status"] == 200 else 0
+        progress.record(latency, tokens or 0, ok=result["status"] == 200)
+        return result
+
+    last_report = 0.0
+    with open(args.output, "ab") as out:
+        async for encoded in run_batch(pending_lines(), handle, args.concurrency):
+            out.write(encoded)
+            now = time.perf_counter()
+            if now - last_report >= 1:
+                # Make the checkpoint durable about once a second
+                out.flush()
+                os.fsync(out.fileno())
+                last_report = now
+                print("\r" + progress.status_line(), end="", file=sys.stderr, flush=True)
+    print("\r" + progress.status_line(), file=sys.stderr)
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    try:
+        progress = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print(f"\nInterrupted, rerun the same command to resume from {args.output}", file=sys.stderr)
+        return 130
+    print("\n".join(progress.histogram_lines()), file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
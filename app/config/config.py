@@ -1,45 +1,463 @@
 import os
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+import logging
 import yaml
 from pydantic import BaseModel
 
+# Environment variable holding the API key when a deployment does not name one
+DEFAULT_API_KEY_ENV = {
+    "azure": "AZURE_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "gemini": "GOOGLE_API_KEY",
+}
+
+# Set by the launcher (python -m app.server) for its workers: a directory in shared memory they all use
+STATE_DIR_ENV = "LLM_PROXY_STATE_DIR"
+# Default size bound of the response cache's SQLite tier in that directory; Docker's /dev/shm is 64 MB
+SHARED_DISK_MAX_BYTES = 16 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+# How an oversized conversation is handled by the preflight check
+TRIM_STRATEGIES = ("reject", "drop_oldest", "keep_system")
+
+class Deployment(BaseModel):
+    name: str = "default"
+    api_base: Optional[str] = None
+    api_version: Optional[str] = None
+    api_key_env: Optional[str] = None
+    model: Optional[str] = None  # Upstream model/deployment name if it differs from the model entry
+    weight: float = 1.0
+
 class Model(BaseModel):
     name: str
+    cache_ttl: Optional[int] = None
+    fuzzy_threshold: Optional[float] = None
+    deployments: List[Deployment] = []
+    hedge: Optional[bool] = None  # Overrides hedging.enabled for this model
+    fallbacks: List[str] = []  # "provider/model" entries tried in order when this model fails
+    context_length: Optional[int] = None  # Prompt plus completion tokens; no preflight check if unset
+    tokenizer: str = "approx"  # tiktoken encoding name, or "approx" for 4 characters per token
+    trim_strategy: Optional[str] = None  # Overrides preflight.strategy for this model
+
+class FuzzyCacheSettings(BaseModel):
+    enabled: bool = False
+    threshold: float = 0.9
+    num_perm: int = 64
+    bands: int = 8
+    max_entries: int = 10000
+    max_memory_bytes: int = 32 * 1024 * 1024
+
+class CacheSettings(BaseModel):
+    enabled: bool = False
+    deterministic_only: bool = True
+    default_ttl: int = 3600
+    max_memory_bytes: int = 64 * 1024 * 1024
+    disk_path: Optional[str] = None
+    disk_max_bytes: Optional[int] = None  # Size bound of the SQLite tier, enforced on every write
+    fuzzy: FuzzyCacheSettings = FuzzyCacheSettings()
+
+class CoalescingSettings(BaseModel):
+    enabled: bool = True
+    deterministic_only: bool = True
+    max_buffered_chunks: int = 32  # How far a shared stream may run ahead of its slowest client
+
+class LoadBalancingSettings(BaseModel):
+    strategy: str = "least_outstanding"  # or "ewma"
+    ewma_decay: float = 0.3
+    error_penalty_seconds: float = 5.0
+
+class CircuitBreakerSettings(BaseModel):
+    enabled: bool = True
+    window_size: int = 20  # Recent calls considered per deployment
+    min_calls: int = 10  # Calls needed before the circuit can open
+    error_rate_threshold: float = 0.5
+    slow_call_ms: int = 30000
+    slow_call_rate_threshold: float = 0.8
+    open_seconds: float = 30
+    half_open_max_calls: int = 1  # Probe calls let through after open_seconds
+    state_path: Optional[str] = None  # SQLite file where workers share open circuits; per worker if unset
+    sync_seconds: float = 1.0  # How often open circuits are exchanged with the other workers
+
+class RetrySettings(BaseModel):
+    max_retries: int = 2
+    backoff_base_ms: int = 100
+    backoff_max_ms: int = 2000
+    budget_ratio: float = 0.1  # Retries allowed per request
+    budget_burst: int = 10  # Retries allowed in a burst
+
+class Quota(BaseModel):
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+
+class RateLimitSettings(BaseModel):
+    enabled: bool = False
+    state_path: Optional[str] = None  # SQLite file shared by workers; in-process buckets if unset
+    default_completion_tokens: int = 256  # Completion estimate for requests without max_tokens
+    default: Quota = Quota()
+    tenants: Dict[str, Quota] = {}  # Keyed by the token's sub (or azp) claim
+
+class BatchSettings(BaseModel):
+    max_concurrency: int = 32  # Lines of one batch run at the same time
+    max_line_bytes: int = 1024 * 1024
+
+class PreflightSettings(BaseModel):
+    enabled: bool = True
+    strategy: str = "reject"  # "reject", "drop_oldest" or "keep_system"
+    min_completion_tokens: int = 256  # Room always left for the completion
+    cache_entries: int = 16384  # Memoized token counts of message contents
+
+class HedgingSettings(BaseModel):
+    enabled: bool = False
+    percentile: float = 0.95  # Hedge once the primary call is slower than this latency percentile
+    min_samples: int = 20  # Samples needed before the percentile is used
+    initial_delay_ms: int = 2000  # Hedge delay until enough samples are collected
+    min_delay_ms: int = 50
+    max_extra_ratio: float = 0.05  # Hedged calls allowed per primary call
+    max_burst: float = 10  # Hedged calls allowed in a burst
+
+class HttpPoolSettings(BaseModel):
+    enabled: bool = True  # Share pooled connections between upstream calls; litellm's own clients if off
+    http2: bool = True  # Used when the h2 package is installed
+    max_connections: int = 100  # Per upstream origin
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 120
+    connect_timeout: float = 5
+    read_timeout: float = 600
+    dns_ttl: float = 300  # Seconds resolved addresses are reused
+    prewarm: bool = True  # Connect to every deployment endpoint at startup
+    prewarm_connections: int = 2  # Per endpoint over HTTP/1.1; HTTP/2 needs one
+
+class LoggingSettings(BaseModel):
+    level: str = "INFO"
+    format: str = "json"  # One JSON object per line, or "text"
+    queue_size: int = 10000  # Records waiting to be written; new records are dropped beyond this
+    access_log: bool = True  # One summary line per request instead of the server's access log
+    sample_rates: Dict[str, float] = {}  # Share of INFO and DEBUG records kept, per logger name prefix
+
+class MetricsSettings(BaseModel):
+    # Directory shared by the workers of one server so /metrics covers all of them; None for a single process
+    multiprocess_dir: Optional[str] = None
+    flush_seconds: float = 1.0  # How often each worker writes its metrics for the others
+
+class ServerSettings(BaseModel):
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1  # 0 for one per CPU of the container quota, at most 8
+    state_dir: Optional[str] = None  # Where the workers' shared state directory is created; /dev/shm if unset
+
+class ReloadSettings(BaseModel):
+    watch: bool = True  # Reload the routing table when the config file changes
+    poll_seconds: float = 2.0
 
 class Provider(BaseModel):
     api_base: str
     api_version: Optional[str] = None
+    api_key_env: Optional[str] = None
+    max_concurrency: Optional[int] = None
     models: List[Model]
 
+# Top-level sections other than providers; they are read once at startup
+SETTINGS_SECTIONS = (
+    "cache", "coalescing", "load_balancing", "hedging", "circuit_breaker",
+    "retries", "rate_limits", "batch", "preflight", "http_pool", "reload", "logging", "metrics", "server"
+)
+
+# Stands for every model a provider serves that is not listed in the config
+UNLISTED_MODEL = "*"
+
+class RoutingTable:
+    """
+    Snapshot of the providers and models of one version of the config file.
+
+    Everything a request needs is resolved when the table is built: models are
+    indexed by (provider, model), deployments inherit their provider settings,
+    and the params passed upstream for each deployment (upstream model name,
+    endpoint and API key) are precomputed. Building a table validates it; a
+    reload builds a new table and swaps it in rather than editing the current one.
+
+    Models that are not listed share one deployment per provider, under the
+    ``provider/*`` scope, so client-chosen model names never add entries.
+    API keys are read from the environment of the process, which a reload
+    does not change.
+    """
+
+    def __init__(self, providers: Dict[str, Provider]):
+        self.providers = providers
+        self.models: Dict[Tuple[str, str], Model] = {}
+        self.deployments: Dict[Tuple[str, str], List[Deployment]] = {}
+        self.fallbacks: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        self.upstream_params: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for provider_name, provider in providers.items():
+            for model in provider.models:
+                key = (provider_name, model.name)
+                if key in self.models:
+                    raise ValueError(f"Duplicate model {provider_name}/{model.name}")
+                # Deployments are keyed provider/model/deployment in the balancer, breakers and metrics
+                names = [deployment.name for deployment in model.deployments]
+                for name in names:
+                    if names.count(name) > 1:
+                        raise ValueError(f"Duplicate deployment {name} of {provider_name}/{model.name}")
+                if model.trim_strategy is not None and model.trim_strategy not in TRIM_STRATEGIES:
+                    raise ValueError(f"Unknown trim_strategy {model.trim_strategy} for {provider_name}/{model.name}")
+                for fallback in model.fallbacks:
+                    fallback_provider = fallback.split("/", 1)[0]
+                    if "/" not in fallback or fallback_provider not in providers:
+                        raise ValueError(f"Invalid fallback {fallback} for {provider_name}/{model.name}")
+                self.models[key] = model
+                self.fallbacks[key] = [tuple(fallback.split("/", 1)) for fallback in model.fallbacks]
+                self._resolve(provider_name, model.name, model.deployments)
+            self._resolve(provider_name, UNLISTED_MODEL, [])
+
+    def _resolve(self, provider_name: str, model_name: str, deployments: List[Deployment]) -> List[Deployment]:
+        provider = self.providers[provider_name]
+        resolved = []
+        for deployment in deployments or [Deployment()]:
+            deployment = Deployment(
+                name=deployment.name,
+                api_base=deployment.api_base or provider.api_base,
+                api_version=deployment.api_version or provider.api_version,
+                api_key_env=deployment.api_key_env or provider.api_key_env or DEFAULT_API_KEY_ENV.get(provider_name),
+                model=deployment.model or model_name,
+                weight=deployment.weight
+            )
+            params = {"model": provider_name + "/" + deployment.model, "api_base": deployment.api_base}
+            if deployment.api_version:
+                params["api_version"] = deployment.api_version
+            if deployment.api_key_env:
+                params["api_key"] = os.getenv(deployment.api_key_env)
+            self.upstream_params[(provider_name, model_name, deployment.name)] = params
+            resolved.append(deployment)
+        self.deployments[(provider_name, model_name)] = resolved
+        return resolved
+
+    def get_deployments(self, provider_name: str, model_name: str) -> List[Deployment]:
+        resolved = self.deployments.get((provider_name, model_name))
+        if resolved is None:
+            resolved = self.deployments[(provider_name, UNLISTED_MODEL)]
+        return resolved
+
+    def scope(self, provider_name: str, model_name: str) -> str:
+        """Key of the model's deployments in the load balancer, latency trackers and metrics"""
+        if (provider_name, model_name) not in self.models:
+            model_name = UNLISTED_MODEL
+        return provider_name + "/" + model_name
+
+    def get_upstream_params(self, provider_name: str, model_name: str, deployment_name: str) -> Dict[str, Any]:
+        params = self.upstream_params.get((provider_name, model_name, deployment_name))
+        if params is None:
+            # Built per request for unlisted models
+            params = dict(self.upstream_params[(provider_name, UNLISTED_MODEL, deployment_name)])
+            params["model"] = provider_name + "/" + model_name
+        return params
+
+
 class Config:
     def __init__(self):
         self.config_path = os.getenv("CONFIG_PATH", "app/config/config.yaml")
-        self.providers: Dict[str, Provider] = {}
+        self.routes: Optional[RoutingTable] = None
+        self.cache = CacheSettings()
+        self.coalescing = CoalescingSettings()
+        self.load_balancing = LoadBalancingSettings()
+        self.hedging = HedgingSettings()
+        self.circuit_breaker = CircuitBreakerSettings()
+        self.retries = RetrySettings()
+        self.rate_limits = RateLimitSettings()
+        self.batch = BatchSettings()
+        self.preflight = PreflightSettings()
+        self.http_pool = HttpPoolSettings()
+        self.reload_settings = ReloadSettings()
+        self.logging = LoggingSettings()
+        self.metrics = MetricsSettings()
+        self.server = ServerSettings()
+        self.state_dir: Optional[str] = None
+        self.loaded_mtime: Optional[float] = None
+        # A file that failed to reload is reported once, not on every poll
+        self._failed_mtime: Optional[float] = None
+        self._settings_data: Dict[str, Any] = {}
+        # Changed sections already reported as pending a restart, with the reported value
+        self._warned_settings: Dict[str, Any] = {}
         self.load_config()
 
+    @property
+    def providers(self) -> Dict[str, Provider]:
+        return self.routes.providers
+
+    def _read(self) -> Tuple[Dict[str, Any], float]:
+        mtime = os.stat(self.config_path).st_mtime
+        with open(self.config_path, 'r') as f:
+            return yaml.safe_load(f) or {}, mtime
+
+    def _build_routes(self, config_data: Dict[str, Any]) -> RoutingTable:
+        providers = {
+            provider_name: Provider(**provider_data)
+            for provider_name, provider_data in (config_data.get('providers') or {}).items()
+        }
+        return RoutingTable(providers)
+
     def load_config(self):
         try:
-            with open(self.config_path, 'r') as f:
-                config_data = yaml.safe_load(f)
-                for provider_name, provider_data in config_data.get('providers', {}).items():
-                    self.providers[provider_name] = Provider(**provider_data)
+            config_data, mtime = self._read()
+            self.cache = CacheSettings(**(config_data.get('cache') or {}))
+            self.coalescing = CoalescingSettings(**(config_data.get('coalescing') or {}))
+            self.load_balancing = LoadBalancingSettings(**(config_data.get('load_balancing') or {}))
+            self.hedging = HedgingSettings(**(config_data.get('hedging') or {}))
+            self.circuit_breaker = CircuitBreakerSettings(**(config_data.get('circuit_breaker') or {}))
+            self.retries = RetrySettings(**(config_data.get('retries') or {}))
+            self.rate_limits = RateLimitSettings(**(config_data.get('rate_limits') or {}))
+            self.batch = BatchSettings(**(config_data.get('batch') or {}))
+            self.preflight = PreflightSettings(**(config_data.get('preflight') or {}))
+            self.http_pool = HttpPoolSettings(**(config_data.get('http_pool') or {}))
+            self.reload_settings = ReloadSettings(**(config_data.get('reload') or {}))
+            self.logging = LoggingSettings(**(config_data.get('logging') or {}))
+            self.metrics = MetricsSettings(**(config_data.get('metrics') or {}))
+            self.server = ServerSettings(**(config_data.get('server') or {}))
+            self._use_shared_state(os.getenv(STATE_DIR_ENV))
+            if self.preflight.strategy not in TRIM_STRATEGIES:
+                raise ValueError(f"Unknown preflight strategy: {self.preflight.strategy}")
+            self.routes = self._build_routes(config_data)
+            self._settings_data = {section: config_data.get(section) for section in SETTINGS_SECTIONS}
+            self.loaded_mtime = mtime
         except Exception as e:
             raise Exception(f"Failed to load configuration: {str(e)}")
 
+    def _use_shared_state(self, state_dir: Optional[str]) -> None:
+        """
+        Keep the state of a multi-worker server in the directory its workers share.
+
+        Only state whose location is not configured moves there: the response
+        cache's SQLite tier (bounded by SHARED_DISK_MAX_BYTES unless configured),
+        the rate limit buckets, open circuits and metrics snapshots.
+        """
+        self.state_dir = state_dir or None
+        if not self.state_dir:
+            return
+        if self.cache.disk_path is None:
+            self.cache.disk_path = os.path.join(state_dir, "responses.sqlite")
+            if self.cache.disk_max_bytes is None:
+                self.cache.disk_max_bytes = SHARED_DISK_MAX_BYTES
+        if self.rate_limits.state_path is None:
+            self.rate_limits.state_path = os.path.join(state_dir, "ratelimits.sqlite")
+        if self.circuit_breaker.state_path is None:
+            self.circuit_breaker.state_path = os.path.join(state_dir, "circuits.sqlite")
+        if self.metrics.multiprocess_dir is None:
+            self.metrics.multiprocess_dir = os.path.join(state_dir, "metrics")
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_path).st_mtime
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        """Whether the config file was modified since it was last loaded or failed to reload"""
+        mtime = self._mtime()
+        return mtime is not None and mtime != self.loaded_mtime and mtime != self._failed_mtime
+
+    def reload(self) -> bool:
+        """
+        Re-read the config file and swap in a new routing table.
+
+        The new table is fully built and validated before it replaces the
+        current one with a single assignment, so requests in flight keep the
+        table they started with and never see a partial update. An invalid file
+        is logged and leaves the current table in place. Only providers and
+        models are reloaded; the other sections take effect on restart, which
+        is logged once per change.
+        """
+        mtime = None
+        try:
+            config_data, mtime = self._read()
+            routes = self._build_routes(config_data)
+        except Exception as e:
+            self._failed_mtime = mtime if mtime is not None else self._mtime()
+            logger.error(f"Config reload from {self.config_path} failed, keeping the current routes: {str(e)}")
+            return False
+        self.routes = routes
+        self.loaded_mtime = mtime
+        pending = {
+            section: config_data.get(section) for section in SETTINGS_SECTIONS
+            if config_data.get(section) != self._settings_data.get(section)
+        }
+        changed_sections = [
+            section for section, data in pending.items()
+            if section not in self._warned_settings or self._warned_settings[section] != data
+        ]
+        self._warned_settings = pending
+        if changed_sections:
+            logger.warning(f"Config sections {', '.join(changed_sections)} changed; they take effect on restart")
+        logger.info(f"Reloaded routes from {self.config_path}: {len(routes.models)} models")
+        return True
+
     def get_provider(self, provider_name: str) -> Provider:
-        if provider_name not in self.providers:
+        provider = self.routes.providers.get(provider_name)
+        if provider is None:
             raise ValueError(f"Provider {provider_name} is not supported")
-        return self.providers[provider_name]
+        return provider
 
     def get_model(self, provider_name: str, model_name: str) -> Model:
-        provider = self.get_provider(provider_name)
-        for model in provider.models:
-            if model.name == model_name:
-                return model
-        raise ValueError(f"Model {model_name} is not supported by provider {provider_name}")
+        routes = self.routes
+        model = routes.models.get((provider_name, model_name))
+        if model is None:
+            if provider_name not in routes.providers:
+                raise ValueError(f"Provider {provider_name} is not supported")
+            raise ValueError(f"Model {model_name} is not supported by provider {provider_name}")
+        return model
+
+    def get_deployments(self, provider_name: str, model_name: str) -> List[Deployment]:
+        """
+        Resolve the deployments serving a model.
+
+        Fields a deployment leaves unset are inherited from the provider. Models
+        without a deployments list (or not listed at all) get one deployment
+        built from the provider settings.
+        """
+        self.get_provider(provider_name)
+        return self.routes.get_deployments(provider_name, model_name)
+
+    def get_upstream_params(self, provider_name: str, model_name: str, deployment_name: str) -> Dict[str, Any]:
+        """Upstream model name, endpoint and API key of a deployment; the dict is shared, copy before changing it"""
+        return self.routes.get_upstream_params(provider_name, model_name, deployment_name)
+
+    def get_scope(self, provider_name: str, model_name: str) -> str:
+        """``provider/model`` for listed models, ``provider/*`` for the others"""
+        return self.routes.scope(provider_name, model_name)
+
+    def get_fallbacks(self, provider_name: str, model_name: str) -> List[Tuple[str, str]]:
+        """(provider, model) pairs to try, in order, when the model fails"""
+        return self.routes.fallbacks.get((provider_name, model_name), [])
+
+    def is_hedged(self, provider_name: str, model_name: str) -> bool:
+        model = self._find_model(provider_name, model_name)
+        if model is None or model.hedge is None:
+            return self.hedging.enabled
+        return model.hedge
+
+    def get_context_window(self, provider_name: str, model_name: str) -> Optional[Tuple[int, str, str]]:
+        """(context length, tokenizer, trim strategy) of the model, or None if it has no context length"""
+        model = self._find_model(provider_name, model_name)
+        if model is None or model.context_length is None:
+            return None
+        return model.context_length, model.tokenizer, model.trim_strategy or self.preflight.strategy
+
+    def get_cache_ttl(self, provider_name: str, model_name: str) -> int:
+        model = self._find_model(provider_name, model_name)
+        if model is None or model.cache_ttl is None:
+            return self.cache.default_ttl
+        return model.cache_ttl
+
+    def get_fuzzy_threshold(self, provider_name: str, model_name: str) -> float:
+        model = self._find_model(provider_name, model_name)
+        if model is None or model.fuzzy_threshold is None:
+            return self.cache.fuzzy.threshold
+        return model.fuzzy_threshold
+
+    def _find_model(self, provider_name: str, model_name: str) -> Optional[Model]:
+        return self.routes.models.get((provider_name, model_name))
 
     def get_supported_models(self) -> Dict[str, List[str]]:
         return {
             provider_name: [model.name for model in provider.models]
-            for provider_name, provider in self.providers.items()
-        } 
\ No newline at end of file
+            for provider_name, provider in self.routes.providers.items()
+        }
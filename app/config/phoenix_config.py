@@ -1,17 +1,92 @@
+import logging
 import os
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 class PhoenixConfig:
     PHOENIX_API_KEY: Optional[str] = os.getenv("PHOENIX_API_KEY")
     PHOENIX_PROJECT_NAME: str = os.getenv("PHOENIX_PROJECT_NAME", "llm-proxy-service")
     PHOENIX_COLLECTOR_ENDPOINT: str = os.getenv(
-        "PHOENIX_COLLECTOR_ENDPOINT", 
+        "PHOENIX_COLLECTOR_ENDPOINT",
         "http://localhost:6006"  # Default to local Phoenix instance
     )
+    # "http/protobuf" or "grpc"
+    PHOENIX_PROTOCOL: str = os.getenv("PHOENIX_PROTOCOL", "http/protobuf")
+    # "background" sets tracing up after startup, "startup" before serving, "off" disables it
+    PHOENIX_TRACING: str = os.getenv("PHOENIX_TRACING", "background")
+
+    # Share of requests traced at all; the rest cost nothing but are never seen
+    PHOENIX_HEAD_SAMPLE_RATE: float = float(os.getenv("PHOENIX_HEAD_SAMPLE_RATE", "1.0"))
+    # Share of traced requests exported; failed and slow requests are always exported
+    PHOENIX_TAIL_SAMPLE_RATE: float = float(os.getenv("PHOENIX_TAIL_SAMPLE_RATE", "1.0"))
+    PHOENIX_SLOW_REQUEST_MS: float = float(os.getenv("PHOENIX_SLOW_REQUEST_MS", "5000"))
+
+    # Spans are exported in batches from a background thread; a full queue drops spans
+    PHOENIX_EXPORT_QUEUE_SIZE: int = int(os.getenv("PHOENIX_EXPORT_QUEUE_SIZE", "2048"))
+    PHOENIX_EXPORT_BATCH_SIZE: int = int(os.getenv("PHOENIX_EXPORT_BATCH_SIZE", "512"))
+    PHOENIX_EXPORT_DELAY_MS: float = float(os.getenv("PHOENIX_EXPORT_DELAY_MS", "1000"))
+
+    # Longest string kept in a span attribute such as a prompt or completion
+    PHOENIX_MAX_ATTRIBUTE_LENGTH: int = int(os.getenv("PHOENIX_MAX_ATTRIBUTE_LENGTH", "4096"))
+    # Leave prompts and completions out of spans entirely
+    PHOENIX_HIDE_PAYLOADS: bool = os.getenv("PHOENIX_HIDE_PAYLOADS", "false").lower() == "true"
 
     @classmethod
     def setup_environment(cls):
         """Set up Phoenix environment variables"""
         if cls.PHOENIX_API_KEY:
             os.environ["PHOENIX_CLIENT_HEADERS"] = f"api_key={cls.PHOENIX_API_KEY}"
-        os.environ["PHOENIX_COLLECTOR_ENDPOINT"] = cls.PHOENIX_COLLECTOR_ENDPOINT 
\ No newline at end of file
+        os.environ["PHOENIX_COLLECTOR_ENDPOINT"] = cls.PHOENIX_COLLECTOR_ENDPOINT
+        if cls.PHOENIX_HIDE_PAYLOADS:
+            # Read by the OpenInference instrumentors
+            os.environ.setdefault("OPENINFERENCE_HIDE_INPUTS", "true")
+            os.environ.setdefault("OPENINFERENCE_HIDE_OUTPUTS", "true")
+
+    @classmethod
+    def span_processor(cls, exporter):
+        """Batched export of ``exporter``, behind tail sampling unless every trace is kept"""
+        from ..services.tracing import BatchExportProcessor, TailSamplingProcessor
+
+        processor = BatchExportProcessor(
+            exporter,
+            max_queue_size=cls.PHOENIX_EXPORT_QUEUE_SIZE,
+            max_batch_size=cls.PHOENIX_EXPORT_BATCH_SIZE,
+            schedule_delay=cls.PHOENIX_EXPORT_DELAY_MS / 1000
+        )
+        if cls.PHOENIX_TAIL_SAMPLE_RATE >= 1:
+            return processor
+        return TailSamplingProcessor(processor, cls.PHOENIX_TAIL_SAMPLE_RATE, cls.PHOENIX_SLOW_REQUEST_MS / 1000)
+
+    @classmethod
+    def setup_tracing(cls):
+        """
+        Register the Phoenix tracer provider and auto-instrument installed libraries.
+
+        Returns the tracer provider and its span processor.
+        """
+        # Imported here: Phoenix, OpenTelemetry and the instrumented libraries are slow to load
+        from opentelemetry.sdk.trace import SpanLimits
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        from phoenix.otel import GRPCSpanExporter, HTTPSpanExporter, register
+
+        cls.setup_environment()
+        # Truncating payloads is intended; OpenTelemetry would log a warning for each one
+        logging.getLogger("opentelemetry.attributes").setLevel(logging.ERROR)
+        tracer_provider = register(
+            project_name=cls.PHOENIX_PROJECT_NAME,
+            protocol=cls.PHOENIX_PROTOCOL,
+            auto_instrument=True,  # Auto-instrument based on installed OI dependencies
+            verbose=False,
+            sampler=ParentBased(TraceIdRatioBased(cls.PHOENIX_HEAD_SAMPLE_RATE)),
+            span_limits=SpanLimits(max_span_attribute_length=cls.PHOENIX_MAX_ATTRIBUTE_LENGTH)
+        )
+        exporter = GRPCSpanExporter() if cls.PHOENIX_PROTOCOL == "grpc" else HTTPSpanExporter()
+        span_processor = cls.span_processor(exporter)
+        # Replaces the default processor, which exports each span on the request path
+        tracer_provider.add_span_processor(span_processor)
+        logger.info(
+            f"Phoenix tracing to {cls.PHOENIX_COLLECTOR_ENDPOINT}: head sample {cls.PHOENIX_HEAD_SAMPLE_RATE}, "
+            f"tail sample {cls.PHOENIX_TAIL_SAMPLE_RATE}"
+        )
+        return tracer_provider, span_processor
@@ -0,0 +1,77 @@
+from typing import Any, Dict, Optional, Set
+import asyncio
+import logging
+import signal
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigReloader:
+    """
+    Reload the routing table when the config file changes or on SIGHUP.
+
+    The file is parsed and validated in a worker thread so a reload never
+    blocks the event loop; the new table is swapped in by ``Config.reload``.
+    Reloads are serialized so a burst of signals or edits applies in order.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.reloads = 0
+        self.failures = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Future] = set()
+        self._signal_installed = False
+
+    async def reload(self) -> bool:
+        async with self._lock:
+            ok = await asyncio.to_thread(self.config.reload)
+        if ok:
+            self.reloads += 1
+        else:
+            self.failures += 1
+        return ok
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.reload_settings.poll_seconds)
+            try:
+                if self.config.changed():
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"Config watch failed: {str(e)}")
+
+    def _on_signal(self) -> None:
+        # Keep a reference so the reload task is not garbage collected while it runs
+        task = asyncio.ensure_future(self.reload())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"reloads": self.reloads, "failures": self.failures, "models": len(self.config.routes.models)}
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGHUP"):
+            try:
+                loop.add_signal_handler(signal.SIGHUP, self._on_signal)
+                self._signal_installed = True
+            except (NotImplementedError, RuntimeError):
+                # Not supported by this event loop, or not running in the main thread
+                logger.info("SIGHUP config reload is not available")
+        if self.config.reload_settings.watch:
+            self._task = asyncio.ensure_future(self._watch())
+
+    async def stop(self) -> None:
+        if self._signal_installed:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            self._signal_installed = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,35 +1,58 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from dotenv import load_dotenv
-from .routes import router
+from .routes import router, config_reloader, llm_service, auth_service
+from .services.llm_service import load_litellm
+from .middleware.access_log import AccessLogMiddleware
 from .middleware.auth_middleware import AuthMiddleware
 from .middleware.url_rewrite import URLRewriteMiddleware
 from .config.phoenix_config import PhoenixConfig
-from phoenix.otel import register
+from .services.logging_pipeline import LoggingPipeline
+import asyncio
 import logging
-import sys
 
 # Load environment variables
 load_dotenv()
 
-# Configure Phoenix
-PhoenixConfig.setup_environment()
+# Configure logging: records are written to stdout by a background thread
+logging_pipeline = LoggingPipeline(llm_service.config.logging)
+logging_pipeline.install()
 
-# Configure Phoenix tracer
-tracer_provider = register(
-    project_name=PhoenixConfig.PHOENIX_PROJECT_NAME,
-    auto_instrument=True  # Auto-instrument based on installed OI dependencies
-)
+logger = logging.getLogger(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+async def setup_tracing(app: FastAPI):
+    """Configure the Phoenix tracer off the event loop; requests served before it is ready are not traced"""
+    try:
+        # The litellm instrumentor imports litellm; two threads importing it at once can see it half initialized
+        await load_litellm()
+        app.state.tracer_provider, app.state.span_processor = await asyncio.to_thread(PhoenixConfig.setup_tracing)
+    except Exception as e:
+        logger.error(f"Phoenix tracing setup failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tracing = None
+    if PhoenixConfig.PHOENIX_TRACING == "startup":
+        await setup_tracing(app)
+    elif PhoenixConfig.PHOENIX_TRACING == "background":
+        tracing = asyncio.ensure_future(setup_tracing(app))
+    # Pick up model and deployment changes without a restart (API keys are read from the environment at startup)
+    config_reloader.start()
+    # Loads litellm and prewarms upstream connections in the background
+    await llm_service.start()
+    try:
+        yield
+    finally:
+        if tracing is not None and not tracing.done():
+            tracing.cancel()
+        await config_reloader.stop()
+        await llm_service.aclose()
+        tracer_provider = getattr(app.state, "tracer_provider", None)
+        if tracer_provider is not None:
+            # Exports the spans still queued
+            await asyncio.to_thread(tracer_provider.shutdown)
 
 tags_metadata = [
     {
@@ -84,8 +107,10 @@ app = FastAPI(
         "persistAuthorization": True,
         "displayRequestDuration": True,
     },
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    lifespan=lifespan
 )
+app.state.logging_pipeline = logging_pipeline
 
 # CORS configuration
 app.add_middleware(
@@ -97,11 +122,15 @@ app.add_middleware(
 )
 
 # Add authentication middleware
-app.add_middleware(AuthMiddleware)
+app.add_middleware(AuthMiddleware, auth_service=auth_service)
 
 # Add URL rewrite middleware
 app.add_middleware(URLRewriteMiddleware)
 
+# One summary line per request, outermost so it covers the whole stack
+if llm_service.config.logging.access_log:
+    app.add_middleware(AccessLogMiddleware)
+
 # Include routes
 app.include_router(router, prefix="")
 
@@ -140,8 +169,9 @@ def custom_openapi():
     # Add security requirements
     openapi_schema["security"] = [{"BearerAuth": []}]
     
-    # Add examples
-    openapi_schema["components"]["schemas"]["ChatCompletionRequest"]["example"] = {
+    # Add examples; the chat request body schema is inlined in the route (see chat_request_body)
+    chat_request_body = openapi_schema["paths"]["/models/{provider}/{model_id}"]["post"]["requestBody"]
+    chat_request_body["content"]["application/json"]["schema"]["example"] = {
         "model": "gpt-4",
         "messages": [
             {
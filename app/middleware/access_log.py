@@ -0,0 +1,53 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import logging
+import time
+
+logger = logging.getLogger("app.access")
+
+class AccessLogMiddleware:
+    """
+    Raw ASGI middleware that logs one summary line per HTTP request.
+
+    The line is written once the response has been sent and carries the
+    method, path, status, duration and authenticated user as structured
+    fields. Server errors are logged as warnings so sampling never drops them.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status = 500
+        # Shared with inner middleware that copy the scope, so the user set by auth is visible here
+        state = scope.setdefault("state", {})
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            level = logging.WARNING if status >= 500 else logging.INFO
+            if logger.isEnabledFor(level):
+                duration_ms = (time.perf_counter() - started_at) * 1000
+                user = state.get("user")
+                client = scope.get("client")
+                logger.log(
+                    level, "%s %s %d %.1f ms", scope["method"], scope["path"], status, duration_ms,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round(duration_ms, 1),
+                        "client": client[0] if client else None,
+                        "user": user.get("sub") if isinstance(user, dict) else None,
+                    }
+                )
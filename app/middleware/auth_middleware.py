@@ -1,74 +1,82 @@
-from fastapi import Request, HTTPException
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
 from ..services.auth_service import AuthService
-from typing import Callable
 import re
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 import logging
 
 logger = logging.getLogger(__name__)
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.auth_service = AuthService()
-        self.security = HTTPBearer()
-        # List of paths that don't require authentication
-        self.excluded_paths = [
-            r"^/$",  # Root path
-            r"^/docs",
-            r"^/redoc",
-            r"^/openapi.json",
-            r"^/generate-token",
-            r"^/health",
-            r"^/swagger"  # Swagger UI alternative path
-        ]
+# Paths that don't require authentication, matched with a single precompiled pattern
+EXCLUDED_PATHS = re.compile(
+    r"^(?:"
+    r"/$"  # Root path
+    r"|/docs"
+    r"|/redoc"
+    r"|/openapi\.json"
+    r"|/generate-token"
+    r"|/health"
+    r"|/metrics"
+    r"|/swagger"  # Swagger UI alternative path
+    r")"
+)
+
+class AuthMiddleware:
+    """
+    Raw ASGI middleware that verifies the bearer token on protected paths.
+
+    The decoded token payload is stored in the request state and is available
+    to route handlers as ``request.state.user``.
+    """
+
+    def __init__(self, app: ASGIApp, auth_service: Optional[AuthService] = None):
+        self.app = app
+        self.auth_service = auth_service if auth_service is not None else AuthService()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: Callable):
-        logger.info(f"Processing request for path: {request.url.path}")
-        
         # Check if the path is in the excluded list
-        if any(re.match(pattern, request.url.path) for pattern in self.excluded_paths):
-            logger.info(f"Path {request.url.path} is excluded from authentication")
-            return await call_next(request)
+        if EXCLUDED_PATHS.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
 
         # Get the authorization header
-        auth_header = request.headers.get("Authorization")
+        auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                break
+
         if not auth_header:
             logger.error("Authorization header is missing")
-            return JSONResponse(
-                status_code=401,
-                content={"detail": "Authorization header is missing"}
-            )
+            await self._reject("Authorization header is missing", scope, receive, send)
+            return
 
         try:
             # Extract the token
             scheme, token = auth_header.split()
             if scheme.lower() != "bearer":
-                logger.error(f"Invalid authentication scheme: {scheme}")
-                return JSONResponse(
-                    status_code=401,
-                    content={"detail": "Invalid authentication scheme"}
-                )
+                logger.error("Invalid authentication scheme: %s", scheme)
+                await self._reject("Invalid authentication scheme", scope, receive, send)
+                return
 
-            logger.info("Verifying token...")
             # Verify the token
-            payload = self.auth_service.verify_token(token)
-            logger.info(f"Token verified successfully. Payload: {payload}")
-            
-            # Set the user in request state
-            request.state.user = payload
-            logger.info("User payload set in request state")
-            
-            # Continue with the request
-            response = await call_next(request)
-            logger.info("Request processed successfully")
-            return response
-
+            payload = await self.auth_service.verify_token(token)
         except Exception as e:
-            logger.error(f"Authentication failed: {str(e)}")
-            return JSONResponse(
-                status_code=401,
-                content={"detail": str(e)}
-            ) 
\ No newline at end of file
+            logger.error("Authentication failed: %s", e)
+            await self._reject(str(e), scope, receive, send)
+            return
+
+        # Set the user in request state; the access log reports it
+        scope.setdefault("state", {})["user"] = payload
+
+        # Continue with the request
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(detail: str, scope: Scope, receive: Receive, send: Send):
+        response = JSONResponse(status_code=401, content={"detail": detail})
+        await response(scope, receive, send)
@@ -1,75 +1,65 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+from urllib.parse import unquote
 import logging
 import re
-from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
 
 logger = logging.getLogger(__name__)
 
-class URLRewriteMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Get the original URL
-        original_url = str(request.url)
-        
-        # Check if URL contains query parameters in the middle
-        if '?' in original_url and not original_url.endswith('?'):
-            # Split the URL into parts
-            parsed_url = urlparse(original_url)
-            path_parts = parsed_url.path.split('/')
-            
-            # Find the position of the query parameter
-            query_pos = None
-            for i, part in enumerate(path_parts):
-                if '?' in part:
-                    query_pos = i
-                    break
-            
-            if query_pos is not None:
-                # Extract the query parameters
-                query_part = path_parts[query_pos]
-                base_path, query_string = query_part.split('?', 1)
-                
-                # Log the found query parameters
-                logger.info(f"Found query parameters in URL: {query_string}")
-                
-                # Reconstruct the path without query parameters
-                new_path_parts = path_parts[:query_pos] + [base_path] + path_parts[query_pos + 1:]
-                new_path = '/'.join(new_path_parts)
-                
-                # Combine existing query parameters with the ones from the path
-                existing_query = parse_qs(parsed_url.query)
-                path_query = parse_qs(query_string)
-                combined_query = {**existing_query, **path_query}
-                
-                # Log the combined query parameters
-                logger.info(f"Combined query parameters: {combined_query}")
-                
-                # Create new URL with query parameters at the end
-                new_url = urlunparse((
-                    parsed_url.scheme,
-                    parsed_url.netloc,
-                    new_path,
-                    parsed_url.params,
-                    urlencode(combined_query, doseq=True),
-                    parsed_url.fragment
-                ))
-                
-                # Log the URL rewrite with details
-                logger.warning(
-                    f"URL Rewrite:\n"
-                    f"Original URL: {original_url}\n"
-                    f"New URL: {new_url}\n"
-                    f"Path before: {parsed_url.path}\n"
-                    f"Path after: {new_path}\n"
-                    f"Query parameters moved: {list(combined_query.keys())}"
-                )
-                
-                # Create a new request with the rewritten URL
-                request.scope["path"] = new_path
-                request.scope["query_string"] = urlencode(combined_query, doseq=True).encode()
-                request.scope["raw_path"] = new_path.encode()
-        
-        # Continue with the request
-        response = await call_next(request)
-        return response 
\ No newline at end of file
+# Only the model routes are rewritten, and only to the path segments clients append to them
+MODEL_PATH = re.compile(rb"^/models/[^/]+/[^/]+/?$")
+TRAILING_PATH = re.compile(rb"^(?:chat/completions|batch)(?:/|$)")
+
+class URLRewriteMiddleware:
+    """
+    Move query parameters embedded in the middle of a URL to the end.
+
+    Some clients append path segments after the query string, e.g.
+    ``/models/openai/gpt-4?session=abc/chat/completions``. The server sees the
+    path ``/models/openai/gpt-4`` and the query ``session=abc/chat/completions``,
+    which this middleware rewrites to ``/models/openai/gpt-4/chat/completions``
+    with the query ``session=abc``. Query parameters that follow the trailing
+    path segments are kept after the embedded ones.
+
+    Only ``/models/{provider}/{model}`` paths followed by ``chat/completions``
+    or ``batch`` are rewritten, so query values that contain ``/`` (URLs,
+    base64) are left alone. Implemented as raw ASGI middleware; requests whose
+    query string contains no ``/`` are passed through without any parsing.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query_string: bytes = scope.get("query_string", b"")
+        if b"/" not in query_string:
+            await self.app(scope, receive, send)
+            return
+
+        # Query parameters embedded before the remaining path segments
+        embedded_query, trailing = query_string.split(b"/", 1)
+        # The remaining segments may carry a query string of their own
+        trailing_path, _, trailing_query = trailing.partition(b"?")
+
+        raw_path = scope.get("raw_path") or scope["path"].encode()
+        if not (MODEL_PATH.match(raw_path) and TRAILING_PATH.match(trailing_path)):
+            await self.app(scope, receive, send)
+            return
+        new_raw_path = raw_path.rstrip(b"/") + b"/" + trailing_path
+        new_query = b"&".join(part for part in (embedded_query, trailing_query) if part)
+
+        scope = dict(scope)
+        scope["raw_path"] = new_raw_path
+        scope["path"] = unquote(new_raw_path.decode("latin-1"))
+        scope["query_string"] = new_query
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "URL Rewrite: %s?%s -> %s?%s",
+                raw_path.decode("latin-1"), query_string.decode("latin-1"), scope["path"], new_query.decode("latin-1")
+            )
+
+        await self.app(scope, receive, send)
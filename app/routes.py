@@ -1,27 +1,100 @@
-from fastapi import APIRouter, HTTPException, Request, Path, Query, Depends
+from fastapi import APIRouter, HTTPException, Request, Response, Path, Query, Depends
+from fastapi.exceptions import RequestValidationError
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from .models import ChatCompletionRequest, TokenResponse, ErrorResponse
 from .services.llm_service import LLMService
+from .config.reloader import ConfigReloader
 from .services.auth_service import AuthService
+from .services.circuit_breaker import CircuitOpenError
+from .services.preflight import ContextWindowExceededError
+from .services.rate_limiter import RateLimiter, tenant_of
+from .services.batch import BatchResponse, iter_lines, prepare_line, run_batch
+from .services.serialization import RawJSONResponse, completion_to_dict, completion_to_json
 from typing import List, Dict, Any, Optional
-import requests
+import asyncio
+import math
 import os
 import json
+from pydantic import ValidationError
 
 router = APIRouter()
 security = HTTPBearer()
 llm_service = LLMService()
-auth_service = AuthService()
+auth_service = AuthService(llm_service.http_pool.client)
+rate_limiter = RateLimiter(llm_service.config.rate_limits) if llm_service.config.rate_limits.enabled else None
+config_reloader = ConfigReloader(llm_service.config)
+
+def _inline_refs(schema: Any, definitions: Dict[str, Any]) -> Any:
+    """Replace the local $refs of a JSON schema with the definitions they point to"""
+    if isinstance(schema, dict):
+        if "$ref" in schema:
+            return _inline_refs(definitions[schema["$ref"].rsplit("/", 1)[-1]], definitions)
+        return {key: _inline_refs(value, definitions) for key, value in schema.items() if key != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_refs(item, definitions) for item in schema]
+    return schema
+
+_chat_request_schema = ChatCompletionRequest.model_json_schema()
+CHAT_REQUEST_BODY = {
+    "requestBody": {
+        "content": {"application/json": {"schema": _inline_refs(_chat_request_schema, _chat_request_schema.get("$defs", {}))}},
+        "required": True
+    }
+}
+
+async def chat_request_body(request: Request) -> ChatCompletionRequest:
+    """
+    Decode the request body straight from bytes into a ChatCompletionRequest.
+
+    pydantic's compiled JSON parser validates while it parses, so large message
+    payloads are not first built as a dict by json.loads and then copied into
+    the model.
+    """
+    try:
+        return ChatCompletionRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
 
 @router.get("/health", tags=["Health"])
-async def health_check():
+async def health_check(request: Request):
     """
     Health check endpoint.
     
     Returns:
         dict: A dictionary containing the health status of the service.
     """
-    return {"status": "healthy"}
+    health = {"status": "healthy"}
+    if llm_service.response_cache is not None:
+        health["cache"] = llm_service.response_cache.stats()
+    if llm_service.singleflight is not None:
+        health["coalescing"] = llm_service.singleflight.stats()
+    health["deployments"] = llm_service.balancer.snapshot()
+    health["hedging"] = {**llm_service.hedge_budget.stats(), "fallbacks": llm_service.fallbacks}
+    health["retries"] = llm_service.retry_budget.stats()
+    health["config"] = config_reloader.stats()
+    health["http_pool"] = llm_service.http_pool.stats()
+    logging_pipeline = getattr(request.app.state, "logging_pipeline", None)
+    if logging_pipeline is not None:
+        health["logging"] = logging_pipeline.stats()
+    span_processor = getattr(request.app.state, "span_processor", None)
+    if span_processor is not None:
+        health["tracing"] = span_processor.stats()
+    if llm_service.preflight is not None:
+        health["token_counts"] = llm_service.preflight.counter.stats()
+    if any(entry.get("circuit") == "open" for entry in health["deployments"].values()):
+        health["status"] = "degraded"
+    return health
+
+@router.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of upstream calls, summed over all workers"""
+    # Snapshot on the event loop, where the metrics are recorded; merge and render off it
+    snapshot = llm_service.metrics.snapshot()
+    body = await asyncio.to_thread(llm_service.metrics.render, snapshot)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 @router.get("/models/list", response_model=Dict[str, List[str]])
 async def list_models():
@@ -32,53 +105,152 @@ async def list_models():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/models/{provider}/{model_id}", response_model=Dict[str, Any])
+@router.post("/models/{provider}/{model_id}", response_model=Dict[str, Any], openapi_extra=CHAT_REQUEST_BODY)
 async def create_chat_completion(
     request: Request,
-    chat_request: ChatCompletionRequest,
+    response: Response,
+    chat_request: ChatCompletionRequest = Depends(chat_request_body),
     provider: str = Path(..., description="The provider name"),
     model_id: str = Path(..., description="The model ID"),
     session: Optional[str] = Query(None, description="Session ID")
 ):
     """Create a chat completion for a specific model"""
+    rate_limit = None
+    if rate_limiter is not None:
+        tenant = tenant_of(getattr(request.state, "user", None))
+        estimated_tokens = rate_limiter.estimate_tokens(chat_request)
+        rate_limit = await rate_limiter.check(tenant, estimated_tokens)
+        if not rate_limit.allowed:
+            raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=rate_limit.headers())
+        response.headers.update(rate_limit.headers())
+    # Whether the estimate charged by check() still has to be reconciled
+    charged = rate_limit is not None
     try:
-        # Update the model in the request to include provider
-        chat_request.model = f"{provider}/{model_id}"
-        if session:
-            chat_request.session = session
-        response = await llm_service.create_chat_completion(chat_request)
-        
-        # Convert ModelResponse to dictionary
-        response_dict = {
-            "id": response.id,
-            "created": response.created,
-            "model": response.model,
-            "object": response.object,
-            "choices": [
-                {
-                    "index": choice.index,
-                    "message": {
-                        "role": choice.message.role,
-                        "content": choice.message.content,
-                        "tool_calls": choice.message.tool_calls,
-                        "function_call": choice.message.function_call,
-                        "provider_specific_fields": choice.message.provider_specific_fields
-                    },
-                    "finish_reason": choice.finish_reason
-                }
-                for choice in response.choices
-            ],
-            "usage": {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
-        }
-        
-        return response_dict
+        try:
+            # Update the model in the request to include provider
+            chat_request.model = f"{provider}/{model_id}"
+            if session:
+                chat_request.session = session
+            completion = await llm_service.create_chat_completion(
+                chat_request,
+                cache_control=request.headers.get("cache-control")
+            )
+
+            if chat_request.stream:
+                if charged:
+                    # Reconciled from the usage of the last chunk once the stream ends
+                    completion = rate_limiter.metered(completion, tenant, estimated_tokens)
+                    charged = False
+                return StreamingResponse(
+                    completion,
+                    media_type="text/event-stream",
+                    headers={
+                        "Cache-Control": "no-cache",
+                        "X-Accel-Buffering": "no",
+                        **(rate_limit.headers() if rate_limit is not None else {})
+                    }
+                )
+            
+            cache_status = getattr(completion, "_hidden_params", {}).get("cache_status")
+            if cache_status:
+                response.headers["X-Cache"] = cache_status
+
+            if charged:
+                charged = False
+                # Cache hits cost no upstream tokens
+                used_tokens = 0 if cache_status in ("HIT", "HIT-FUZZY") else completion.usage.total_tokens
+                await rate_limiter.reconcile(tenant, estimated_tokens, used_tokens)
+            
+            # Encode the response body once and skip FastAPI's response validation
+            return RawJSONResponse(completion_to_json(completion), headers=response.headers)
+        except Exception:
+            if charged:
+                # Failed requests use no quota
+                await rate_limiter.reconcile(tenant, estimated_tokens, 0)
+            raise
+    except CircuitOpenError as e:
+        # Fail fast while the upstream is known to be down
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except ContextWindowExceededError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post(
+    "/models/{provider}/{model_id}/batch",
+    response_class=BatchResponse,
+    openapi_extra={"requestBody": {"content": {"application/x-ndjson": {"schema": {"type": "string"}}}, "required": True}}
+)
+async def create_batch(
+    request: Request,
+    provider: str = Path(..., description="The provider name"),
+    model_id: str = Path(..., description="The model ID"),
+    concurrency: Optional[int] = Query(None, ge=1, description="Lines run at the same time, capped by the server")
+):
+    """
+    Run a JSONL batch of chat completion requests against one model.
+
+    Each input line is a chat completion body, optionally with a ``custom_id``,
+    or an OpenAI batch entry (``{"custom_id": ..., "body": {...}}``). Results are
+    streamed back as JSONL in completion order, each tagged with the input
+    ``line`` number and its ``id`` (the custom id, else the line number).
+    """
+    try:
+        llm_service.config.get_provider(provider)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    settings = llm_service.config.batch
+    limit = min(concurrency or settings.max_concurrency, settings.max_concurrency)
+    tenant = tenant_of(getattr(request.state, "user", None))
+    cache_control = request.headers.get("cache-control")
+
+    async def handle(number: int, line: bytes) -> Dict[str, Any]:
+        result, chat_request = prepare_line(number, line, model=f"{provider}/{model_id}")
+        if chat_request is None:
+            return result
+
+        estimated_tokens = 0
+        if rate_limiter is not None:
+            # Batch lines wait for quota instead of failing
+            estimated_tokens = rate_limiter.estimate_tokens(chat_request)
+            while True:
+                rate_limit = await rate_limiter.check(tenant, estimated_tokens)
+                if rate_limit.allowed:
+                    break
+                await asyncio.sleep(rate_limit.retry_after)
+
+        try:
+            completion = await llm_service.create_chat_completion(chat_request, cache_control=cache_control)
+        except Exception as e:
+            if rate_limiter is not None:
+                # Failed lines use no quota
+                await rate_limiter.reconcile(tenant, estimated_tokens, 0)
+            if isinstance(e, CircuitOpenError):
+                result.update(status=503, error={"message": str(e)})
+            elif isinstance(e, ContextWindowExceededError):
+                result.update(status=400, error={"message": str(e)})
+            else:
+                result.update(status=500, error={"message": str(e)})
+            return result
+
+        if rate_limiter is not None:
+            cache_status = completion._hidden_params.get("cache_status")
+            used_tokens = 0 if cache_status in ("HIT", "HIT-FUZZY") else completion.usage.total_tokens
+            await rate_limiter.reconcile(tenant, estimated_tokens, used_tokens)
+        result.update(status=200, response=completion_to_dict(completion))
+        return result
+
+    lines = iter_lines(request.stream(), settings.max_line_bytes)
+    return BatchResponse(
+        run_batch(lines, handle, limit),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post(
     "/generate-token",
     response_model=TokenResponse,
@@ -117,7 +289,7 @@ async def generate_token(client_id: str, client_secret: str) -> Dict[str, str]:
             )
         
         # Request token from Auth0
-        response = requests.post(
+        response = await llm_service.http_pool.client.post(
             f"https://{auth0_domain}/oauth/token",
             headers={"Content-Type": "application/json"},
             json={
@@ -0,0 +1,141 @@
+"""
+Server launcher.
+
+Runs the API under uvicorn with the ``server`` settings of the config file.
+With more than one worker, the workers share the response cache's SQLite
+tier, rate limit buckets, open circuits, metrics and the Auth0 signing keys
+through a directory created in shared memory (``/dev/shm``) for the life of
+the server; state whose location is configured explicitly stays there.
+
+Usage:
+    llm-proxy --workers 8
+    python -m app.server --reload --port 8000
+"""
+from typing import List, Optional
+import argparse
+import math
+import os
+import shutil
+import sys
+import tempfile
+import uvicorn
+from .config.config import Config, STATE_DIR_ENV
+
+STATE_DIR_PREFIX = "llm-proxy-"
+# Most workers started for workers: 0, each one loads litellm and the tokenizers and opens its own pools
+MAX_AUTO_WORKERS = 8
+# CPU quota of the container: cgroup v2, then v1
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by the cgroup quota of this process, or None if unlimited"""
+    cpu_max = _read(CGROUP_CPU_MAX)
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota, period = (_read(path) for path in CGROUP_V1_CPU_QUOTA)
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        # "max", -1 or no cgroup
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def default_workers() -> int:
+    """
+    One worker per CPU this process may use, at most MAX_AUTO_WORKERS.
+
+    The affinity mask ignores the CPU quota of a container, so a 2 CPU
+    container on a 64 core host would otherwise start 64 workers.
+    """
+    process_cpu_count = getattr(os, "process_cpu_count", None)
+    if process_cpu_count is not None:
+        cpus = process_cpu_count() or 1
+    else:
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, min(cpus, MAX_AUTO_WORKERS))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def create_state_dir(base: Optional[str] = None) -> str:
+    """
+    Create the shared state directory of this server under ``base``.
+
+    Without ``base`` it goes to ``/dev/shm`` where available, so the shared
+    SQLite files live in memory. Directories left behind by servers that were
+    killed are removed first.
+    """
+    if base is None:
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    os.makedirs(base, exist_ok=True)
+    for name in os.listdir(base):
+        pid = name[len(STATE_DIR_PREFIX):]
+        if name.startswith(STATE_DIR_PREFIX) and pid.isdigit() and not _pid_alive(int(pid)):
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+    path = os.path.join(base, f"{STATE_DIR_PREFIX}{os.getpid()}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="llm-proxy", description="Run the LLM proxy server")
+    parser.add_argument("--host", help="Address to bind (default: server.host)")
+    parser.add_argument("--port", type=int, help="Port to bind (default: server.port)")
+    parser.add_argument("--workers", type=int, help="Worker processes, 0 for one per CPU core (default: server.workers)")
+    parser.add_argument("--reload", action="store_true", help="Restart on code changes; runs a single worker")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    settings = Config().server
+    host = args.host or settings.host
+    port = args.port if args.port is not None else settings.port
+    workers = args.workers if args.workers is not None else settings.workers
+    if workers <= 0:
+        workers = default_workers()
+    if args.reload:
+        workers = 1
+
+    state_dir = None
+    if workers > 1:
+        state_dir = create_state_dir(settings.state_dir)
+        # Inherited by the workers, which load their config from it
+        os.environ[STATE_DIR_ENV] = state_dir
+    try:
+        uvicorn.run("app.main:app", host=host, port=port, workers=workers, reload=args.reload)
+    finally:
+        if state_dir is not None:
+            os.environ.pop(STATE_DIR_ENV, None)
+            shutil.rmtree(state_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
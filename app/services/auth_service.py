@@ -1,42 +1,35 @@
 from datetime import datetime, timedelta
 import jwt
 import os
-import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import httpx
 from fastapi import HTTPException
 import logging
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
-import base64
-import math
+from ..config.config import STATE_DIR_ENV
+from .jwks_cache import JWKSCache
+from .token_cache import TokenCache
 
 logger = logging.getLogger(__name__)
 
 class AuthService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.auth0_domain = os.getenv("AUTH0_DOMAIN", "dev-yvvbyrf4gu0fxc1j.us.auth0.com")
         self.audience = os.getenv("AUTH0_AUDIENCE", f"https://{self.auth0_domain}/api/v2/")
         self.issuer = f"https://{self.auth0_domain}/"
-        self.jwks_url = f"https://{self.auth0_domain}/.well-known/jwks.json"
-        logger.info(f"Auth0 Configuration: domain={self.auth0_domain}, audience={self.audience}, issuer={self.issuer}")
-
-    def _get_rsa_key(self, jwk: Dict[str, Any]) -> str:
-        """Convert JWK to RSA key format"""
-        exponent = base64.urlsafe_b64decode(jwk['e'] + '==')
-        modulus = base64.urlsafe_b64decode(jwk['n'] + '==')
-        
-        # Create RSA public key
-        public_numbers = rsa.RSAPublicNumbers(
-            e=int.from_bytes(exponent, byteorder='big'),
-            n=int.from_bytes(modulus, byteorder='big')
+        self.jwks_url = os.getenv("AUTH0_JWKS_URL") or f"https://{self.auth0_domain}/.well-known/jwks.json"
+        # Workers of a multi-worker server share the fetched keys
+        state_dir = os.getenv(STATE_DIR_ENV)
+        self.jwks_cache = JWKSCache(
+            self.jwks_url,
+            ttl=float(os.getenv("JWKS_CACHE_TTL", "600")),
+            min_refresh_interval=float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30")),
+            client=http_client,
+            shared_path=os.path.join(state_dir, "jwks.json") if state_dir else None
         )
-        
-        public_key = public_numbers.public_key(default_backend())
-        
-        return public_key
+        self.token_cache = TokenCache(max_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
+        logger.info(f"Auth0 Configuration: domain={self.auth0_domain}, audience={self.audience}, issuer={self.issuer}")
 
-    def verify_token(self, token: str) -> Dict[str, Any]:
+    async def verify_token(self, token: str) -> Dict[str, Any]:
         """
         Verify a JWT token issued by Auth0.
         
@@ -49,60 +42,56 @@ class AuthService:
         Raises:
             HTTPException: If token verification fails
         """
+        # Clients reuse the same token for many calls; skip the signature check if already verified
+        cached_payload = self.token_cache.get(token)
+        if cached_payload is not None:
+            return cached_payload
+
         try:
-            logger.info("Fetching JWKS from Auth0")
-            # Get the JWKS (JSON Web Key Set)
-            jwks = requests.get(self.jwks_url).json()
-            
-            # Get the unverified header to find the key ID
+            # The header decides the algorithm and key up front
             unverified_header = jwt.get_unverified_header(token)
-            logger.info(f"Token header: {unverified_header}")
-            
-            # Find the key in the JWKS
-            rsa_key = None
-            for key in jwks["keys"]:
-                if key["kid"] == unverified_header["kid"]:
-                    rsa_key = self._get_rsa_key(key)
-                    logger.info(f"Found matching key with kid: {key['kid']}")
-                    break
+            logger.debug("Token header: %s", unverified_header)
+            algorithm = unverified_header.get("alg")
             
-            if not rsa_key:
-                logger.error(f"No matching key found for kid: {unverified_header['kid']}")
-                raise HTTPException(
-                    status_code=401,
-                    detail="Unable to find appropriate key"
-                )
-
-            # Verify the token
-            logger.info(f"Verifying token with audience={self.audience}, issuer={self.issuer}")
-            try:
-                payload = jwt.decode(
-                    token,
-                    rsa_key,
-                    algorithms=["RS256"],
-                    audience=self.audience,
-                    issuer=self.issuer
-                )
-            except jwt.exceptions.InvalidAlgorithmError:
-                logger.warning("RS256 algorithm failed, trying HS256")
-                # If RS256 fails, try HS256 with the secret key
-                secret_key = os.getenv("JWT_SECRET_KEY")
-                if not secret_key:
+            if algorithm == "RS256":
+                # Look up the signing key in the cached JWKS
+                key = await self.jwks_cache.get_key(unverified_header.get("kid"))
+                if not key:
+                    logger.error("No matching key found for kid: %s", unverified_header.get("kid"))
+                    raise HTTPException(
+                        status_code=401,
+                        detail="Unable to find appropriate key"
+                    )
+            elif algorithm == "HS256":
+                key = os.getenv("JWT_SECRET_KEY")
+                if not key:
                     raise HTTPException(
                         status_code=401,
                         detail="JWT_SECRET_KEY environment variable is not set"
                     )
-                payload = jwt.decode(
-                    token,
-                    secret_key,
-                    algorithms=["HS256"],
-                    audience=self.audience,
-                    issuer=self.issuer
+            else:
+                logger.error("Unsupported token algorithm: %s", algorithm)
+                raise HTTPException(
+                    status_code=401,
+                    detail=f"Unsupported token algorithm: {algorithm}"
                 )
+
+            # Verify the token
+            logger.debug("Verifying %s token with audience=%s, issuer=%s", algorithm, self.audience, self.issuer)
+            payload = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                issuer=self.issuer
+            )
+            self.token_cache.put(token, payload)
             
-            logger.info(f"Token verified successfully: {payload}")
+            logger.debug("Token verified for %s", payload.get("sub"))
             return payload
 
+        except HTTPException:
+            raise
         except jwt.ExpiredSignatureError:
             logger.error("Token has expired")
             raise HTTPException(
@@ -110,13 +99,13 @@ class AuthService:
                 detail="Token has expired"
             )
         except jwt.exceptions.InvalidTokenError as e:
-            logger.error(f"Invalid token: {str(e)}")
+            logger.error("Invalid token: %s", e)
             raise HTTPException(
                 status_code=401,
                 detail=f"Invalid token: {str(e)}"
             )
         except Exception as e:
-            logger.error(f"Token verification failed: {str(e)}")
+            logger.error("Token verification failed: %s", e)
             raise HTTPException(
                 status_code=401,
                 detail=f"Token verification failed: {str(e)}"
@@ -0,0 +1,140 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from ..models.chat_models import ChatCompletionRequest
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class LineTooLongError(Exception):
+    pass
+
+
+class BatchResponse(StreamingResponse):
+    """
+    Streaming response whose body is produced while the request body is still being read.
+
+    StreamingResponse normally drains ``receive`` to watch for disconnects, which
+    would swallow the upload. Here a disconnect surfaces through the request
+    stream instead, and once the input is exhausted at most one window of
+    calls is left to finish.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncGenerator[Tuple[int, bytes], None]:
+    """Split a byte stream into numbered non-empty lines (1-based) without reading it all"""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+        if len(buffer) > max_line_bytes:
+            raise LineTooLongError(f"Line {number + 1} is longer than {max_line_bytes} bytes")
+    if buffer.strip():
+        yield number + 1, buffer
+
+
+def parse_line(line: bytes) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """
+    Return (custom id, request body) of one batch line.
+
+    Lines are either plain chat completion bodies, optionally with a
+    ``custom_id``, or OpenAI batch entries of the form
+    ``{"custom_id": ..., "body": {...}}``.
+    """
+    entry = json.loads(line)
+    if not isinstance(entry, dict):
+        raise ValueError("Batch line must be a JSON object")
+    custom_id = entry.pop("custom_id", None)
+    body = entry.get("body", entry)
+    if not isinstance(body, dict):
+        raise ValueError("Batch line body must be a JSON object")
+    return custom_id, body
+
+
+def prepare_line(number: int, line: bytes, model: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[ChatCompletionRequest]]:
+    """
+    Parse one batch line into its result stub and request.
+
+    The stub carries the line number and id; if the line is invalid it already
+    holds a 400 error and no request is returned. ``model`` (provider/model)
+    overrides the model of the line. Streaming is always turned off.
+    """
+    result: Dict[str, Any] = {"id": number, "line": number}
+    try:
+        custom_id, body = parse_line(line)
+        if custom_id is not None:
+            result["id"] = custom_id
+        # Override in place rather than copying a body that may hold a long conversation
+        body["stream"] = False
+        if model is not None:
+            body["model"] = model
+        return result, ChatCompletionRequest.model_validate(body)
+    except ValueError as e:
+        result.update(status=400, error={"message": str(e)})
+        return result, None
+
+
+async def run_batch(
+    lines: AsyncIterator[Tuple[int, bytes]],
+    handle: Callable[[int, bytes], Awaitable[Dict[str, Any]]],
+    concurrency: int
+) -> AsyncGenerator[bytes, None]:
+    """
+    Run ``handle`` over ``lines`` with at most ``concurrency`` calls in flight.
+
+    Results are yielded as JSONL in completion order. Input is read only as
+    fast as slots free up and finished results wait in a queue of the same
+    size, so memory stays flat however long the input is. Closing the
+    generator (e.g. the client disconnecting) cancels the outstanding calls.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    results: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=concurrency)
+    tasks = set()
+
+    async def work(number: int, line: bytes) -> None:
+        try:
+            try:
+                result = await handle(number, line)
+            except Exception as e:
+                result = {"id": number, "line": number, "status": 500, "error": {"message": str(e)}}
+            await results.put(dumps(result) + b"\n")
+        finally:
+            slots.release()
+
+    async def produce() -> None:
+        try:
+            async for number, line in lines:
+                await slots.acquire()
+                task = asyncio.ensure_future(work(number, line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except Exception as e:
+            logger.error(f"Failed to read batch input: {str(e)}")
+            await results.put(json.dumps({"error": {"message": f"Failed to read batch input: {str(e)}"}}).encode() + b"\n")
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await results.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+    finally:
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
@@ -0,0 +1,215 @@
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+import os
+import random
+import sqlite3
+import threading
+import time
+from ..config.config import CircuitBreakerSettings, RetrySettings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when every deployment of a model is behind an open circuit"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker for one deployment.
+
+    The outcome of the last ``window_size`` calls is kept; once at least
+    ``min_calls`` are recorded, the circuit opens when the share of errors or of
+    calls slower than ``slow_call_ms`` reaches its threshold. An open circuit
+    rejects calls for ``open_seconds`` and then lets ``half_open_max_calls``
+    probes through: if they all succeed it closes, otherwise it opens again.
+    ``on_trip`` is called whenever the circuit opens on its own record.
+    """
+
+    def __init__(self, settings: CircuitBreakerSettings, on_trip: Optional[Callable[[], None]] = None):
+        self.settings = settings
+        self.on_trip = on_trip
+        self._outcomes: "deque[Tuple[bool, bool]]" = deque(maxlen=settings.window_size)
+        self._errors = 0
+        self._slow = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_successes = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.settings.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_successes = 0
+        return self._state
+
+    def allows(self, in_flight: int) -> bool:
+        """Whether a new call may go to the deployment, given its calls already in flight"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            return in_flight < self.settings.half_open_max_calls
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.settings.open_seconds - (time.monotonic() - self._opened_at))
+
+    def record(self, latency: float, error: bool) -> None:
+        slow = latency * 1000 >= self.settings.slow_call_ms
+        state = self.state
+        if state == HALF_OPEN:
+            if error or slow:
+                self._trip()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.settings.half_open_max_calls:
+                self._reset()
+            return
+        if state == OPEN:
+            # A call that started before the circuit opened
+            return
+
+        if len(self._outcomes) == self._outcomes.maxlen:
+            old_error, old_slow = self._outcomes[0]
+            self._errors -= old_error
+            self._slow -= old_slow
+        self._outcomes.append((error, slow))
+        self._errors += error
+        self._slow += slow
+        calls = len(self._outcomes)
+        if calls >= self.settings.min_calls and (
+            self._errors / calls >= self.settings.error_rate_threshold
+            or self._slow / calls >= self.settings.slow_call_rate_threshold
+        ):
+            self._trip()
+
+    def health(self) -> float:
+        """Share of recent calls that succeeded in time; 0 while the circuit is open"""
+        if self.state == OPEN:
+            return 0.0
+        if not self._outcomes:
+            return 1.0
+        failed = sum(1 for error, slow in self._outcomes if error or slow)
+        return 1 - failed / len(self._outcomes)
+
+    def open_for(self, seconds: float) -> None:
+        """Open the circuit for ``seconds``, as another worker did, unless it is open already"""
+        if seconds <= 0 or self.state == OPEN:
+            return
+        self._state = OPEN
+        self._opened_at = time.monotonic() - max(0.0, self.settings.open_seconds - seconds)
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.trips += 1
+        if self.on_trip is not None:
+            self.on_trip()
+
+    def _reset(self) -> None:
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._errors = 0
+        self._slow = 0
+
+
+class SharedCircuitStore:
+    """
+    Open circuits in a SQLite file shared by every worker on the host.
+
+    A worker that opens a circuit records until when (wall clock time) it
+    stays open; the other workers read it on their next sync and open theirs
+    for the rest of that time, so the whole server stops calling a failing
+    deployment as soon as one worker has seen it fail.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS circuits (key TEXT PRIMARY KEY, open_until REAL NOT NULL)")
+
+    def sync(self, opened: Dict[str, float], now: float) -> Dict[str, float]:
+        """Publish the circuits opened here (key: open until) and return every circuit open on the host"""
+        with self._lock:
+            if not opened:
+                rows = self._conn.execute("SELECT key, open_until FROM circuits WHERE open_until > ?", (now,)).fetchall()
+                return dict(rows)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO circuits (key, open_until) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET open_until = MAX(open_until, excluded.open_until)",
+                    list(opened.items())
+                )
+                self._conn.execute("DELETE FROM circuits WHERE open_until <= ?", (now,))
+                rows = self._conn.execute("SELECT key, open_until FROM circuits").fetchall()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RetryBudget:
+    """
+    Global token bucket for retries.
+
+    Every request adds ``ratio`` tokens (up to ``burst``) and every retry spends
+    one, so during an outage retries add at most ``ratio`` extra calls per
+    request instead of multiplying the load on the failing provider.
+    """
+
+    def __init__(self, settings: RetrySettings):
+        self.settings = settings
+        self.tokens = float(settings.budget_burst)
+        self.retries = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.settings.budget_burst, self.tokens + self.settings.budget_ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.denied += 1
+        return False
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff in seconds before retry number ``attempt`` (starting at 1)"""
+        cap = min(self.settings.backoff_max_ms, self.settings.backoff_base_ms * 2 ** (attempt - 1))
+        return random.uniform(0, cap) / 1000
+
+    def stats(self) -> Dict[str, Any]:
+        return {"retries": self.retries, "retries_denied": self.denied, "budget_tokens": round(self.tokens, 2)}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and transport errors are retried; other client errors are not"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status_code: Optional[int] = getattr(error, "status_code", None)
+    if not isinstance(status_code, int):
+        return True
+    return status_code in (408, 409, 429) or status_code >= 500
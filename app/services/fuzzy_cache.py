@@ -0,0 +1,192 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import hashlib
+import json
+import re
+import sys
+import time
+from ..models.chat_models import ChatCompletionRequest
+
+# Volatile tokens that should not make two prompts look different
+_VOLATILE_PATTERNS = [
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}(?:(?:t|\s+)\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?\b"), " <ts> "),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?(?:\s?[ap]m)?\b"), " <time> "),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), " <uuid> "),
+]
+_TOKEN_PATTERN = re.compile(r"<\w+>|\w+")
+
+_HASH_BITS = 64
+_MAX_HASH = (1 << _HASH_BITS) - 1
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def normalize_tokens(request: ChatCompletionRequest) -> List[str]:
+    """Lowercase the conversation, mask timestamps/UUIDs and split it into word tokens"""
+    tokens: List[str] = []
+    for message in request.messages:
+        text = message.content.lower()
+        for pattern, placeholder in _VOLATILE_PATTERNS:
+            text = pattern.sub(placeholder, text)
+        tokens.append(f"<{message.role}>")
+        tokens.extend(_TOKEN_PATTERN.findall(text))
+    return tokens
+
+
+def request_namespace(request: ChatCompletionRequest) -> int:
+    """Hash of everything except the messages; only requests in the same namespace are compared"""
+    params = request.model_dump(exclude_none=True, exclude={"messages", "stream", "session"})
+    return _hash64(json.dumps(params, sort_keys=True, separators=(",", ":")))
+
+
+class MinHasher:
+    """
+    One-permutation MinHash over word shingles.
+
+    Each shingle is hashed once; the high bits pick one of ``num_perm`` bins and
+    each bin keeps its minimum value. Empty bins are filled from the next
+    non-empty bin (rotation densification), so the cost is linear in the prompt
+    length rather than ``num_perm`` times the prompt length.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3):
+        if num_perm & (num_perm - 1):
+            raise ValueError("num_perm must be a power of two")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._bin_shift = _HASH_BITS - (num_perm.bit_length() - 1)
+        self._value_mask = (1 << self._bin_shift) - 1
+
+    def shingles(self, tokens: List[str]) -> Set[int]:
+        size = min(self.shingle_size, len(tokens)) or 1
+        return {_hash64(" ".join(tokens[i:i + size])) for i in range(max(1, len(tokens) - size + 1))}
+
+    def signature(self, tokens: List[str]) -> Tuple[int, ...]:
+        bins = [_MAX_HASH] * self.num_perm
+        for value in self.shingles(tokens):
+            index = value >> self._bin_shift
+            masked = value & self._value_mask
+            if masked < bins[index]:
+                bins[index] = masked
+        for i in range(self.num_perm):
+            if bins[i] == _MAX_HASH:
+                for offset in range(1, self.num_perm):
+                    donor = bins[(i + offset) % self.num_perm]
+                    if donor != _MAX_HASH:
+                        bins[i] = donor + offset
+                        break
+        return tuple(bins)
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+class _Entry:
+    __slots__ = ("key", "signature", "band_keys", "value", "expires_at")
+
+    def __init__(self, key: str, signature: Tuple[int, ...], band_keys: List[int], value: bytes, expires_at: float):
+        self.key = key
+        self.signature = signature
+        self.band_keys = band_keys
+        self.value = value
+        self.expires_at = expires_at
+
+
+class FuzzyIndex:
+    """
+    Locality-sensitive index of cached responses for near-duplicate prompts.
+
+    Signatures are split into ``bands`` bands; two prompts become candidates when
+    any band matches exactly, and a candidate is returned only if its estimated
+    similarity reaches the requested threshold. Entries are evicted least
+    recently used first once ``max_entries`` or ``max_memory_bytes`` is reached.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, max_entries: int = 10000, max_memory_bytes: int = 32 * 1024 * 1024):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[int, Set[int]] = {}
+        self._ids_by_key: Dict[str, int] = {}
+        self._next_id = 0
+        self._memory_bytes = 0
+        # Approximate fixed cost of one entry: slots object, exact-key slot, signature tuple and its ints,
+        # band keys and bucket slots
+        self._entry_overhead = (
+            sys.getsizeof(_Entry("", (), [], b"", 0.0)) + 64 * 2
+            + sys.getsizeof(tuple(range(num_perm))) + num_perm * 36
+            + sys.getsizeof([0] * bands) + bands * (36 + 64)
+        )
+
+    def _band_keys(self, namespace: int, signature: Tuple[int, ...]) -> List[int]:
+        return [
+            hash((namespace, band, signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def get(self, request: ChatCompletionRequest, threshold: float) -> Optional[bytes]:
+        signature = self.hasher.signature(normalize_tokens(request))
+        candidates: Set[int] = set()
+        for band_key in self._band_keys(request_namespace(request), signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+
+        best_id, best_score = None, threshold
+        now = time.time()
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                continue
+            score = MinHasher.similarity(signature, entry.signature)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id].value
+
+    def put(self, key: str, request: ChatCompletionRequest, value: bytes, expires_at: float) -> None:
+        """Index ``value`` for ``request``; ``key`` is the exact cache key and replaces an older entry"""
+        previous_id = self._ids_by_key.get(key)
+        if previous_id is not None:
+            self._remove(previous_id)
+        signature = self.hasher.signature(normalize_tokens(request))
+        band_keys = self._band_keys(request_namespace(request), signature)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(key, signature, band_keys, value, expires_at)
+        self._ids_by_key[key] = entry_id
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, set()).add(entry_id)
+        self._memory_bytes += len(value) + self._entry_overhead
+        while self._entries and (len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        del self._ids_by_key[entry.key]
+        for band_key in entry.band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band_key]
+        self._memory_bytes -= len(entry.value) + self._entry_overhead
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index, including cached response bodies"""
+        return self._memory_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,113 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import math
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies of one model, used to derive its hedge delay"""
+
+    # The sorted window is rebuilt at most once every this many samples
+    RESORT_INTERVAL = 16
+
+    def __init__(self, window: int = 256):
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._sorted = []
+        self._unsorted = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._unsorted += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if self._unsorted >= self.RESORT_INTERVAL or len(self._sorted) < len(self._samples):
+            self._sorted = sorted(self._samples)
+            self._unsorted = 0
+        if not self._sorted:
+            return None
+        index = min(len(self._sorted) - 1, max(0, math.ceil(q * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class HedgeBudget:
+    """
+    Token bucket that caps hedged calls to a fraction of primary calls.
+
+    Every primary call adds ``ratio`` tokens (up to ``burst``) and every hedge
+    spends one, so at most ``ratio`` extra upstream calls are made per request
+    over time even when an upstream slows down across the board.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.hedged = 0
+        self.denied = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.hedged += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hedged_requests": self.hedged, "hedges_denied": self.denied}
+
+
+async def hedge(
+    primary: Callable[[], Awaitable[T]],
+    alternate: Optional[Callable[[], Awaitable[T]]],
+    delay: float,
+    allow: Callable[[], bool],
+    discard: Optional[Callable[[T], Awaitable[Any]]] = None
+) -> T:
+    """
+    Await ``primary()``, racing ``alternate()`` against it if it is still running after ``delay`` seconds.
+
+    The alternate is only started when ``allow()`` grants it. The first call to
+    succeed wins and the other is cancelled; if both finish at once, ``discard``
+    releases the losing result. An error is raised only if both calls fail.
+    """
+    first = asyncio.ensure_future(primary())
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or alternate is None or not allow():
+            return await first
+        second = asyncio.ensure_future(alternate())
+    except BaseException:
+        first.cancel()
+        raise
+
+    pending = {first, second}
+    winner = None
+    error: Optional[BaseException] = None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in (first, second):
+                if task not in done:
+                    continue
+                if task.cancelled() or task.exception() is not None:
+                    error = error or (asyncio.CancelledError() if task.cancelled() else task.exception())
+                elif winner is None:
+                    winner = task
+                elif discard is not None:
+                    await discard(task.result())
+    finally:
+        for task in pending:
+            task.cancel()
+    if winner is None:
+        raise error
+    return winner.result()
+
@@ -0,0 +1,202 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import importlib.util
+import ipaddress
+import logging
+import socket
+import time
+import httpcore
+import httpx
+from ..config.config import HttpPoolSettings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class CachingResolver(httpcore.AsyncNetworkBackend):
+    """
+    Network backend that caches DNS answers for ``ttl`` seconds.
+
+    Only the TCP connect goes to the resolved address; TLS still uses the
+    original host name for SNI and certificate checks. Addresses are tried in
+    order, and an entry is dropped when none of its addresses accept a
+    connection so the next connect resolves again.
+    """
+
+    def __init__(self, ttl: float, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._backend = backend if backend is not None else httpcore.AnyIOBackend()
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        now = time.monotonic()
+        entry = self._cache.get((host, port))
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[(host, port)] = (now + self.ttl, addresses)
+        return addresses
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[Any]] = None
+    ) -> httpcore.AsyncNetworkStream:
+        try:
+            addresses = await self.resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        self._cache.pop((host, port), None)
+        raise last_error if last_error is not None else httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: Optional[float] = None,
+        socket_options: Optional[Iterable[Any]] = None
+    ) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """
+    Transport with one keep-alive connection pool per upstream origin.
+
+    Each deployment endpoint gets its own pool with the configured limits, so a
+    busy provider cannot take all the connections of another. Pools are
+    created on first use.
+    """
+
+    def __init__(self, settings: HttpPoolSettings, resolver: CachingResolver, http2: bool):
+        self.settings = settings
+        self.resolver = resolver
+        self.http2 = http2
+        self._transports: Dict[Tuple[str, str, Optional[int]], httpx.AsyncHTTPTransport] = {}
+
+    def transport_for(self, url: httpx.URL) -> httpx.AsyncHTTPTransport:
+        key = (url.scheme, url.host, url.port)
+        transport = self._transports.get(key)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.settings.max_connections,
+                    max_keepalive_connections=self.settings.max_keepalive_connections,
+                    keepalive_expiry=self.settings.keepalive_expiry
+                )
+            )
+            # httpx does not expose httpcore's network backend; plug in the DNS cache.
+            # This relies on httpx/httpcore internals, which is why pyproject.toml pins both.
+            transport._pool._network_backend = self.resolver
+            self._transports[key] = transport
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.transport_for(request.url).handle_async_request(request)
+
+    def connections(self) -> int:
+        return sum(len(transport._pool.connections) for transport in self._transports.values())
+
+    def __len__(self) -> int:
+        return len(self._transports)
+
+    async def aclose(self) -> None:
+        transports, self._transports = list(self._transports.values()), {}
+        for transport in transports:
+            await transport.aclose()
+
+
+class HttpPool:
+    """
+    Long-lived HTTP client shared by upstream LLM calls and Auth0 calls.
+
+    Connections are kept alive and multiplexed over HTTP/2 when the h2 package
+    is installed and the server supports it. ``prewarm`` opens connections to
+    the deployment endpoints at startup so the first requests skip DNS, TCP
+    and TLS setup.
+    """
+
+    def __init__(self, settings: HttpPoolSettings):
+        self.settings = settings
+        self.http2 = settings.http2 and H2_AVAILABLE
+        if settings.http2 and not H2_AVAILABLE:
+            logger.info("h2 is not installed, upstream connections use HTTP/1.1")
+        self.resolver = CachingResolver(settings.dns_ttl)
+        self.transport = PooledTransport(settings, self.resolver, self.http2)
+        self.client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout),
+            follow_redirects=True
+        )
+        self.prewarmed = 0
+        self._litellm_handler = None
+
+    def litellm_handler(self):
+        """The shared client wrapped for litellm's non-OpenAI provider handlers"""
+        if self._litellm_handler is None:
+            from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+            handler = AsyncHTTPHandler()
+            handler.client = self.client
+            self._litellm_handler = handler
+        return self._litellm_handler
+
+    async def _warm(self, origin: str) -> bool:
+        try:
+            # Any response will do; it leaves an open connection in the pool
+            await self.client.head(origin, timeout=self.settings.connect_timeout)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not prewarm connection to {origin}: {str(e)}")
+            return False
+
+    async def prewarm(self, urls: Iterable[str]) -> int:
+        """Open connections to the origins of ``urls``; returns how many were opened"""
+        origins = set()
+        for url in urls:
+            parsed = httpx.URL(url)
+            if parsed.scheme in ("http", "https") and parsed.host:
+                origins.add(str(parsed.copy_with(path="/", query=None, fragment=None)))
+        # One connection carries all streams with HTTP/2
+        per_origin = 1 if self.http2 else self.settings.prewarm_connections
+        results = await asyncio.gather(*(self._warm(origin) for origin in origins for _ in range(per_origin)))
+        self.prewarmed += sum(results)
+        return sum(results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "origins": len(self.transport),
+            "connections": self.transport.connections(),
+            "prewarmed": self.prewarmed,
+            "dns_hits": self.resolver.hits,
+            "dns_misses": self.resolver.misses,
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
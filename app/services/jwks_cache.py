@@ -0,0 +1,150 @@
+from typing import Any, Dict, Optional
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+import httpx
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+logger = logging.getLogger(__name__)
+
+class JWKSCache:
+    """
+    In-memory cache of the Auth0 signing keys, indexed by ``kid``.
+
+    Keys are stored as ready-to-use ``RSAPublicKey`` objects. Once the TTL has
+    passed the keys keep being served while a background task refreshes them.
+    A token with an unknown ``kid`` triggers at most one on-demand refetch per
+    ``min_refresh_interval`` so a flood of bad tokens cannot hammer Auth0. If a
+    refresh fails the last good key set stays in place.
+
+    With ``shared_path`` the fetched key set is also written to that file, and
+    a refresh reuses it while it is younger than ``min_refresh_interval``, so
+    the workers of a host fetch from Auth0 once between them.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        ttl: float = 600.0,
+        min_refresh_interval: float = 30.0,
+        timeout: float = 5.0,
+        client: Optional[httpx.AsyncClient] = None,
+        shared_path: Optional[str] = None
+    ):
+        self.jwks_url = jwks_url
+        self.shared_path = shared_path
+        self.client = client
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys: Dict[str, rsa.RSAPublicKey] = {}
+        self._fetched_at: float = 0.0
+        self._last_attempt: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def build_public_key(jwk: Dict[str, Any]) -> rsa.RSAPublicKey:
+        """Convert a JWK to an RSA public key"""
+        exponent = base64.urlsafe_b64decode(jwk['e'] + '==')
+        modulus = base64.urlsafe_b64decode(jwk['n'] + '==')
+        public_numbers = rsa.RSAPublicNumbers(
+            e=int.from_bytes(exponent, byteorder='big'),
+            n=int.from_bytes(modulus, byteorder='big')
+        )
+        return public_numbers.public_key(default_backend())
+
+    async def get_key(self, kid: str) -> Optional[rsa.RSAPublicKey]:
+        """Return the public key for ``kid``, or None if Auth0 does not know it"""
+        if not self._keys:
+            await self.refresh()
+        elif time.monotonic() - self._fetched_at > self.ttl and self._refresh_allowed():
+            self._schedule_refresh()
+
+        key = self._keys.get(kid)
+        if key is None and self._refresh_allowed():
+            logger.info(f"Unknown kid {kid}, refetching JWKS")
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def refresh(self) -> None:
+        """Fetch the JWKS, keeping the current keys if the fetch fails"""
+        async with self._lock:
+            # Rate limit fetches; this also drops callers that queued behind a fetch that just ran
+            if not self._refresh_allowed():
+                return
+            self._last_attempt = time.monotonic()
+            try:
+                jwks = await self._read_shared()
+                if jwks is None:
+                    jwks = await self._fetch_jwks()
+                    await self._write_shared(jwks)
+                keys = {
+                    jwk["kid"]: self.build_public_key(jwk)
+                    for jwk in jwks.get("keys", [])
+                    if jwk.get("kty") == "RSA" and "kid" in jwk
+                }
+            except Exception as e:
+                if self._keys:
+                    logger.warning(f"JWKS refresh failed, serving {len(self._keys)} cached keys: {str(e)}")
+                else:
+                    logger.error(f"JWKS fetch failed and no cached keys are available: {str(e)}")
+                return
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            logger.info(f"Loaded {len(keys)} signing keys from {self.jwks_url}")
+
+    async def _fetch_jwks(self) -> Dict[str, Any]:
+        if self.client is not None:
+            # Shared pool: the connection to Auth0 stays open between refreshes
+            response = await self.client.get(self.jwks_url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.jwks_url)
+            response.raise_for_status()
+            return response.json()
+
+    async def _read_shared(self) -> Optional[Dict[str, Any]]:
+        """The key set another worker fetched less than ``min_refresh_interval`` ago, if any"""
+        if not self.shared_path:
+            return None
+
+        def read() -> Optional[Dict[str, Any]]:
+            try:
+                if time.time() - os.path.getmtime(self.shared_path) >= self.min_refresh_interval:
+                    return None
+                with open(self.shared_path) as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return None
+
+        return await asyncio.to_thread(read)
+
+    async def _write_shared(self, jwks: Dict[str, Any]) -> None:
+        if not self.shared_path:
+            return
+
+        def write() -> None:
+            # Written aside and renamed so other workers never read a partial file
+            tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(jwks, f)
+            os.replace(tmp_path, self.shared_path)
+
+        try:
+            await asyncio.to_thread(write)
+        except OSError as e:
+            logger.warning(f"Could not share JWKS with the other workers: {str(e)}")
+
+    def _refresh_allowed(self) -> bool:
+        return self._last_attempt is None or time.monotonic() - self._last_attempt >= self.min_refresh_interval
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
@@ -1,20 +1,293 @@
-from typing import List, Dict, Any, Optional, AsyncGenerator
-import litellm
-from litellm import completion
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, AsyncGenerator, Awaitable, Callable, Tuple
+import asyncio
+import contextlib
+import importlib
+import sys
+import time
 from ..models.chat_models import ChatCompletionRequest, ChatMessage, Tool
 from ..config.config import Config
-import os
+from .streaming import SSEEncoder, SSE_DONE
+from .response_cache import ResponseCache, cache_key, parse_cache_control
+from .singleflight import SingleFlight
+from .load_balancer import LoadBalancer
+from .hedging import HedgeBudget, LatencyTracker, hedge
+from .circuit_breaker import CircuitOpenError, RetryBudget, is_retryable
+from .preflight import ContextWindowExceededError, Preflight
+from .http_pool import HttpPool
+from .metrics import LLMMetrics, status_of
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    from litellm import ModelResponse
+
+# Providers litellm calls through the OpenAI SDK, which takes its HTTP client from litellm.aclient_session
+OPENAI_SDK_PROVIDERS = ("openai", "azure")
+
+_litellm = None
+
+
+async def load_litellm():
+    """
+    Import litellm in a worker thread.
+
+    litellm and the provider SDKs take over a second to import, so they are
+    loaded on first use (or in the background at startup) without blocking the
+    event loop.
+    """
+    global _litellm
+    if _litellm is None:
+        _litellm = await asyncio.to_thread(importlib.import_module, "litellm")
+    return _litellm
+
+
+async def acompletion(**params):
+    # Looked up on every call so instrumentation applied after startup (Phoenix) is picked up
+    litellm = await load_litellm()
+    return await litellm.acompletion(**params)
+
 class LLMService:
     def __init__(self):
-        self.litellm = litellm
         self.config = Config()
+        self._semaphores: Dict[str, Tuple[int, asyncio.Semaphore]] = {}
+        self.response_cache = ResponseCache(self.config.cache) if self.config.cache.enabled else None
+        self.singleflight = SingleFlight(self.config.coalescing.max_buffered_chunks) if self.config.coalescing.enabled else None
+        self.balancer = LoadBalancer(self.config.load_balancing, self.config.circuit_breaker)
+        self.retry_budget = RetryBudget(self.config.retries)
+        self.preflight = Preflight(self.config.preflight) if self.config.preflight.enabled else None
+        self.hedge_budget = HedgeBudget(self.config.hedging.max_extra_ratio, self.config.hedging.max_burst)
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self.fallbacks = 0
+        self.http_pool = HttpPool(self.config.http_pool)
+        self.metrics = LLMMetrics(self.config.metrics)
+        self._pool_started = False
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    @property
+    def litellm(self):
+        return importlib.import_module("litellm")
+
+    async def start(self, background: bool = True) -> None:
+        """
+        Load litellm and the preflight tokenizers, route upstream calls through the shared connection pool and prewarm it.
+
+        With ``background`` the work runs in a task so the server starts
+        answering (e.g. /health) right away.
+        """
+        # Shares this worker's metrics and open circuits with the other workers of the server
+        self.metrics.start()
+        self.balancer.start_sync()
+        if background:
+            self._warm_up_task = asyncio.ensure_future(self._warm_up())
+        else:
+            await self._warm_up()
+
+    async def _warm_up(self) -> None:
+        started_at = time.perf_counter()
+        litellm = await load_litellm()
+        logger.info(f"Loaded litellm in {time.perf_counter() - started_at:.2f} s")
+        if self.preflight is not None:
+            tokenizers = {model.tokenizer for model in self.config.routes.models.values() if model.context_length}
+            await asyncio.to_thread(self.preflight.counter.load, tokenizers)
+        if not self.config.http_pool.enabled:
+            return
+        litellm.aclient_session = self.http_pool.client
+        # Only now: building the handler for the other providers imports from litellm on the event loop,
+        # which must not race the import above
+        self._pool_started = True
+        if self.config.http_pool.prewarm:
+            api_bases = {
+                deployment.api_base
+                for deployments in self.config.routes.deployments.values()
+                for deployment in deployments
+                if deployment.api_base
+            }
+            opened = await self.http_pool.prewarm(api_bases)
+            logger.info(f"Prewarmed {opened} upstream connections to {len(api_bases)} endpoints")
+
+    async def aclose(self) -> None:
+        if self._warm_up_task is not None and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+            try:
+                await self._warm_up_task
+            except asyncio.CancelledError:
+                pass
+        litellm = sys.modules.get("litellm")
+        if litellm is not None and litellm.aclient_session is self.http_pool.client:
+            litellm.aclient_session = None
+        self._pool_started = False
+        await self.metrics.stop()
+        await self.balancer.stop_sync()
+        await self.http_pool.aclose()
+
+    def _get_semaphore(self, provider_name: str) -> Optional[asyncio.Semaphore]:
+        """Return the per-provider concurrency limiter, or None if unlimited"""
+        limit = self.config.get_provider(provider_name).max_concurrency
+        if not limit:
+            return None
+        entry = self._semaphores.get(provider_name)
+        if entry is None or entry[0] != limit:
+            # New provider, or the limit changed on a config reload; calls holding
+            # the old semaphore release it as they finish
+            entry = self._semaphores[provider_name] = (limit, asyncio.Semaphore(limit))
+        return entry[1]
+
+    def _limit(self, provider_name: str):
+        semaphore = self._get_semaphore(provider_name)
+        return semaphore if semaphore is not None else contextlib.nullcontext()
+
+    def _route(
+        self,
+        request_params: Dict[str, Any],
+        provider_name: str,
+        model_name: str,
+        exclude: Optional[str] = None
+    ) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """Pick a deployment of the model and build its completion params"""
+        scope = self.config.get_scope(provider_name, model_name)
+        deployments = self.config.get_deployments(provider_name, model_name)
+        if exclude is not None:
+            deployments = [deployment for deployment in deployments if scope + "/" + deployment.name != exclude]
+            if not deployments:
+                return None
+        deployment = self.balancer.choose(scope, deployments)
+        if deployment is None:
+            return None
+
+        completion_params = dict(request_params)
+        # Upstream model name, endpoint and API key, resolved when the config was loaded
+        completion_params.update(self.config.get_upstream_params(provider_name, model_name, deployment.name))
+        # Request defaults some providers reject (e.g. the penalties for Anthropic) are left out instead of failing the call
+        completion_params["drop_params"] = True
+        if self._pool_started and provider_name not in OPENAI_SDK_PROVIDERS:
+            completion_params["client"] = self.http_pool.litellm_handler()
+        return provider_name, scope + "/" + deployment.name, completion_params
+
+    async def _run(
+        self,
+        request_params: Dict[str, Any],
+        targets: List[Tuple[str, str]],
+        attempt: Callable[[str, str, Dict[str, Any]], Awaitable[Any]],
+        discard: Optional[Callable[[Any], Awaitable[Any]]] = None
+    ) -> Any:
+        """
+        Run ``attempt`` against the first target and fall back down the chain on
+        retryable errors and open circuits; other client errors are raised as is.
+
+        Deployments behind an open circuit are skipped without a call. Retryable
+        errors are retried with jittered backoff, possibly on another deployment,
+        while the global retry budget allows it. When hedging is enabled for the
+        first target, a second call is started on another deployment (or the next
+        target) if the first one is slower than the model's latency percentile,
+        within the hedge budget.
+        """
+        self.retry_budget.deposit()
+        last_error = None
+        retries = 0
+        for index, (provider_name, model_name) in enumerate(targets):
+            while True:
+                route = self._route(request_params, provider_name, model_name)
+                if route is None:
+                    retry_after = self.balancer.retry_after(
+                        self.config.get_scope(provider_name, model_name), self.config.get_deployments(provider_name, model_name)
+                    )
+                    last_error = CircuitOpenError(f"{provider_name}/{model_name} is unavailable", retry_after)
+                    break
+                try:
+                    if index == 0 and self.config.is_hedged(provider_name, model_name):
+                        return await self._hedged(request_params, targets, route, attempt, discard)
+                    return await attempt(*route)
+                except Exception as e:
+                    last_error = e
+                    if not is_retryable(e) and not isinstance(e, CircuitOpenError):
+                        # The request itself was rejected (e.g. 400): other models would reject it too
+                        raise
+                    if not is_retryable(e) or retries >= self.config.retries.max_retries or not self.retry_budget.try_spend():
+                        break
+                    retries += 1
+                    delay = self.retry_budget.backoff(retries)
+                    logger.warning("Upstream call to %s failed, retrying in %.0f ms: %s", route[1], delay * 1000, e)
+                    await asyncio.sleep(delay)
+            if index + 1 < len(targets):
+                self.fallbacks += 1
+                logger.warning("%s/%s failed, falling back to %s: %s", provider_name, model_name, "/".join(targets[index + 1]), last_error)
+        raise last_error
+
+    def _check_available(self, targets: List[Tuple[str, str]]) -> None:
+        """Raise CircuitOpenError if no target has a deployment that accepts calls"""
+        retry_after = float("inf")
+        for provider_name, model_name in targets:
+            scope = self.config.get_scope(provider_name, model_name)
+            deployments = self.config.get_deployments(provider_name, model_name)
+            if self.balancer.choose(scope, deployments) is not None:
+                return
+            retry_after = min(retry_after, self.balancer.retry_after(scope, deployments))
+        raise CircuitOpenError(f"{'/'.join(targets[0])} is unavailable", retry_after)
+
+    async def _hedged(
+        self,
+        request_params: Dict[str, Any],
+        targets: List[Tuple[str, str]],
+        route: Tuple[str, str, Dict[str, Any]],
+        attempt: Callable[[str, str, Dict[str, Any]], Awaitable[Any]],
+        discard: Optional[Callable[[Any], Awaitable[Any]]]
+    ) -> Any:
+        settings = self.config.hedging
+        scope = self.config.get_scope(*targets[0])
+        tracker = self._latencies.get(scope)
+        if tracker is None:
+            tracker = self._latencies[scope] = LatencyTracker()
+        delay = settings.initial_delay_ms / 1000
+        if len(tracker) >= settings.min_samples:
+            delay = max(tracker.percentile(settings.percentile), settings.min_delay_ms / 1000)
 
-    async def create_chat_completion(self, request: ChatCompletionRequest) -> Dict[str, Any]:
+        # Hedge on another deployment of the same model, else on the next model in the chain
+        alternate = self._route(request_params, *targets[0], exclude=route[1])
+        if alternate is None and len(targets) > 1:
+            alternate = self._route(request_params, *targets[1])
+
+        self.hedge_budget.deposit()
+        started_at = time.perf_counter()
+        result = await hedge(
+            lambda: attempt(*route),
+            (lambda: attempt(*alternate)) if alternate is not None else None,
+            delay,
+            self.hedge_budget.try_spend,
+            discard
+        )
+        tracker.record(time.perf_counter() - started_at)
+        return result
+
+    async def _call(self, provider_name: str, deployment_key: str, completion_params: Dict[str, Any]) -> "ModelResponse":
+        # Hold the provider slot only for the duration of the upstream call
+        async with self._limit(provider_name):
+            call_started_at = self.balancer.start(deployment_key)
+            labels = self.metrics.call_started(deployment_key)
+            try:
+                response = await acompletion(**completion_params)
+            except Exception as e:
+                # Client errors (e.g. 400) are the request's fault, not the deployment's
+                self.balancer.finish(deployment_key, call_started_at, error=True, neutral=not is_retryable(e))
+                self.metrics.call_finished(labels, call_started_at, status_of(e))
+                raise
+            except asyncio.CancelledError as e:
+                # Lost a hedge race or the client went away: not an outcome of the deployment
+                self.balancer.finish(deployment_key, call_started_at, neutral=True)
+                self.metrics.call_finished(labels, call_started_at, status_of(e))
+                raise
+            self.balancer.finish(deployment_key, call_started_at)
+            self.metrics.call_finished(labels, call_started_at, "200", getattr(response, "usage", None))
+        return response
+
+    def _coalescable(self, request: ChatCompletionRequest) -> bool:
+        if self.singleflight is None:
+            return False
+        return not self.config.coalescing.deterministic_only or request.temperature == 0
+
+    async def create_chat_completion(self, request: ChatCompletionRequest, cache_control: Optional[str] = None) -> Dict[str, Any]:
+        started_at = time.perf_counter()
         try:
             # Extract provider and model name from the request
             # Format: provider:model (e.g., "openai:gpt-4o")
@@ -23,52 +296,175 @@ class LLMService:
                 raise ValueError("Missing provider/model_name")
             
             provider_name = model_name[0]
-            logger.debug(f"Provider name: {provider_name}")
+            logger.debug("Provider name: %s", provider_name)
             model_name = model_name[1]
-            logger.debug(f"Model name: {model_name}")
+            logger.debug("Model name: %s", model_name)
 
-            # Get provider configuration
-            provider_config = self.config.get_provider(provider_name)
-            
-            # Convert request to dict and remove None values
-            completion_params = request.dict(exclude_none=True)
-            
-            # Update model name to use the actual model name without provider prefix
-            completion_params["model"] = provider_name+"/"+model_name
+            # Validate the provider before doing any work
+            self.config.get_provider(provider_name)
 
-            # Add provider-specific configuration
-            completion_params["api_base"] = provider_config.api_base
-            if provider_config.api_version:
-                completion_params["api_version"] = provider_config.api_version
+            # Reject or trim prompts that cannot fit the context window without an upstream round trip
+            context_window = self.config.get_context_window(provider_name, model_name)
+            if self.preflight is not None and context_window is not None:
+                request = await self.preflight.acheck(request, *context_window)
             
-            # Set provider-specific API key
-            if provider_name == "azure":
-                completion_params["api_key"] = os.getenv("AZURE_API_KEY")
-            elif provider_name == "openai":
-                completion_params["api_key"] = os.getenv("OPENAI_API_KEY")
-            elif provider_name == "anthropic":
-                completion_params["api_key"] = os.getenv("ANTHROPIC_API_KEY")
-            elif provider_name == "gemini":
-                completion_params["api_key"] = os.getenv("GOOGLE_API_KEY")
-            
-            logger.debug(f"Completion params: {completion_params}")
+            # Convert request to dict and remove None values; message contents are shared, not copied
+            request_params = request.model_dump(exclude_none=True)
+            if logger.isEnabledFor(logging.DEBUG):
+                # Formatting long conversations is expensive, skip it unless it is logged
+                logger.debug(f"Request params: {request_params}")
+
+            # The model itself, then its fallback chain
+            targets = [(provider_name, model_name)] + self.config.get_fallbacks(provider_name, model_name)
             
             if request.stream:
-                return self._handle_streaming_response(completion(**completion_params))
-            else:
-                response = completion(**completion_params)
+                # Fail before the response starts rather than with an error event
+                self._check_available(targets)
+
+                def open_stream():
+                    return self._handle_streaming_response(request_params, targets, started_at)
+                if self._coalescable(request):
+                    # Identical concurrent streams share one upstream stream
+                    return self.singleflight.stream("stream:" + cache_key(request), open_stream)
+                return open_stream()
+
+            # Serve repeated deterministic requests from the response cache
+            key = None
+            cache_status = None
+            write_cache = False
+            if self.response_cache is not None and self.response_cache.is_cacheable(request):
+                read_cache, write_cache = parse_cache_control(cache_control)
+                if read_cache or write_cache:
+                    key = cache_key(request)
+                if read_cache:
+                    cached = await self.response_cache.get(key)
+                    cache_status = "HIT"
+                    if cached is None:
+                        threshold = self.config.get_fuzzy_threshold(provider_name, model_name)
+                        cached = self.response_cache.get_similar(request, threshold)
+                        cache_status = "HIT-FUZZY"
+                    if cached is not None:
+                        litellm = await load_litellm()
+                        response = litellm.ModelResponse(**json.loads(cached))
+                        response._hidden_params["cache_status"] = cache_status
+                        self.metrics.cache_lookup(self.config.get_scope(provider_name, model_name), cache_status.lower())
+                        return response
+                cache_status = "MISS" if read_cache else "BYPASS"
+                self.metrics.cache_lookup(self.config.get_scope(provider_name, model_name), cache_status.lower())
+
+            async def fetch():
+                response = await self._run(request_params, targets, self._call)
+                if write_cache:
+                    ttl = self.config.get_cache_ttl(provider_name, model_name)
+                    await self.response_cache.put(key, response.model_dump_json().encode(), ttl, request=request)
                 return response
+
+            if self._coalescable(request):
+                # Identical concurrent requests share one upstream call
+                response = await self.singleflight.do(key or cache_key(request), fetch)
+                # Give each waiter its own copy to annotate
+                response = response.model_copy()
+                response._hidden_params = dict(response._hidden_params)
+            else:
+                response = await fetch()
+
+            if cache_status is not None:
+                response._hidden_params["cache_status"] = cache_status
+            return response
+        except (CircuitOpenError, ContextWindowExceededError) as e:
+            logger.error("Error creating chat completion: %s", e)
+            raise
         except Exception as e:
-            logger.error(f"Error creating chat completion: {str(e)}")
+            logger.error("Error creating chat completion: %s", e)
             raise Exception(f"Error creating chat completion: {str(e)}")
 
-    async def _handle_streaming_response(self, response_stream) -> AsyncGenerator[str, None]:
+    async def _stream_upstream(
+        self,
+        provider_name: str,
+        deployment_key: str,
+        completion_params: Dict[str, Any]
+    ) -> AsyncGenerator[Any, None]:
+        """Yield the non-empty chunks of one upstream stream"""
+        call_started_at = None
+        labels = None
+        started_at = first_token_at = None
+        usage = None
+        status = "cancelled"
+        try:
+            # A stream occupies its provider slot until the last chunk is consumed
+            async with self._limit(provider_name):
+                call_started_at = started_at = self.balancer.start(deployment_key)
+                labels = self.metrics.call_started(deployment_key)
+                response_stream = await acompletion(**completion_params)
+                async for chunk in response_stream:
+                    if chunk:
+                        if call_started_at is not None:
+                            # Time to first token is the latency signal for streams
+                            self.balancer.finish(deployment_key, call_started_at)
+                            call_started_at = None
+                            first_token_at = time.perf_counter()
+                        # Sent with the last chunk when the client asks for it
+                        usage = getattr(chunk, "usage", None) or usage
+                        yield chunk
+                status = "200"
+        except Exception as e:
+            status = status_of(e)
+            if call_started_at is not None:
+                self.balancer.finish(deployment_key, call_started_at, error=True, neutral=not is_retryable(e))
+                call_started_at = None
+            raise
+        finally:
+            if call_started_at is not None:
+                # Empty stream, or cancelled before the first chunk (not an outcome of the deployment)
+                self.balancer.finish(deployment_key, call_started_at, neutral=status == "cancelled")
+            if labels is not None:
+                self.metrics.call_finished(labels, started_at, status, usage, first_token_at)
+
+    async def _open_stream(
+        self,
+        provider_name: str,
+        deployment_key: str,
+        completion_params: Dict[str, Any]
+    ) -> Tuple[AsyncGenerator[Any, None], Any]:
+        """Open an upstream stream and wait for its first chunk, so hedging and fallback cover time to first token"""
+        stream = self._stream_upstream(provider_name, deployment_key, completion_params)
+        try:
+            first_chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = None
+        except BaseException:
+            await stream.aclose()
+            raise
+        return stream, first_chunk
+
+    @staticmethod
+    async def _close_stream(opened: Tuple[AsyncGenerator[Any, None], Any]) -> None:
+        await opened[0].aclose()
+
+    async def _handle_streaming_response(
+        self,
+        request_params: Dict[str, Any],
+        targets: List[Tuple[str, str]],
+        started_at: float
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Relay upstream chunks as SSE events.
+
+        Chunks are pulled from upstream only when the previous event has been
+        handed to the server, so a slow client throttles the upstream read
+        instead of buffering the completion in memory.
+        """
+        encoder = SSEEncoder()
+        stream = None
         try:
-            async for chunk in response_stream:
-                if chunk:
-                    # Convert the chunk to a string and yield it
-                    yield f"data: {json.dumps(chunk)}\n\n"
-            yield "data: [DONE]\n\n"
+            stream, first_chunk = await self._run(request_params, targets, self._open_stream, self._close_stream)
+            if first_chunk is not None:
+                ttft = time.perf_counter() - started_at
+                logger.info("Time to first token for %s: %.1f ms", request_params["model"], ttft * 1000)
+                yield encoder.encode(first_chunk)
+            async for chunk in stream:
+                yield encoder.encode(chunk)
+            yield SSE_DONE
         except Exception as e:
             error_response = {
                 "error": {
@@ -76,5 +472,8 @@ class LLMService:
                     "type": "streaming_error"
                 }
             }
-            yield f"data: {json.dumps(error_response)}\n\n"
-            yield "data: [DONE]\n\n" 
\ No newline at end of file
+            yield SSEEncoder.encode_event(error_response)
+            yield SSE_DONE
+        finally:
+            if stream is not None:
+                await stream.aclose()
@@ -0,0 +1,200 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import random
+import sqlite3
+import time
+from ..config.config import CircuitBreakerSettings, Deployment, LoadBalancingSettings
+from .circuit_breaker import CircuitBreaker, SharedCircuitStore
+
+logger = logging.getLogger(__name__)
+
+
+class DeploymentStats:
+    __slots__ = ("outstanding", "ewma_latency", "requests", "errors", "breaker")
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None):
+        self.outstanding = 0
+        self.ewma_latency = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.breaker = breaker
+
+
+class LoadBalancer:
+    """
+    Pick a deployment for each upstream call.
+
+    Two strategies are supported:
+
+    * ``least_outstanding`` - fewest in-flight requests relative to the
+      deployment weight.
+    * ``ewma`` - exponentially weighted moving average of latency multiplied by
+      the in-flight load, so a slow or throttled region quickly sheds traffic.
+      Failed calls are recorded with a latency penalty.
+
+    Ties are broken at random so equal deployments share load evenly. When
+    circuit breaker settings are given, deployments whose circuit is open are
+    skipped; with a ``state_path`` circuits opened by one worker are opened in
+    every worker of the host within ``sync_seconds``.
+    """
+
+    def __init__(self, settings: LoadBalancingSettings, breaker_settings: Optional[CircuitBreakerSettings] = None):
+        if settings.strategy not in ("least_outstanding", "ewma"):
+            raise ValueError(f"Unknown load balancing strategy: {settings.strategy}")
+        self.settings = settings
+        self.breaker_settings = breaker_settings if breaker_settings is not None and breaker_settings.enabled else None
+        self._stats: Dict[str, DeploymentStats] = {}
+        # Circuits opened here since the last sync, with when they close (wall clock time)
+        self._opened: Dict[str, float] = {}
+        self.circuit_store: Optional[SharedCircuitStore] = None
+        if self.breaker_settings is not None and self.breaker_settings.state_path:
+            self.circuit_store = SharedCircuitStore(self.breaker_settings.state_path)
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def stats_for(self, key: str) -> DeploymentStats:
+        stats = self._stats.get(key)
+        if stats is None:
+            breaker = None
+            if self.breaker_settings is not None:
+                breaker = CircuitBreaker(self.breaker_settings, on_trip=lambda: self._tripped(key))
+            stats = self._stats[key] = DeploymentStats(breaker)
+        return stats
+
+    def _tripped(self, key: str) -> None:
+        if self.circuit_store is not None:
+            self._opened[key] = time.time() + self.breaker_settings.open_seconds
+
+    def _available(self, stats: DeploymentStats) -> bool:
+        return stats.breaker is None or stats.breaker.allows(stats.outstanding)
+
+    def _score(self, stats: DeploymentStats, weight: float) -> float:
+        load = (stats.outstanding + 1) / max(weight, 1e-9)
+        if self.settings.strategy == "ewma":
+            return stats.ewma_latency * load
+        return load
+
+    def choose(self, scope: str, deployments: List[Deployment]) -> Optional[Deployment]:
+        """
+        Return the best deployment, or None if every circuit is open.
+
+        ``scope`` namespaces the stats (e.g. provider/model).
+        """
+        if len(deployments) == 1:
+            return deployments[0] if self._available(self.stats_for(f"{scope}/{deployments[0].name}")) else None
+        best: List[Deployment] = []
+        best_score = float("inf")
+        for deployment in deployments:
+            stats = self.stats_for(f"{scope}/{deployment.name}")
+            if not self._available(stats):
+                continue
+            score = self._score(stats, deployment.weight)
+            if score < best_score:
+                best, best_score = [deployment], score
+            elif score == best_score:
+                best.append(deployment)
+        if not best:
+            return None
+        return best[0] if len(best) == 1 else random.choice(best)
+
+    def retry_after(self, scope: str, deployments: List[Deployment]) -> float:
+        """Seconds until the first open circuit among ``deployments`` admits a probe"""
+        waits = [
+            stats.breaker.retry_after()
+            for stats in (self.stats_for(f"{scope}/{deployment.name}") for deployment in deployments)
+            if stats.breaker is not None
+        ]
+        return min(waits, default=0.0)
+
+    def start(self, key: str) -> float:
+        """Mark a call to the deployment ``key`` as in flight and return its start time"""
+        stats = self.stats_for(key)
+        stats.outstanding += 1
+        stats.requests += 1
+        return time.perf_counter()
+
+    def finish(self, key: str, started_at: float, error: bool = False, neutral: bool = False) -> None:
+        """
+        Mark a call to ``key`` as done.
+
+        ``neutral`` calls (cancelled, or rejected because of the request itself)
+        say nothing about the deployment's health and only release the slot.
+        """
+        stats = self.stats_for(key)
+        stats.outstanding -= 1
+        if neutral:
+            return
+        latency = time.perf_counter() - started_at
+        if stats.breaker is not None:
+            stats.breaker.record(latency, error)
+        if error:
+            stats.errors += 1
+            latency = max(latency, self.settings.error_penalty_seconds)
+        if stats.ewma_latency == 0.0:
+            stats.ewma_latency = latency
+        else:
+            decay = self.settings.ewma_decay
+            stats.ewma_latency = decay * latency + (1 - decay) * stats.ewma_latency
+
+    async def sync_circuits(self) -> None:
+        """Publish the circuits opened here and open the ones opened by the other workers"""
+        if self.circuit_store is None:
+            return
+        opened, self._opened = self._opened, {}
+        now = time.time()
+        try:
+            open_circuits = await asyncio.to_thread(self.circuit_store.sync, opened, now)
+        except BaseException:
+            # Published on the next sync instead
+            for key, until in opened.items():
+                self._opened[key] = max(until, self._opened.get(key, 0.0))
+            raise
+        for key, until in open_circuits.items():
+            if key not in opened:
+                breaker = self.stats_for(key).breaker
+                if breaker is not None:
+                    breaker.open_for(until - now)
+
+    async def _sync_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.breaker_settings.sync_seconds)
+            try:
+                await self.sync_circuits()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not sync circuit breakers: {str(e)}")
+
+    def start_sync(self) -> None:
+        if self.circuit_store is not None and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_periodically())
+
+    async def stop_sync(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self.circuit_store is not None:
+            try:
+                await self.sync_circuits()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not sync circuit breakers: {str(e)}")
+            self.circuit_store.close()
+            self.circuit_store = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        for key, stats in self._stats.items():
+            entry = {
+                "outstanding": stats.outstanding,
+                "ewma_latency_ms": round(stats.ewma_latency * 1000, 1),
+                "requests": stats.requests,
+                "errors": stats.errors,
+            }
+            if stats.breaker is not None:
+                entry["circuit"] = stats.breaker.state
+                entry["health"] = round(stats.breaker.health(), 3)
+                entry["trips"] = stats.breaker.trips
+            snapshot[key] = entry
+        return snapshot
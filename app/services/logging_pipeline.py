@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, IO, Optional
+import atexit
+import logging
+import queue
+import sys
+from ..config.config import LoggingSettings
+from .serialization import dumps
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has, and uvicorn's ANSI colored copy of the message; anything else was passed with ``extra``
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "color_message"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the fields passed in ``extra`` at the top level"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return dumps(entry).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a share of the INFO and DEBUG records of each logger.
+
+    Rates are looked up by logger name prefix, so a rate for ``app.middleware``
+    applies to every middleware logger unless a longer prefix has its own.
+    Records are kept evenly (every 10th at 0.1) rather than at random.
+    Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._resolved: Dict[str, Optional[float]] = {}
+        self._credit: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        if name not in self._resolved:
+            rate = None
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1:
+            return True
+        # The first record of a logger is kept
+        credit = self._credit.get(record.name, 1 - rate) + rate
+        if credit >= 1:
+            self._credit[record.name] = credit - 1
+            return True
+        self._credit[record.name] = credit
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the caller.
+
+    Records are queued as they are, so the message is formatted by the
+    listener thread rather than the event loop; arguments passed to a log call
+    must not be changed afterwards. When the queue is full the record is
+    dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Waits for room, unlike the default, so a full queue cannot lose the stop signal
+        self.queue.put(self._sentinel)
+
+
+class LoggingPipeline:
+    """
+    Route every log record through a bounded queue to a background writer.
+
+    Loggers only filter, sample and enqueue; formatting and the write to
+    ``stream`` happen on the listener thread. ``install`` makes the pipeline
+    the only handler of the root logger and sends uvicorn's loggers through it.
+    """
+
+    def __init__(self, settings: LoggingSettings, stream: Optional[IO[str]] = None):
+        self.settings = settings
+        output = logging.StreamHandler(stream if stream is not None else sys.stdout)
+        output.setFormatter(JSONFormatter() if settings.format == "json" else logging.Formatter(TEXT_FORMAT))
+        self.queue: queue.Queue = queue.Queue(settings.queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.sampler = SamplingFilter(settings.sample_rates)
+        self.handler.addFilter(self.sampler)
+        self.listener = _Listener(self.queue, output)
+        self._started = False
+
+    def start(self) -> None:
+        if not self._started:
+            self.listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        """Write the queued records and stop the writer thread"""
+        if self._started:
+            self.listener.stop()
+            self._started = False
+
+    def install(self) -> None:
+        root = logging.getLogger()
+        root.handlers = [self.handler]
+        root.setLevel(self.settings.level)
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            logging.getLogger(name).handlers = []
+            logging.getLogger(name).propagate = True
+        # Replaced by the access log middleware
+        logging.getLogger("uvicorn.access").disabled = self.settings.access_log
+        self.start()
+        atexit.register(self.stop)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": self.queue.qsize(), "dropped": self.handler.dropped, "sampled_out": self.sampler.sampled_out}
@@ -0,0 +1,332 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import contextlib
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from ..config.config import MetricsSettings
+
+logger = logging.getLogger(__name__)
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 2, 5, 10)
+TOKENS_PER_SECOND_BUCKETS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Counter or gauge: one value per label combination"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def snapshot(self) -> List[Any]:
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+    @staticmethod
+    def merge(merged: Dict[Labels, Any], samples: List[Any]) -> None:
+        for labels, value in samples:
+            labels = tuple(labels)
+            merged[labels] = merged.get(labels, 0) + value
+
+    def render(self, samples: Dict[Labels, Any]) -> List[str]:
+        return [f"{self.name}{self._labels(labels)} {_number(value)}" for labels, value in samples.items()]
+
+    def _labels(self, labels: Labels, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(Metric):
+    type = "counter"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def dec(self, labels: Labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    """
+    Cumulative histogram rendered in the Prometheus format.
+
+    Each observation increments a single bucket; the cumulative counts are
+    only computed when rendering.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label combination: the count of each bucket plus +Inf, then the sum
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def snapshot(self) -> List[Any]:
+        return [[list(labels), list(entry)] for labels, entry in self.values.items()]
+
+    @staticmethod
+    def merge(merged: Dict[Labels, Any], samples: List[Any]) -> None:
+        for labels, entry in samples:
+            labels = tuple(labels)
+            current = merged.get(labels)
+            merged[labels] = entry if current is None else [a + b for a, b in zip(current, entry)]
+
+    def render(self, samples: Dict[Labels, Any]) -> List[str]:
+        lines = []
+        for labels, entry in samples.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), entry):
+                cumulative += count
+                le = 'le="' + (bound if bound == "+Inf" else _number(bound)) + '"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(entry[-1])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {_number(cumulative)}")
+        return lines
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Metrics of one process, optionally merged with the other workers of the server.
+
+    Recording only updates in-memory dicts. With ``settings.multiprocess_dir``
+    each worker writes a snapshot of its metrics to ``<ppid>-<pid>.json`` every
+    ``flush_seconds``, and ``collect`` sums the snapshots of all workers that
+    share its parent process, so any worker can answer a scrape. Snapshots of
+    workers that have exited keep counting (counters must not go down) except
+    for their gauges; snapshots left by an earlier server are removed.
+    """
+
+    def __init__(self, settings: MetricsSettings):
+        self.settings = settings
+        self.metrics: List[Metric] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # The periodic flush and scrapes write the snapshot from different threads
+        self._write_lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, List[Any]]:
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def _path(self) -> str:
+        return os.path.join(self.settings.multiprocess_dir, f"{os.getppid()}-{os.getpid()}.json")
+
+    def write_snapshot(self, snapshot: Optional[Dict[str, List[Any]]] = None) -> None:
+        if not self.settings.multiprocess_dir:
+            return
+        path = self._path()
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        if snapshot is None:
+            snapshot = self.snapshot()
+        with self._write_lock:
+            os.makedirs(self.settings.multiprocess_dir, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+
+    def _worker_snapshots(self) -> List[Tuple[bool, Dict[str, List[Any]]]]:
+        """(alive, snapshot) of every worker of this server, this one included"""
+        snapshots = []
+        own = self._path()
+        for path in glob.glob(os.path.join(self.settings.multiprocess_dir, "*-*.json")):
+            parent, _, pid = os.path.basename(path)[:-len(".json")].partition("-")
+            if not (parent.isdigit() and pid.isdigit()):
+                continue
+            if int(parent) != os.getppid():
+                if not _pid_alive(int(parent)):
+                    # Left by an earlier server
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append((path == own or _pid_alive(int(pid)), json.load(f)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {str(e)}")
+        return snapshots
+
+    def collect(self, own: Optional[Dict[str, List[Any]]] = None) -> List[Tuple[Metric, Dict[Labels, Any]]]:
+        """
+        Every metric with its samples, summed over the workers of this server.
+
+        Pass the ``snapshot`` of this process when calling from another thread
+        than the one recording the metrics.
+        """
+        if own is None:
+            own = self.snapshot()
+        snapshots = [(True, own)]
+        if self.settings.multiprocess_dir:
+            try:
+                self.write_snapshot(own)
+                snapshots = self._worker_snapshots()
+            except OSError as e:
+                # A scrape still reports this worker when the shared directory fails
+                logger.warning(f"Reporting this worker only, metrics directory is unusable: {str(e)}")
+        collected = []
+        for metric in self.metrics:
+            merged: Dict[Labels, Any] = {}
+            for alive, snapshot in snapshots:
+                if alive or metric.type != "gauge":
+                    metric.merge(merged, snapshot.get(metric.name, []))
+            collected.append((metric, merged))
+        return collected
+
+    def render(self, own: Optional[Dict[str, List[Any]]] = None) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric, samples in self.collect(own):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render(samples))
+        return "\n".join(lines) + "\n"
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.flush_seconds)
+            try:
+                await asyncio.to_thread(self.write_snapshot, self.snapshot())
+            except OSError as e:
+                logger.warning(f"Could not write metrics snapshot: {str(e)}")
+
+    def start(self) -> None:
+        if self.settings.multiprocess_dir and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+            self.write_snapshot()
+
+
+class LLMMetrics(MetricsRegistry):
+    """
+    Upstream call metrics labelled by provider, model and deployment.
+
+    Deployment keys (``provider/model/deployment``) are split into labels once
+    and cached, so recording a call costs a few dict updates.
+    """
+
+    def __init__(self, settings: MetricsSettings):
+        super().__init__(settings)
+        deployment = ("provider", "model", "deployment")
+        self.requests = self.register(Counter(
+            "llm_upstream_requests_total", "Upstream calls by status code", deployment + ("status",)
+        ))
+        self.latency = self.register(Histogram(
+            "llm_upstream_request_duration_seconds", "Upstream call duration, until the last chunk for streams",
+            deployment, LATENCY_BUCKETS
+        ))
+        self.ttft = self.register(Histogram(
+            "llm_time_to_first_token_seconds", "Time to the first chunk of upstream streams", deployment, TTFT_BUCKETS
+        ))
+        self.tokens_per_second = self.register(Histogram(
+            "llm_completion_tokens_per_second", "Completion tokens per second of generation",
+            deployment, TOKENS_PER_SECOND_BUCKETS
+        ))
+        self.tokens = self.register(Counter("llm_tokens_total", "Tokens reported by upstream", deployment + ("type",)))
+        self.in_flight = self.register(Gauge("llm_upstream_in_flight", "Upstream calls in flight", deployment))
+        self.cache = self.register(Counter(
+            "llm_cache_requests_total", "Response cache lookups by result", ("provider", "model", "result")
+        ))
+        self._labels: Dict[str, Labels] = {}
+
+    def labels(self, deployment_key: str) -> Labels:
+        labels = self._labels.get(deployment_key)
+        if labels is None:
+            provider, _, rest = deployment_key.partition("/")
+            model, _, deployment = rest.rpartition("/")
+            labels = self._labels[deployment_key] = (provider, model, deployment)
+        return labels
+
+    def call_started(self, deployment_key: str) -> Labels:
+        labels = self.labels(deployment_key)
+        self.in_flight.inc(labels)
+        return labels
+
+    def call_finished(
+        self,
+        labels: Labels,
+        started_at: float,
+        status: str,
+        usage: Any = None,
+        first_token_at: Optional[float] = None
+    ) -> None:
+        """Record a finished upstream call; ``started_at`` and ``first_token_at`` are perf_counter times"""
+        finished_at = time.perf_counter()
+        self.in_flight.dec(labels)
+        self.requests.inc(labels + (status,))
+        self.latency.observe(labels, finished_at - started_at)
+        if first_token_at is not None:
+            self.ttft.observe(labels, first_token_at - started_at)
+        if usage is not None:
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+            completion_tokens = getattr(usage, "completion_tokens", None) or 0
+            self.tokens.inc(labels + ("prompt",), prompt_tokens)
+            self.tokens.inc(labels + ("completion",), completion_tokens)
+            # Generation starts with the first token for streams
+            generating = finished_at - (first_token_at if first_token_at is not None else started_at)
+            if completion_tokens and generating > 0:
+                self.tokens_per_second.observe(labels, completion_tokens / generating)
+
+    def cache_lookup(self, scope: str, result: str) -> None:
+        """Record a response cache lookup for the model ``scope`` (``provider/model``, ``provider/*`` if unlisted)"""
+        provider, _, model = scope.partition("/")
+        self.cache.inc((provider, model, result))
+
+
+def status_of(error: BaseException) -> str:
+    """Upstream status code of a failed call, or the kind of failure"""
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    status_code = getattr(error, "status_code", None)
+    return str(status_code) if status_code else "error"
@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+from ..config.config import PreflightSettings
+from ..models.chat_models import ChatCompletionRequest, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer name that estimates 4 characters per token instead of encoding
+APPROXIMATE = "approx"
+
+# Per-message and reply priming overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+# Uncached text of at least this many characters in one request is encoded in a worker thread,
+# encoding takes about 65 ms per MB and would stall the event loop
+OFFLOAD_CHARS = 64 * 1024
+
+
+def _use_bundled_encodings() -> None:
+    """
+    Point tiktoken at the encodings bundled with litellm, so they load offline.
+
+    litellm does this when it is imported, but it is imported lazily and may
+    not be loaded yet when the first prompt is counted.
+    """
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        return
+    spec = importlib.util.find_spec("litellm")
+    if spec is None or not spec.submodule_search_locations:
+        return
+    bundled = os.path.join(spec.submodule_search_locations[0], "litellm_core_utils", "tokenizers")
+    if os.path.isdir(bundled):
+        os.environ["TIKTOKEN_CACHE_DIR"] = bundled
+
+
+class ContextWindowExceededError(ValueError):
+    """The prompt does not fit the model's context window"""
+
+    def __init__(self, prompt_tokens: int, context_length: int):
+        super().__init__(
+            f"Prompt is {prompt_tokens} tokens, which does not fit the {context_length} token context window"
+        )
+        self.prompt_tokens = prompt_tokens
+        self.context_length = context_length
+
+
+class TokenCounter:
+    """
+    Token counts of message contents, memoized per tokenizer.
+
+    Counts are keyed by a digest of the text, so repeated contents such as a
+    large shared system prompt are encoded once without keeping the text
+    alive. ``tokenizer`` is a tiktoken encoding name (e.g. ``o200k_base``) or
+    ``approx``; an encoding that cannot be loaded falls back to ``approx``.
+    """
+
+    def __init__(self, max_entries: int = 16384):
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+        self._encoders: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _encoder(self, tokenizer: str):
+        if tokenizer not in self._encoders:
+            encoder = None
+            if tokenizer != APPROXIMATE:
+                try:
+                    _use_bundled_encodings()
+                    import tiktoken
+                    encoder = tiktoken.get_encoding(tokenizer)
+                except Exception as e:
+                    logger.warning(f"Tokenizer {tokenizer} is unavailable, estimating token counts instead: {str(e)}")
+            self._encoders[tokenizer] = encoder
+        return self._encoders[tokenizer]
+
+    def load(self, tokenizers: Iterable[str]) -> None:
+        """Load the encoders of ``tokenizers``; loading one takes a few hundred ms, so run it in a thread"""
+        for tokenizer in tokenizers:
+            self._encoder(tokenizer)
+
+    @staticmethod
+    def _key(text: str, tokenizer: str) -> Tuple[str, bytes]:
+        return tokenizer, hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def _store(self, key: Tuple[str, bytes], count: int) -> None:
+        self._counts[key] = count
+        if len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+
+    def count_text(self, text: str, tokenizer: str) -> int:
+        encoder = self._encoder(tokenizer)
+        if encoder is None:
+            return (len(text) + 3) // 4
+        key = self._key(text, tokenizer)
+        count = self._counts.get(key)
+        if count is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return count
+        self.misses += 1
+        count = len(encoder.encode(text, disallowed_special=()))
+        self._store(key, count)
+        return count
+
+    async def prefetch(self, texts: Iterable[str], tokenizer: str) -> None:
+        """
+        Count ``texts`` ahead of count_text without blocking the event loop.
+
+        A missing encoder is loaded in a worker thread, and so are the texts
+        that are not memoized yet when they add up to OFFLOAD_CHARS or more;
+        smaller misses are left to count_text. Only the encoding runs in the
+        thread, the memo is updated on the event loop.
+        """
+        if tokenizer not in self._encoders:
+            await asyncio.to_thread(self._encoder, tokenizer)
+        encoder = self._encoders[tokenizer]
+        if encoder is None:
+            return
+        misses = {}
+        for text in texts:
+            key = self._key(text, tokenizer)
+            if key not in self._counts:
+                misses[key] = text
+        if sum(len(text) for text in misses.values()) < OFFLOAD_CHARS:
+            return
+
+        def encode() -> List[int]:
+            return [len(encoder.encode(text, disallowed_special=())) for text in misses.values()]
+
+        counts = await asyncio.to_thread(encode)
+        self.misses += len(misses)
+        for key, count in zip(misses, counts):
+            self._store(key, count)
+
+    def count_message(self, message: ChatMessage, tokenizer: str) -> int:
+        return MESSAGE_OVERHEAD_TOKENS + self.count_text(message.content, tokenizer)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._counts), "hits": self.hits, "misses": self.misses}
+
+
+class Preflight:
+    """
+    Check a request against the model's context window before it goes upstream.
+
+    Oversized conversations are rejected or trimmed according to the strategy:
+
+    * ``reject`` - fail with ContextWindowExceededError.
+    * ``drop_oldest`` - drop the oldest messages, whatever their role.
+    * ``keep_system`` - drop the oldest messages but keep system messages.
+
+    The last message is never dropped, and room for ``min_completion_tokens``
+    is always left. ``max_tokens`` is clamped to what is left of the window.
+    On the event loop use ``acheck``, which encodes large prompts in a thread.
+    """
+
+    def __init__(self, settings: PreflightSettings):
+        self.settings = settings
+        self.counter = TokenCounter(settings.cache_entries)
+
+    @staticmethod
+    def _tools_text(request: ChatCompletionRequest) -> Optional[str]:
+        if not request.tools:
+            return None
+        return json.dumps([tool.model_dump(exclude_none=True) for tool in request.tools], sort_keys=True)
+
+    def _tools_tokens(self, request: ChatCompletionRequest, tokenizer: str) -> int:
+        tools = self._tools_text(request)
+        return 0 if tools is None else self.counter.count_text(tools, tokenizer)
+
+    async def acheck(self, request: ChatCompletionRequest, context_length: int, tokenizer: str, strategy: str) -> ChatCompletionRequest:
+        """check() that loads encoders and encodes large uncached prompts off the event loop"""
+        texts = [message.content for message in request.messages]
+        tools = self._tools_text(request)
+        if tools is not None:
+            texts.append(tools)
+        await self.counter.prefetch(texts, tokenizer)
+        return self.check(request, context_length, tokenizer, strategy)
+
+    def check(self, request: ChatCompletionRequest, context_length: int, tokenizer: str, strategy: str) -> ChatCompletionRequest:
+        messages: List[ChatMessage] = list(request.messages)
+        counts = [self.counter.count_message(message, tokenizer) for message in messages]
+        fixed = REPLY_OVERHEAD_TOKENS + self._tools_tokens(request, tokenizer)
+        prompt_tokens = fixed + sum(counts)
+        budget = context_length - self.settings.min_completion_tokens
+
+        if prompt_tokens > budget:
+            if strategy == "reject":
+                raise ContextWindowExceededError(prompt_tokens, context_length)
+            index = 0
+            while prompt_tokens > budget and index < len(messages) - 1:
+                if strategy == "keep_system" and messages[index].role == "system":
+                    index += 1
+                    continue
+                prompt_tokens -= counts.pop(index)
+                messages.pop(index)
+            if prompt_tokens > budget:
+                raise ContextWindowExceededError(prompt_tokens, context_length)
+            logger.info(f"Trimmed {len(request.messages) - len(messages)} messages to fit {request.model} context window")
+
+        update: Dict[str, Any] = {}
+        if len(messages) != len(request.messages):
+            update["messages"] = messages
+        available = context_length - prompt_tokens
+        if request.max_tokens is not None and request.max_tokens > available:
+            update["max_tokens"] = available
+        return request.model_copy(update=update) if update else request
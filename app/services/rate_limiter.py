@@ -0,0 +1,240 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from ..config.config import Quota, RateLimitSettings
+from ..models.chat_models import ChatCompletionRequest
+from .streaming import SSE_DONE
+
+# (bucket key, capacity per minute, cost)
+BucketRequest = Tuple[str, float, float]
+
+
+def _refill(tokens: float, updated_at: float, capacity: float, now: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * capacity / 60)
+
+
+def _take(states: List[Tuple[float, float]], requests: List[BucketRequest], now: float) -> Tuple[bool, List[float], float]:
+    """
+    Apply ``requests`` to the bucket ``states`` (tokens, updated_at).
+
+    Returns whether every bucket had enough tokens, the tokens left in each
+    bucket and, if denied, how many seconds until it would be allowed. A cost
+    above the capacity is allowed once the bucket is full, leaving it in debt.
+    """
+    levels = [_refill(tokens, updated_at, capacity, now) for (tokens, updated_at), (_, capacity, _) in zip(states, requests)]
+    retry_after = 0.0
+    for level, (_, capacity, cost) in zip(levels, requests):
+        needed = min(cost, capacity)
+        if level < needed:
+            retry_after = max(retry_after, (needed - level) * 60 / capacity)
+    if retry_after > 0:
+        return False, levels, retry_after
+    return True, [level - cost for level, (_, _, cost) in zip(levels, requests)], 0.0
+
+
+class MemoryBucketStore:
+    """Token buckets held in this process"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, requests: List[BucketRequest], now: float) -> Tuple[bool, List[float], float]:
+        states = [self._buckets.get(key, (capacity, now)) for key, capacity, _ in requests]
+        allowed, levels, retry_after = _take(states, requests, now)
+        if allowed:
+            for (key, _, _), level in zip(requests, levels):
+                self._buckets[key] = (level, now)
+        return allowed, levels, retry_after
+
+    def adjust(self, key: str, capacity: float, delta: float, now: float) -> None:
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        self._buckets[key] = (_refill(tokens, updated_at, capacity, now) - delta, now)
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file shared by every worker on the host.
+
+    Each check reads and updates the tenant's buckets in one immediate
+    transaction, so concurrent workers never both spend the same tokens.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _load(self, key: str, capacity: float, now: float) -> Tuple[float, float]:
+        row = self._conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else (capacity, now)
+
+    def _store(self, key: str, tokens: float, now: float) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+            (key, tokens, now)
+        )
+
+    def take(self, requests: List[BucketRequest], now: float) -> Tuple[bool, List[float], float]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                states = [self._load(key, capacity, now) for key, capacity, _ in requests]
+                allowed, levels, retry_after = _take(states, requests, now)
+                if allowed:
+                    for (key, _, _), level in zip(requests, levels):
+                        self._store(key, level, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, levels, retry_after
+
+    def adjust(self, key: str, capacity: float, delta: float, now: float) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated_at = self._load(key, capacity, now)
+                self._store(key, _refill(tokens, updated_at, capacity, now) - delta, now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimitDecision:
+    __slots__ = ("allowed", "quota", "remaining_requests", "remaining_tokens", "retry_after")
+
+    def __init__(self, allowed: bool, quota: Quota, remaining_requests: Optional[float], remaining_tokens: Optional[float], retry_after: float):
+        self.allowed = allowed
+        self.quota = quota
+        self.remaining_requests = remaining_requests
+        self.remaining_tokens = remaining_tokens
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.quota.requests_per_minute:
+            limit = self.quota.requests_per_minute
+            remaining = max(0.0, self.remaining_requests)
+            headers["x-ratelimit-limit-requests"] = str(limit)
+            headers["x-ratelimit-remaining-requests"] = str(int(remaining))
+            headers["x-ratelimit-reset-requests"] = f"{(limit - remaining) * 60 / limit:.3f}s"
+        if self.quota.tokens_per_minute:
+            limit = self.quota.tokens_per_minute
+            remaining = max(0.0, self.remaining_tokens)
+            headers["x-ratelimit-limit-tokens"] = str(limit)
+            headers["x-ratelimit-remaining-tokens"] = str(int(remaining))
+            headers["x-ratelimit-reset-tokens"] = f"{(limit - remaining) * 60 / limit:.3f}s"
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimiter:
+    """
+    Per-tenant requests-per-minute and tokens-per-minute limits.
+
+    Each tenant has one token bucket per limit, refilled continuously at its
+    per-minute rate. A request spends one request token and its estimated
+    token count up front; once the real usage is known, ``reconcile`` charges
+    or refunds the difference.
+    """
+
+    def __init__(self, settings: RateLimitSettings):
+        self.settings = settings
+        self.store = SQLiteBucketStore(settings.state_path) if settings.state_path else MemoryBucketStore()
+
+    async def _run(self, fn, *args):
+        # The shared store does file I/O, keep it off the event loop
+        if isinstance(self.store, SQLiteBucketStore):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def quota_for(self, tenant: str) -> Quota:
+        return self.settings.tenants.get(tenant, self.settings.default)
+
+    def estimate_tokens(self, request: ChatCompletionRequest) -> int:
+        """Rough prompt size (4 characters per token) plus the completion budget"""
+        prompt_chars = sum(len(message.content or "") for message in request.messages)
+        return prompt_chars // 4 + (request.max_tokens or self.settings.default_completion_tokens)
+
+    def _requests(self, tenant: str, quota: Quota, tokens: int) -> List[BucketRequest]:
+        requests = []
+        if quota.requests_per_minute:
+            requests.append((f"{tenant}:rpm", float(quota.requests_per_minute), 1.0))
+        if quota.tokens_per_minute:
+            requests.append((f"{tenant}:tpm", float(quota.tokens_per_minute), float(tokens)))
+        return requests
+
+    async def check(self, tenant: str, estimated_tokens: int) -> RateLimitDecision:
+        quota = self.quota_for(tenant)
+        requests = self._requests(tenant, quota, estimated_tokens)
+        if not requests:
+            return RateLimitDecision(True, quota, None, None, 0.0)
+        allowed, levels, retry_after = await self._run(self.store.take, requests, time.time())
+        remaining: Dict[str, float] = {key.rsplit(":", 1)[1]: level for (key, _, _), level in zip(requests, levels)}
+        return RateLimitDecision(allowed, quota, remaining.get("rpm"), remaining.get("tpm"), retry_after)
+
+    async def reconcile(self, tenant: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charge (or refund) the difference between the estimated and the reported token usage"""
+        quota = self.quota_for(tenant)
+        delta = actual_tokens - estimated_tokens
+        if not quota.tokens_per_minute or delta == 0:
+            return
+        await self._run(self.store.adjust, f"{tenant}:tpm", float(quota.tokens_per_minute), float(delta), time.time())
+
+    async def metered(self, stream: AsyncIterator[bytes], tenant: str, estimated_tokens: int) -> AsyncGenerator[bytes, None]:
+        """
+        Relay the SSE events of a streamed completion and reconcile once it ends.
+
+        The usage sent with the last chunk (``stream_options.include_usage``) is
+        charged when present; a stream that failed before any chunk is refunded,
+        and anything else (no usage, client gone) keeps the estimate.
+        """
+        events = 0
+        last = None
+        try:
+            async for event in stream:
+                if event != SSE_DONE:
+                    events += 1
+                    last = event
+                yield event
+        finally:
+            await self.reconcile(tenant, estimated_tokens, streamed_tokens(last, events, estimated_tokens))
+
+
+def streamed_tokens(last_event: Optional[bytes], events: int, estimated_tokens: int) -> int:
+    """Tokens used by a stream, given its last event before [DONE] and the number of events"""
+    if last_event is None or (events == 1 and b'"streaming_error"' in last_event):
+        return 0
+    if b'"usage"' in last_event:
+        try:
+            usage = json.loads(last_event[len(b"data: "):]).get("usage") or {}
+        except ValueError:
+            usage = {}
+        if isinstance(usage.get("total_tokens"), int):
+            return usage["total_tokens"]
+    return estimated_tokens
+
+
+def tenant_of(user: Optional[Dict[str, Any]]) -> str:
+    """Tenant id of a verified token payload: its subject, else the authorized party"""
+    if not user:
+        return "anonymous"
+    return str(user.get("sub") or user.get("azp") or "anonymous")
@@ -0,0 +1,251 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from ..config.config import CacheSettings
+from ..models.chat_models import ChatCompletionRequest
+from .fuzzy_cache import FuzzyIndex
+
+logger = logging.getLogger(__name__)
+
+# Request fields that do not change the completion and are left out of the cache key
+_NON_KEY_FIELDS = {"stream", "session"}
+
+
+def cache_key(request: ChatCompletionRequest) -> str:
+    """
+    Canonical hash of a chat completion request.
+
+    Covers provider/model, messages, tools and sampling parameters. Fields are
+    serialized with sorted keys and no whitespace so that equivalent requests
+    always hash to the same key.
+    """
+    params = request.model_dump(exclude_none=True, exclude=_NON_KEY_FIELDS)
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def parse_cache_control(header: Optional[str]) -> Tuple[bool, bool]:
+    """
+    Map a request Cache-Control header to (read, write) flags.
+
+    ``no-cache`` skips the lookup but refreshes the stored entry; ``no-store``
+    skips the cache entirely.
+    """
+    if not header:
+        return True, True
+    directives = {directive.strip().lower() for directive in header.split(",")}
+    if "no-store" in directives:
+        return False, False
+    if "no-cache" in directives:
+        return False, True
+    return True, True
+
+
+class MemoryTier:
+    """LRU of serialized responses bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() >= entry[0]:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, expires_at: float, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (expires_at, value)
+        self.size_bytes += len(value)
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskTier:
+    """
+    SQLite-backed tier that keeps cached responses across restarts and is
+    shared by the workers of a host. With ``max_bytes`` the responses that
+    expire soonest are dropped as soon as a write takes the stored values
+    over it, down to ``PURGE_TARGET`` of it; the total is kept in the database
+    so the bound holds across workers without summing the table on each write.
+    """
+
+    # Expired rows are purged once every this many writes
+    PURGE_INTERVAL = 1000
+    # Share of max_bytes left after evicting, so a full tier does not evict on every write
+    PURGE_TARGET = 0.9
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS usage (bytes INTEGER NOT NULL)")
+            # Tables written before the total was kept
+            self._conn.execute(
+                "INSERT INTO usage SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses "
+                "WHERE NOT EXISTS (SELECT 1 FROM usage)"
+            )
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def put(self, key: str, expires_at: float, value: bytes) -> None:
+        with self._lock, self._transaction():
+            replaced = self._conn.execute("SELECT LENGTH(value) FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, value)
+            )
+            self._add_bytes(len(value) - (replaced[0] if replaced else 0))
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._purge_expired()
+            if self.max_bytes and self._stored_bytes() > self.max_bytes:
+                self._evict(int(self.max_bytes * self.PURGE_TARGET))
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT bytes FROM usage").fetchone()[0]
+
+    def _add_bytes(self, delta: int) -> None:
+        if delta:
+            self._conn.execute("UPDATE usage SET bytes = bytes + ?", (delta,))
+
+    def _purge_expired(self) -> None:
+        now = time.time()
+        expired = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses WHERE expires_at <= ?", (now,)
+        ).fetchone()[0]
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._add_bytes(-expired)
+
+    def _evict(self, target_bytes: int) -> None:
+        excess = self._stored_bytes() - target_bytes
+        evicted = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, LENGTH(value) FROM responses ORDER BY expires_at"):
+            evicted.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._add_bytes(-freed)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Exact-match cache of serialized chat completion responses.
+
+    Lookups go to the in-memory LRU first and then to the optional SQLite tier;
+    disk hits are promoted to memory. Disk access runs in a worker thread so it
+    never blocks the event loop. When the fuzzy tier is enabled, responses are
+    also indexed for near-duplicate lookups with ``get_similar``.
+    """
+
+    def __init__(self, settings: CacheSettings):
+        self.settings = settings
+        self.memory = MemoryTier(settings.max_memory_bytes)
+        self.disk = DiskTier(settings.disk_path, settings.disk_max_bytes) if settings.disk_path else None
+        self.fuzzy = None
+        if settings.fuzzy.enabled:
+            self.fuzzy = FuzzyIndex(
+                num_perm=settings.fuzzy.num_perm,
+                bands=settings.fuzzy.bands,
+                max_entries=settings.fuzzy.max_entries,
+                max_memory_bytes=settings.fuzzy.max_memory_bytes
+            )
+
+    def is_cacheable(self, request: ChatCompletionRequest) -> bool:
+        if request.stream:
+            return False
+        if self.settings.deterministic_only:
+            return request.temperature == 0
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                self.memory.put(key, *entry)
+        return entry[1] if entry else None
+
+    def get_similar(self, request: ChatCompletionRequest, threshold: float) -> Optional[bytes]:
+        if self.fuzzy is None:
+            return None
+        return self.fuzzy.get(request, threshold)
+
+    async def put(self, key: str, value: bytes, ttl: int, request: Optional[ChatCompletionRequest] = None) -> None:
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        self.memory.put(key, expires_at, value)
+        if self.fuzzy is not None and request is not None:
+            self.fuzzy.put(key, request, value, expires_at)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, expires_at, value)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to write response to disk cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts and memory footprint of each in-memory tier"""
+        stats = {"entries": len(self.memory), "memory_bytes": self.memory.size_bytes}
+        if self.fuzzy is not None:
+            stats["fuzzy_entries"] = len(self.fuzzy)
+            stats["fuzzy_memory_bytes"] = self.fuzzy.memory_bytes()
+        return stats
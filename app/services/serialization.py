@@ -0,0 +1,97 @@
+from typing import Any, Dict
+import json
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # litellm message parts (tool calls, function calls) are pydantic models
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    return str(obj)
+
+
+# Fields of a ModelResponse that make up the response body returned to clients
+RESPONSE_FIELDS = {
+    "id": True,
+    "created": True,
+    "model": True,
+    "object": True,
+    "choices": {
+        "__all__": {
+            "index": True,
+            "message": {"role", "content", "tool_calls", "function_call", "provider_specific_fields"},
+            "finish_reason": True,
+        }
+    },
+    "usage": {"prompt_tokens", "completion_tokens", "total_tokens"},
+}
+
+
+def completion_to_dict(completion) -> Dict[str, Any]:
+    """Convert a ModelResponse to the response body returned to clients"""
+    return {
+        "id": completion.id,
+        "created": completion.created,
+        "model": completion.model,
+        "object": completion.object,
+        "choices": [
+            {
+                "index": choice.index,
+                "message": {
+                    "role": choice.message.role,
+                    "content": choice.message.content,
+                    "tool_calls": choice.message.tool_calls,
+                    "function_call": choice.message.function_call,
+                    "provider_specific_fields": choice.message.provider_specific_fields
+                },
+                "finish_reason": choice.finish_reason
+            }
+            for choice in completion.choices
+        ],
+        "usage": {
+            "prompt_tokens": completion.usage.prompt_tokens,
+            "completion_tokens": completion.usage.completion_tokens,
+            "total_tokens": completion.usage.total_tokens
+        }
+    }
+
+
+def completion_to_json(completion) -> bytes:
+    """
+    Encode the response body of a ModelResponse in one pass.
+
+    Produces the same JSON as ``completion_to_dict`` using pydantic's compiled
+    serializer, without building the intermediate dict or dumping each tool
+    call separately.
+    """
+    return completion.model_dump_json(include=RESPONSE_FIELDS).encode()
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode ``obj`` to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RawJSONResponse(Response):
+    """
+    JSON response for content that is already encoded, or encoded here in one pass.
+
+    Returning it from a route bypasses FastAPI's response_model validation and
+    jsonable_encoder walk.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,169 @@
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters", "closing")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+        self.closing = False
+
+
+class _Broadcast:
+    """
+    Fan-out of one async stream to any number of subscribers.
+
+    The stream is pumped by its own task, at most ``max_buffered`` items ahead
+    of the slowest subscriber, so a slow client slows the upstream stream down
+    as it would without coalescing and memory stays bounded. Subscribers that
+    join late replay from the first item as long as no item has been dropped
+    from the buffer yet. The pump is cancelled only when the last subscriber
+    goes away.
+    """
+
+    def __init__(self, source: AsyncIterator[Any], max_buffered: int):
+        self.items: List[Any] = []
+        # Index in the stream of items[0]
+        self.offset = 0
+        self.max_buffered = max(1, max_buffered)
+        self.done = False
+        self.error: Optional[BaseException] = None
+        # Index of the next item of each subscriber
+        self.positions: Dict[object, int] = {}
+        self.closing = False
+        self._changed = asyncio.Event()
+        self._consumed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    @property
+    def joinable(self) -> bool:
+        return not self.closing and self.offset == 0
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _notify_consumed(self) -> None:
+        consumed, self._consumed = self._consumed, asyncio.Event()
+        consumed.set()
+
+    def _trim(self) -> int:
+        """Drop the items every subscriber has read and return how many are left"""
+        if self.positions:
+            read = min(self.positions.values()) - self.offset
+            if read > 0:
+                del self.items[:read]
+                self.offset += read
+        return len(self.items)
+
+    async def _pump(self, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+                # Items are only dropped once the buffer is full, so late subscribers can replay until then
+                while len(self.items) >= self.max_buffered and self._trim() >= self.max_buffered:
+                    await self._consumed.wait()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncGenerator[Any, None]:
+        cursor = object()
+        self.positions[cursor] = self.offset
+        try:
+            while True:
+                index = self.positions[cursor]
+                if index < self.offset + len(self.items):
+                    item = self.items[index - self.offset]
+                    self.positions[cursor] = index + 1
+                    self._notify_consumed()
+                    yield item
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            del self.positions[cursor]
+            self._notify_consumed()
+            if not self.positions and not self.task.done():
+                self.closing = True
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one.
+
+    The first caller for a key starts the call; callers that arrive while it is
+    in flight wait for the same result (``do``) or subscribe to the same stream
+    (``stream``). A caller that is cancelled only stops waiting; the shared call
+    is cancelled once nobody is waiting for it anymore.
+    """
+
+    def __init__(self, max_buffered: int = 32):
+        self.max_buffered = max_buffered
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _forget(self, registry: Dict[str, Any], key: str, entry: Any) -> None:
+        if registry.get(key) is entry:
+            del registry[key]
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` unless an identical call is in flight, and return its result"""
+        call = self._calls.get(key)
+        if call is None or call.closing:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.closing = True
+                call.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[T]]) -> AsyncGenerator[T, None]:
+        """Subscribe to the in-flight stream for ``key``, starting it from ``factory`` if needed"""
+        # Looked up and joined in one step when iteration starts, so no item can be dropped in between
+        broadcast = self._streams.get(key)
+        if broadcast is None or not broadcast.joinable:
+            broadcast = _Broadcast(factory(), self.max_buffered)
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._forget(self._streams, key, broadcast))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        subscription = broadcast.subscribe()
+        try:
+            async for item in subscription:
+                yield item
+        finally:
+            await subscription.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.followers
+        return {
+            "upstream_calls": self.leaders,
+            "coalesced_requests": self.followers,
+            "coalescing_ratio": self.followers / total if total else 0.0,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
@@ -0,0 +1,53 @@
+from typing import Any, Dict, Optional, Tuple
+import json
+
+SSE_DONE = b"data: [DONE]\n\n"
+
+# Delta attributes that force the generic serializer when set
+_EXTRA_DELTA_FIELDS = ("role", "tool_calls", "function_call", "reasoning_content", "thinking_blocks", "audio")
+
+
+class SSEEncoder:
+    """
+    Encode litellm stream chunks as Server-Sent Events.
+
+    The chunk envelope (id, created, model) is constant for the lifetime of a
+    stream, so it is serialized once and reused. Plain content deltas, which are
+    the vast majority of chunks, only JSON-escape the new text. Anything else
+    (role, tool calls, finish reason) goes through pydantic's serializer.
+    """
+
+    def __init__(self):
+        self._envelope_key: Optional[Tuple[Any, ...]] = None
+        self._prefix: bytes = b""
+
+    def encode(self, chunk: Any) -> bytes:
+        choices = chunk.choices
+        if len(choices) == 1:
+            choice = choices[0]
+            delta = choice.delta
+            content = delta.content
+            if (
+                isinstance(content, str)
+                and choice.index == 0
+                and choice.finish_reason is None
+                and all(getattr(delta, field, None) is None for field in _EXTRA_DELTA_FIELDS)
+            ):
+                return self._prefix_for(chunk) + json.dumps(content).encode() + b"}}]}\n\n"
+        return b"data: " + chunk.model_dump_json(exclude_none=True).encode() + b"\n\n"
+
+    def _prefix_for(self, chunk: Any) -> bytes:
+        key = (chunk.id, chunk.created, chunk.model, chunk.system_fingerprint)
+        if key != self._envelope_key:
+            envelope = {"id": chunk.id, "created": chunk.created, "model": chunk.model, "object": chunk.object}
+            if chunk.system_fingerprint is not None:
+                envelope["system_fingerprint"] = chunk.system_fingerprint
+            head = json.dumps(envelope, separators=(",", ":"))[:-1]
+            self._prefix = f'data: {head},"choices":[{{"index":0,"delta":{{"content":'.encode()
+            self._envelope_key = key
+        return self._prefix
+
+    @staticmethod
+    def encode_event(payload: Dict[str, Any]) -> bytes:
+        """Encode an arbitrary JSON payload (e.g. an error) as an SSE event"""
+        return b"data: " + json.dumps(payload).encode() + b"\n\n"
@@ -0,0 +1,151 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import logging
+import threading
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import StatusCode
+
+logger = logging.getLogger(__name__)
+
+_TRACE_ID_HIGH_BITS = 2 ** 64
+
+
+class BatchExportProcessor(SpanProcessor):
+    """
+    Export spans in batches from a background thread.
+
+    Ending a span only appends it to a bounded queue; when the queue is full
+    the span is dropped and counted instead of blocking the request or
+    growing memory while the collector is slow or down. The queue is flushed
+    every ``schedule_delay`` seconds or as soon as a full batch is waiting.
+    """
+
+    def __init__(self, exporter: SpanExporter, max_queue_size: int = 2048, max_batch_size: int = 512, schedule_delay: float = 1.0):
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: Deque[ReadableSpan] = deque()
+        self._export_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._worker, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        pass
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if self._stopped or not span.context.trace_flags.sampled:
+            return
+        if len(self._queue) >= self.max_queue_size:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if len(self._queue) >= self.max_batch_size:
+            self._wake.set()
+
+    def _worker(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.schedule_delay)
+            self._wake.clear()
+            self._export_queued()
+
+    def _export_queued(self) -> None:
+        with self._export_lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+                try:
+                    result = self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning(f"Span export failed: {str(e)}")
+                    result = SpanExportResult.FAILURE
+                if result == SpanExportResult.SUCCESS:
+                    self.exported += len(batch)
+                else:
+                    self.failed += len(batch)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self._export_queued()
+        return True
+
+    def shutdown(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+        self._export_queued()
+        self.exporter.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": len(self._queue), "exported": self.exported, "dropped": self.dropped, "failed": self.failed}
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Decide which traces to keep once their local root span has ended.
+
+    Spans are held per trace until the root ends. A trace is passed on to
+    ``processor`` when any of its spans failed, when the root took at least
+    ``slow_threshold`` seconds, or when it falls in the ``sample_rate`` share
+    of traces. The share is taken from the high bits of the trace id, so it
+    is independent of head sampling, which uses the low bits. At most
+    ``max_pending_traces`` unfinished traces are held; the oldest is dropped
+    beyond that.
+    """
+
+    def __init__(self, processor: SpanProcessor, sample_rate: float, slow_threshold: float, max_pending_traces: int = 10000):
+        self.processor = processor
+        self.sample_rate = sample_rate
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        self.max_pending_traces = max_pending_traces
+        self.kept = 0
+        self.sampled_out = 0
+        self.evicted = 0
+        self._pending: Dict[int, List[ReadableSpan]] = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Optional[Context] = None) -> None:
+        pass
+
+    def _keep(self, spans: List[ReadableSpan], root: ReadableSpan) -> bool:
+        if any(span.status.status_code is StatusCode.ERROR for span in spans):
+            return True
+        if root.end_time - root.start_time >= self.slow_threshold_ns:
+            return True
+        return (root.context.trace_id >> 64) < self.sample_rate * _TRACE_ID_HIGH_BITS
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id
+        is_root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            spans = self._pending.pop(trace_id, [])
+            spans.append(span)
+            if not is_root:
+                self._pending[trace_id] = spans
+                if len(self._pending) > self.max_pending_traces:
+                    del self._pending[next(iter(self._pending))]
+                    self.evicted += 1
+                return
+        if not self._keep(spans, span):
+            self.sampled_out += 1
+            return
+        self.kept += 1
+        for ended in spans:
+            self.processor.on_end(ended)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.processor.force_flush(timeout_millis)
+
+    def shutdown(self) -> None:
+        self.processor.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"kept": self.kept, "sampled_out": self.sampled_out, "pending": len(self._pending), "evicted": self.evicted}
+        if hasattr(self.processor, "stats"):
+            stats.update(self.processor.stats())
+        return stats
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of per-request token verification cost.
+
+Signs an RS256 token with a local key, serves the matching JWKS from memory,
+and times AuthService.verify_token with the verified-token cache enabled and
+disabled.
+
+Usage:
+    python benchmarks/bench_auth.py --iterations 5000
+"""
+import argparse
+import asyncio
+import base64
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.services.auth_service import AuthService
+from app.services.token_cache import TokenCache
+
+
+def b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, byteorder="big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_fixture(service: AuthService):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+    jwks = {"keys": [{"kty": "RSA", "kid": "bench", "n": b64url_uint(numbers.n), "e": b64url_uint(numbers.e)}]}
+    token = jwt.encode(
+        {"sub": "bench@clients", "aud": service.audience, "iss": service.issuer, "exp": int(time.time()) + 3600},
+        private_key,
+        algorithm="RS256",
+        headers={"kid": "bench"},
+    )
+    return jwks, token
+
+
+async def time_verify(service: AuthService, token: str, iterations: int) -> float:
+    await service.verify_token(token)  # warm the JWKS cache
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await service.verify_token(token)
+    return (time.perf_counter() - start) / iterations
+
+
+async def main(args):
+    service = AuthService()
+    jwks, token = make_fixture(service)
+
+    print(f"{'mode':<12} {'us/request':>12}")
+    with mock.patch.object(service.jwks_cache, "_fetch_jwks", mock.AsyncMock(return_value=jwks)):
+        for label, cache_size in (("no cache", 0), ("cache", 10000)):
+            service.token_cache = TokenCache(max_size=cache_size)
+            per_request = await time_verify(service, token, args.iterations)
+            print(f"{label:<12} {per_request * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark token verification with and without the token cache")
+    parser.add_argument("--iterations", type=int, default=5000, help="Verifications per mode")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for LLMService against a mocked slow upstream.
+
+Fires N concurrent chat completions (N = 1 .. 500) at LLMService while the
+upstream call is replaced by an async sleep, and reports latency percentiles
+together with event loop lag. With the async execution path p99 should stay
+close to the mocked upstream latency regardless of N.
+
+Usage:
+    python benchmarks/bench_concurrency.py --latency 0.2 --levels 1,10,100,500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from litellm import ModelResponse
+
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def make_upstream(latency: float):
+    """Build an async stand-in for litellm.acompletion with a fixed latency"""
+    async def fake_acompletion(**params):
+        await asyncio.sleep(latency)
+        return ModelResponse(
+            model=params["model"],
+            choices=[{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            usage={"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+        )
+    return fake_acompletion
+
+
+async def measure_loop_lag(stop: asyncio.Event, samples: list, interval: float = 0.01):
+    """Sample how late the event loop wakes up, a proxy for /health latency"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+async def run_level(service: LLMService, concurrency: int):
+    request = ChatCompletionRequest(
+        model="azure/gpt-4.1-mini",
+        messages=[{"role": "user", "content": "ping"}],
+    )
+
+    async def one_call():
+        start = time.perf_counter()
+        await service.create_chat_completion(request.model_copy())
+        return time.perf_counter() - start
+
+    stop = asyncio.Event()
+    lag_samples = []
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lag_samples))
+    latencies = await asyncio.gather(*(one_call() for _ in range(concurrency)))
+    stop.set()
+    await lag_task
+    return latencies, lag_samples or [0.0]
+
+
+async def main(args):
+    service = LLMService()
+    # Lift (or set) the provider limit so the benchmark measures the event loop, not the queue
+    service.config.providers["azure"].max_concurrency = args.max_concurrency
+
+    print(f"mocked upstream latency: {args.latency * 1000:.0f} ms, max_concurrency: {args.max_concurrency}")
+    print(f"{'in-flight':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10} {'loop lag p99 ms':>16}")
+    with mock.patch.object(llm_service_module, "acompletion", make_upstream(args.latency)):
+        for level in args.levels:
+            latencies, lag = await run_level(service, level)
+            print(
+                f"{level:>10} "
+                f"{statistics.median(latencies) * 1000:>10.1f} "
+                f"{percentile(latencies, 99) * 1000:>10.1f} "
+                f"{max(latencies) * 1000:>10.1f} "
+                f"{percentile(lag, 99) * 1000:>16.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LLMService concurrency against a mocked upstream")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mocked upstream latency in seconds")
+    parser.add_argument("--levels", default="1,10,50,100,250,500", help="Comma separated in-flight request counts")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Provider limit to apply (default: unlimited)")
+
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.levels.split(",")]
+    asyncio.run(main(args))
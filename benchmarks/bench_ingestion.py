@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Latency and allocations of ingesting a large chat completion request.
+
+Posts a ~1 MB conversation to an in-process app through httpx's ASGI
+transport and takes it as far as the params handed to the upstream call:
+
+* ``model`` - the previous path: FastAPI decodes the body with json.loads and
+              validates the dict into a ChatCompletionRequest, the service
+              copies it with ``request.dict`` and formats it into a debug
+              message that is then dropped
+* ``raw``   - the body is decoded from bytes by ``chat_request_body``, dumped
+              once with ``model_dump`` and only formatted if debug logging
+              is on
+
+Latency is wall time per request. Allocations are the peak traced by
+tracemalloc while one request is served.
+
+Usage:
+    python benchmarks/bench_ingestion.py --size-kb 1024 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.models import ChatCompletionRequest
+from app.routes import chat_request_body
+
+logger = logging.getLogger("bench_ingestion")
+
+
+def make_body(kilobytes: int) -> bytes:
+    # Alternating turns of ~5 KB each, like a long agent transcript
+    content = "lorem ipsum dolor sit amet " * 190
+    turns = max(1, kilobytes * 1024 // len(content))
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": content} for i in range(turns)]
+    return json.dumps({"model": "azure/gpt-4.1-mini", "messages": messages, "temperature": 0.2}).encode()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/model")
+    async def via_model(chat_request: ChatCompletionRequest):
+        request_params = chat_request.dict(exclude_none=True)
+        logger.debug(f"Request params: {request_params}")
+        return {"messages": len(request_params["messages"])}
+
+    @app.post("/raw")
+    async def via_raw(chat_request: ChatCompletionRequest = Depends(chat_request_body)):
+        request_params = chat_request.model_dump(exclude_none=True)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Request params: {request_params}")
+        return {"messages": len(request_params["messages"])}
+
+    return app
+
+
+async def post(client: httpx.AsyncClient, path: str, body: bytes) -> None:
+    response = await client.post(path, content=body, headers={"content-type": "application/json"})
+    response.raise_for_status()
+
+
+async def measure(client: httpx.AsyncClient, path: str, body: bytes, total: int):
+    """(seconds per request, peak bytes allocated while serving one request)"""
+    for _ in range(min(5, total)):
+        await post(client, path, body)
+    start = time.perf_counter()
+    for _ in range(total):
+        await post(client, path, body)
+    latency = (time.perf_counter() - start) / total
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    await post(client, path, body)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return latency, peak
+
+
+async def main(args):
+    logging.basicConfig(level=logging.WARNING)
+    # The previous path uses the deprecated pydantic v1 ``dict`` method
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    body = make_body(args.size_kb)
+    transport = httpx.ASGITransport(app=build_app())
+    print(f"body: {len(body)} bytes")
+    print(f"{'path':<6} {'latency ms':>11} {'peak alloc KB':>14}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = {}
+        for path in ("model", "raw"):
+            results[path] = await measure(client, "/" + path, body, args.requests)
+            latency, peak = results[path]
+            print(f"{path:<6} {latency * 1000:>11.2f} {peak / 1024:>14.0f}")
+    (before_latency, before_peak), (after_latency, after_peak) = results["model"], results["raw"]
+    print(f"speedup {before_latency / after_latency:.1f}x, peak allocations {after_peak / before_peak:.0%} of before")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion of large chat completion requests")
+    parser.add_argument("--size-kb", type=int, default=1024, help="Approximate request body size")
+    parser.add_argument("--requests", type=int, default=50)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Cost of request logging on the event loop.
+
+Drives an in-process app with the auth middleware (token verification
+stubbed) through httpx's ASGI transport, with log output going to a stream
+whose writes take ``--write-us`` microseconds, like stdout piped to a busy
+log collector:
+
+* ``stream`` - the previous setup: a StreamHandler on the event loop thread
+               and the per-request INFO lines the middleware used to write,
+               one of them with the token payload
+* ``queue``  - the LoggingPipeline with one JSON access log line per request,
+               written by a background thread
+
+Usage:
+    python benchmarks/bench_logging.py --requests 5000 --concurrency 50 --write-us 200
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI
+
+from app.config.config import LoggingSettings
+from app.middleware.access_log import AccessLogMiddleware
+from app.middleware.auth_middleware import AuthMiddleware
+from app.services.logging_pipeline import TEXT_FORMAT, LoggingPipeline
+
+PAYLOAD = {"sub": "bench@clients", "aud": "https://llm-proxy", "iss": "https://example.auth0.com/", "scope": "read write", "exp": 2000000000}
+
+
+class SlowStream:
+    """Text stream whose writes block for a fixed time"""
+
+    def __init__(self, write_seconds: float):
+        self.write_seconds = write_seconds
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.write_seconds)
+        self.lines += text.count("\n")
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class PreviousLogging:
+    """Reproduces the INFO lines AuthMiddleware wrote for every authenticated request"""
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = logging.getLogger("app.middleware.auth_middleware")
+
+    async def __call__(self, scope, receive, send):
+        self.logger.info(f"Processing request for path: {scope['path']}")
+        self.logger.info("Verifying token...")
+        self.logger.info(f"Token verified successfully. Payload: {PAYLOAD}")
+        self.logger.info("User payload set in request state")
+        await self.app(scope, receive, send)
+
+
+def build_app(mode: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/models/list")
+    async def list_models():
+        return {"openai": ["gpt-4o"]}
+
+    app.add_middleware(AuthMiddleware)
+    if mode == "stream":
+        app.add_middleware(PreviousLogging)
+    else:
+        app.add_middleware(AccessLogMiddleware)
+    return app
+
+
+def configure(mode: str, stream: SlowStream):
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    if mode == "stream":
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.handlers = [handler]
+        return None
+    pipeline = LoggingPipeline(LoggingSettings(queue_size=10000), stream=stream)
+    root.handlers = [pipeline.handler]
+    pipeline.start()
+    return pipeline
+
+
+async def run(app: FastAPI, total: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer bench-token"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                response = await client.get("/models/list", headers=headers)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    print(f"log write latency: {args.write_us:.0f} us")
+    # The client's own request log is not part of the server's cost
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(f"{'logging':<8} {'req/s':>10} {'lines/req':>10} {'dropped':>8}")
+    with mock.patch("app.services.auth_service.AuthService.verify_token", return_value=PAYLOAD):
+        for mode in ("stream", "queue"):
+            stream = SlowStream(args.write_us / 1e6)
+            pipeline = configure(mode, stream)
+            app = build_app(mode)
+            await run(app, min(200, args.requests), args.concurrency)  # warm up
+            lines_before = stream.lines
+            rps = await run(app, args.requests, args.concurrency)
+            dropped = 0
+            if pipeline is not None:
+                dropped = pipeline.stats()["dropped"]
+                pipeline.stop()
+            print(f"{mode:<8} {rps:>10.0f} {(stream.lines - lines_before) / args.requests:>10.1f} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark request logging cost")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-us", type=float, default=200, help="Time each write to the log stream takes")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cost of recording and scraping the Prometheus metrics.
+
+* record - time to record one upstream call (in-flight gauge, status counter,
+           latency, time to first token, token counters and throughput)
+* scrape - time to render /metrics with every worker's snapshot merged in,
+           for a number of deployments and workers
+
+Usage:
+    python benchmarks/bench_metrics.py --calls 200000 --deployments 50 --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config.config import MetricsSettings
+from app.services import metrics as metrics_module
+from app.services.metrics import LLMMetrics
+
+
+def record(metrics: LLMMetrics, keys, calls: int) -> float:
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=300)
+    start = time.perf_counter()
+    for i in range(calls):
+        labels = metrics.call_started(keys[i % len(keys)])
+        started_at = time.perf_counter() - 1.5
+        metrics.call_finished(labels, started_at, "200", usage, started_at + 0.4)
+    return (time.perf_counter() - start) / calls
+
+
+def main(args):
+    keys = [f"provider{i % 4}/model-{i}/deployment-{i % 3}" for i in range(args.deployments)]
+    metrics = LLMMetrics(MetricsSettings())
+    record(metrics, keys, min(10000, args.calls))  # warm up
+    per_call = record(metrics, keys, args.calls)
+    print(f"record one upstream call: {per_call * 1e6:.2f} us")
+
+    with tempfile.TemporaryDirectory() as directory:
+        metrics = LLMMetrics(MetricsSettings(multiprocess_dir=directory))
+        record(metrics, keys, len(keys) * 10)
+        snapshot = metrics.snapshot()
+        # Snapshots of the other workers of this server, reported as alive
+        for worker in range(1, args.workers):
+            with open(os.path.join(directory, f"{os.getppid()}-{worker}.json"), "w") as f:
+                json.dump(snapshot, f)
+
+        with mock.patch.object(metrics_module, "_pid_alive", return_value=True):
+            start = time.perf_counter()
+            for _ in range(args.scrapes):
+                body = metrics.render()
+        per_scrape = (time.perf_counter() - start) / args.scrapes
+        print(
+            f"scrape {args.deployments} deployments x {args.workers} workers: {per_scrape * 1000:.1f} ms, "
+            f"{len(body) / 1024:.0f} KB, {body.count(chr(10))} samples"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark metrics recording and scraping")
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--deployments", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--scrapes", type=int, default=20)
+
+    main(parser.parse_args())
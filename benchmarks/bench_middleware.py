@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the middleware stack.
+
+Drives an in-process app through httpx's ASGI transport and compares:
+
+* ``none``        - the route with no middleware
+* ``basehttp``    - the previous layout: two BaseHTTPMiddleware layers in front
+                    of the same auth and URL rewrite logic
+* ``asgi``        - the raw ASGI AuthMiddleware and URLRewriteMiddleware
+
+Token verification is stubbed so the numbers reflect middleware overhead only.
+
+Usage:
+    python benchmarks/bench_middleware.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware.auth_middleware import AuthMiddleware
+from app.middleware.url_rewrite import URLRewriteMiddleware
+
+
+class BaseHTTPPassthrough(BaseHTTPMiddleware):
+    """Reproduces the per-request cost of the former BaseHTTPMiddleware wrapping"""
+
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def build_app(mode: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/models/list")
+    async def list_models():
+        return {"openai": ["gpt-4o"]}
+
+    if mode == "basehttp":
+        app.add_middleware(AuthMiddleware)
+        app.add_middleware(BaseHTTPPassthrough)
+        app.add_middleware(URLRewriteMiddleware)
+        app.add_middleware(BaseHTTPPassthrough)
+    elif mode == "asgi":
+        app.add_middleware(AuthMiddleware)
+        app.add_middleware(URLRewriteMiddleware)
+    return app
+
+
+async def fake_verify_token(token: str):
+    return {"sub": "bench@clients"}
+
+
+async def run(app: FastAPI, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": "Bearer bench-token"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                response = await client.get("/models/list", headers=headers)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+async def main(args):
+    print(f"{'stack':<10} {'req/s':>10}")
+    with mock.patch("app.services.auth_service.AuthService.verify_token", side_effect=fake_verify_token):
+        for mode in ("none", "basehttp", "asgi"):
+            app = build_app(mode)
+            await run(app, min(200, args.requests), args.concurrency)  # warm up
+            rps = await run(app, args.requests, args.concurrency)
+            print(f"{mode:<10} {rps:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark middleware stack throughput")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per stack")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent client workers")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Overhead of the whole proxy stack against a local mock upstream.
+
+Starts ``benchmarks/mock_upstream.py`` and the proxy (``uvicorn app.main:app``)
+with a config whose OpenAI, Azure and Anthropic providers point at the mock.
+Tokens are signed with a local key whose JWKS the mock serves
+(``AUTH0_JWKS_URL``), so requests go through the real middleware, token
+verification and LLMService without provider keys or network access.
+
+* completion - RPS and p50/p99 latency per provider, sent straight to the mock
+               and through the proxy; the overhead is the difference
+* stream     - time to first token, straight to the mock and through the proxy
+* soak       - mixed load through the proxy for ``--soak-seconds``, tracking
+               the proxy's resident memory (read from /proc, Linux only)
+
+The load generator, the mock and the proxy share the machine, so compare runs
+made on the same host. ``--save`` writes the results as JSON; ``--baseline``
+compares them with a saved run and exits with status 1 when a metric is worse
+by more than ``--max-regression`` percent, so CI can run it as a check.
+
+Usage:
+    python benchmarks/bench_proxy.py --requests 2000 --concurrency 50 --save proxy-baseline.json
+    python benchmarks/bench_proxy.py --latency lognormal:200:0.5 --tokens-per-second 100 --error-rate 0.01
+    python benchmarks/bench_proxy.py --soak-seconds 600 --baseline proxy-baseline.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+import jwt
+import yaml
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from mock_upstream import add_arguments
+
+AUTH0_DOMAIN = "bench.local"
+AZURE_API_VERSION = "2025-03-01-preview"
+# provider: (model, path of the provider's own API on the mock)
+PROVIDERS = {
+    "openai": ("gpt-4o-mini", "/v1/chat/completions"),
+    "azure": ("gpt-4.1-mini", f"/openai/deployments/gpt-4.1-mini/chat/completions?api-version={AZURE_API_VERSION}"),
+    "anthropic": ("claude-3-5-haiku-20241022", "/v1/messages"),
+}
+# Metrics compared with the baseline, by the last part of their name: (higher is better, changes smaller than this are noise)
+TRACKED = {
+    "rps": (True, 0.0),
+    "p50_overhead_ms": (False, 1.0),
+    "p99_overhead_ms": (False, 1.0),
+    "rss_growth_mb": (False, 5.0),
+}
+# Options that change what is measured; runs made with different values are not comparable
+MOCK_OPTIONS = ("latency", "tokens_per_second", "completion_tokens", "error_rate", "concurrency")
+
+# (seconds to the whole response, seconds to its first chunk, failed)
+Sample = Tuple[float, float, bool]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, byteorder="big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_credentials(directory: str) -> Tuple[str, str]:
+    """(path of the JWKS file for the mock, a token signed with its key)"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+    jwks = {"keys": [{"kty": "RSA", "kid": "bench", "use": "sig", "alg": "RS256", "n": b64url_uint(numbers.n), "e": b64url_uint(numbers.e)}]}
+    path = os.path.join(directory, "jwks.json")
+    with open(path, "w") as f:
+        json.dump(jwks, f)
+    token = jwt.encode(
+        {
+            "sub": "bench@clients",
+            "aud": f"https://{AUTH0_DOMAIN}/api/v2/",
+            "iss": f"https://{AUTH0_DOMAIN}/",
+            "exp": int(time.time()) + 86400,
+        },
+        private_key,
+        algorithm="RS256",
+        headers={"kid": "bench"},
+    )
+    return path, token
+
+
+def write_config(directory: str, mock_url: str, max_concurrency: Optional[int]) -> str:
+    """The repo's config with every provider pointed at the mock"""
+    with open(ROOT / "app" / "config" / "config.yaml") as f:
+        config = yaml.safe_load(f)
+    config["providers"] = {
+        "openai": {"api_base": f"{mock_url}/v1", "models": [{"name": PROVIDERS["openai"][0]}]},
+        "azure": {"api_base": f"{mock_url}/", "api_version": AZURE_API_VERSION, "models": [{"name": PROVIDERS["azure"][0]}]},
+        "anthropic": {"api_base": mock_url, "models": [{"name": PROVIDERS["anthropic"][0]}]},
+    }
+    for provider in config["providers"].values():
+        provider["max_concurrency"] = max_concurrency
+    path = os.path.join(directory, "config.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def mock_arguments(args) -> List[str]:
+    arguments = [
+        "--latency", args.latency,
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--completion-tokens", str(args.completion_tokens),
+        "--error-rate", str(args.error_rate),
+        "--error-status", args.error_status,
+    ]
+    if args.seed is not None:
+        arguments += ["--seed", str(args.seed)]
+    return arguments
+
+
+def start_servers(args, directory: str) -> Tuple[subprocess.Popen, subprocess.Popen, str, str, str]:
+    """(mock process, proxy process, mock URL, proxy URL, token)"""
+    mock_port, proxy_port = free_port(), free_port()
+    mock_url, proxy_url = f"http://127.0.0.1:{mock_port}", f"http://127.0.0.1:{proxy_port}"
+    jwks_path, token = make_credentials(directory)
+    mock = subprocess.Popen(
+        [sys.executable, str(ROOT / "benchmarks" / "mock_upstream.py"), "--port", str(mock_port), "--jwks", jwks_path]
+        + mock_arguments(args),
+        stdout=subprocess.DEVNULL, stderr=open(os.path.join(directory, "mock.log"), "w")
+    )
+    env = dict(os.environ)
+    env.update({
+        "CONFIG_PATH": write_config(directory, mock_url, args.max_concurrency),
+        "AUTH0_DOMAIN": AUTH0_DOMAIN,
+        "AUTH0_AUDIENCE": f"https://{AUTH0_DOMAIN}/api/v2/",
+        "AUTH0_JWKS_URL": f"{mock_url}/.well-known/jwks.json",
+        "OPENAI_API_KEY": "bench",
+        "AZURE_API_KEY": "bench",
+        "ANTHROPIC_API_KEY": "bench",
+        "PHOENIX_TRACING": "off",
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        "PYTHONPATH": str(ROOT) + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    proxy_log = open(os.path.join(directory, "proxy.log"), "w")
+    proxy = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(proxy_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=proxy_log, stderr=proxy_log
+    )
+    return mock, proxy, mock_url, proxy_url, token
+
+
+def wait_ready(process: subprocess.Popen, url: str, log_path: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            with open(log_path) as f:
+                raise RuntimeError(f"{url} exited with status {process.returncode}:\n{f.read()[-2000:]}")
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not answer within {timeout} s")
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB, None where /proc is not available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class Target:
+    """Builds the requests for one provider, straight to the mock or through the proxy"""
+
+    def __init__(self, provider: str, mock_url: str, proxy_url: str, token: str, completion_tokens: int):
+        self.provider = provider
+        self.model, path = PROVIDERS[provider]
+        self.direct_url = mock_url + path
+        self.proxy_url = f"{proxy_url}/models/{provider}/{self.model}"
+        self.proxy_headers = {"Authorization": f"Bearer {token}"}
+        self.direct_headers = {"x-api-key": "bench"} if provider == "anthropic" else {"Authorization": "Bearer bench"}
+        self.completion_tokens = completion_tokens
+
+    def request(self, via_proxy: bool, stream: bool, number: int) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        body = {
+            # Distinct prompts so no request is coalesced or served from cache
+            "messages": [{"role": "user", "content": f"Benchmark request {number}: write a short poem."}],
+            "max_tokens": self.completion_tokens,
+            "temperature": 0.7,
+            "stream": stream,
+        }
+        if via_proxy:
+            return self.proxy_url, self.proxy_headers, {"model": f"{self.provider}/{self.model}", **body}
+        return self.direct_url, self.direct_headers, {"model": self.model, **body}
+
+
+async def send(client: httpx.AsyncClient, url: str, headers: Dict[str, str], body: Dict[str, Any]) -> Sample:
+    started_at = time.perf_counter()
+    first_chunk_at = None
+    failed = False
+    try:
+        async with client.stream("POST", url, headers=headers, json=body) as response:
+            failed = response.status_code != 200
+            async for chunk in response.aiter_raw():
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter()
+                # Errors after the stream started are sent as an event
+                if b'"streaming_error"' in chunk:
+                    failed = True
+    except httpx.HTTPError:
+        failed = True
+    finished_at = time.perf_counter()
+    return finished_at - started_at, (first_chunk_at or finished_at) - started_at, failed
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    targets: List[Target],
+    via_proxy: bool,
+    streams: List[bool],
+    concurrency: int,
+    total: Optional[int] = None,
+    duration: Optional[float] = None
+) -> Tuple[List[Sample], float]:
+    """Send ``total`` requests, or as many as fit in ``duration`` seconds, cycling through targets and stream modes"""
+    samples: List[Sample] = []
+    sent = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker():
+        nonlocal sent
+        while (total is None or sent < total) and (deadline is None or time.perf_counter() < deadline):
+            number = sent
+            sent += 1
+            target = targets[number % len(targets)]
+            stream = streams[number // len(targets) % len(streams)]
+            samples.append(await send(client, *target.request(via_proxy, stream, number)))
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started_at
+
+
+def summarize(samples: List[Sample], elapsed: float, stream: bool) -> Dict[str, float]:
+    ok = [sample for sample in samples if not sample[2]] or samples
+    latencies = [sample[1] if stream else sample[0] for sample in ok]
+    return {
+        "rps": len(samples) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": sum(sample[2] for sample in samples),
+    }
+
+
+async def soak(client: httpx.AsyncClient, targets: List[Target], proxy: subprocess.Popen, args) -> Dict[str, float]:
+    """Mixed load through the proxy while sampling its resident memory every second"""
+    memory: List[float] = []
+    stop = asyncio.Event()
+
+    async def sample_memory():
+        while not stop.is_set():
+            rss = rss_mb(proxy.pid)
+            if rss is not None:
+                memory.append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    sampler = asyncio.create_task(sample_memory())
+    samples, elapsed = await run_load(client, targets, True, [False, True], args.concurrency, duration=args.soak_seconds)
+    stop.set()
+    await sampler
+    result = {"requests": len(samples), "rps": len(samples) / elapsed, "errors": sum(sample[2] for sample in samples)}
+    if memory:
+        result.update({"rss_start_mb": memory[0], "rss_end_mb": memory[-1], "rss_peak_mb": max(memory), "rss_growth_mb": memory[-1] - memory[0]})
+    return result
+
+
+async def measure(args, proxy: subprocess.Popen, mock_url: str, proxy_url: str, token: str) -> Dict[str, float]:
+    metrics: Dict[str, float] = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        targets = [Target(provider, mock_url, proxy_url, token, args.completion_tokens) for provider in PROVIDERS]
+        # Loads litellm in the proxy and opens the connections
+        for via_proxy in (False, True):
+            await run_load(client, targets, via_proxy, [False, True], args.concurrency, total=args.warmup)
+
+        print(f"{'provider':<10} {'mode':<10} {'direct rps':>10} {'proxy rps':>10} {'direct p50':>10} {'proxy p50':>10} "
+              f"{'+p50 ms':>8} {'+p99 ms':>8} {'errors':>7}")
+        for target in targets:
+            for stream in (False, True):
+                mode = "stream" if stream else "completion"
+                direct = summarize(*await run_load(client, [target], False, [stream], args.concurrency, total=args.requests), stream)
+                proxied = summarize(*await run_load(client, [target], True, [stream], args.concurrency, total=args.requests), stream)
+                # For streams the latencies are times to first token
+                prefix = f"{target.provider}.{mode}."
+                metrics.update({
+                    prefix + "rps": proxied["rps"],
+                    prefix + "direct_rps": direct["rps"],
+                    prefix + "direct_p50_ms": direct["p50_ms"],
+                    prefix + "direct_p99_ms": direct["p99_ms"],
+                    prefix + "proxy_p50_ms": proxied["p50_ms"],
+                    prefix + "proxy_p99_ms": proxied["p99_ms"],
+                    prefix + "p50_overhead_ms": proxied["p50_ms"] - direct["p50_ms"],
+                    prefix + "p99_overhead_ms": proxied["p99_ms"] - direct["p99_ms"],
+                    prefix + "errors": proxied["errors"],
+                })
+                print(
+                    f"{target.provider:<10} {mode:<10} {direct['rps']:>10.0f} {proxied['rps']:>10.0f} "
+                    f"{direct['p50_ms']:>10.1f} {proxied['p50_ms']:>10.1f} "
+                    f"{metrics[prefix + 'p50_overhead_ms']:>8.1f} {metrics[prefix + 'p99_overhead_ms']:>8.1f} {proxied['errors']:>7}"
+                )
+        print("(stream latencies are times to first token)")
+
+        if args.soak_seconds:
+            result = await soak(client, targets, proxy, args)
+            metrics.update({"soak." + key: value for key, value in result.items()})
+            line = f"soak {args.soak_seconds:.0f} s: {result['requests']} requests, {result['rps']:.0f} req/s, {result['errors']} errors"
+            if "rss_start_mb" in result:
+                line += (f", RSS {result['rss_start_mb']:.0f} -> {result['rss_end_mb']:.0f} MB "
+                         f"(peak {result['rss_peak_mb']:.0f} MB, growth {result['rss_growth_mb']:+.1f} MB)")
+            print(line)
+    return metrics
+
+
+def regressions(baseline: Dict[str, float], current: Dict[str, float], max_regression: float) -> List[str]:
+    """Print the tracked metrics next to the baseline and return those that got worse"""
+    worse = []
+    print(f"{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, value in current.items():
+        name = key.rpartition(".")[2]
+        if name not in TRACKED or key not in baseline:
+            continue
+        higher_is_better, noise = TRACKED[name]
+        old = baseline[key]
+        change = (value - old) / abs(old) * 100 if old else 0.0
+        loss = old - value if higher_is_better else value - old
+        regressed = loss > noise and loss > abs(old) * max_regression / 100
+        if regressed:
+            worse.append(key)
+        print(f"{key:<36} {old:>10.1f} {value:>10.1f} {change:>+7.0f}%{'  REGRESSION' if regressed else ''}")
+    return worse
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        mock, proxy, mock_url, proxy_url, token = start_servers(args, directory)
+        try:
+            wait_ready(mock, f"{mock_url}/stats", os.path.join(directory, "mock.log"))
+            wait_ready(proxy, f"{proxy_url}/health", os.path.join(directory, "proxy.log"))
+            metrics = asyncio.run(measure(args, proxy, mock_url, proxy_url, token))
+            # Retried by the proxy, so most never reach the client
+            stats = httpx.get(f"{mock_url}/stats").json()
+            print(f"upstream calls: {stats['requests']}, errors injected: {stats['errors']}")
+        finally:
+            for process in (proxy, mock):
+                process.terminate()
+                process.wait()
+
+    if args.save:
+        run = {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "arguments": vars(args),
+            "metrics": metrics,
+        }
+        with open(args.save, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"compared with {args.baseline} (commit {baseline.get('commit')}, {baseline.get('time')})")
+        changed = [
+            option for option in MOCK_OPTIONS
+            if option in baseline.get("arguments", {}) and baseline["arguments"][option] != getattr(args, option)
+        ]
+        if changed:
+            print(f"warning: the baseline was run with different {', '.join(changed)}")
+        worse = regressions(baseline["metrics"], metrics, args.max_regression)
+        if worse:
+            print(f"FAIL: {len(worse)} metrics regressed by more than {args.max_regression:.0f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the proxy stack against a mock upstream")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per provider and mode")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=200, help="Requests sent before measuring")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Provider limit in the proxy (default: unlimited)")
+    parser.add_argument("--soak-seconds", type=float, default=0, help="Length of the soak run (0: skip)")
+    parser.add_argument("--save", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare with the results saved by an earlier run")
+    parser.add_argument("--max-regression", type=float, default=10, help="Percent a metric may get worse before failing")
+    add_arguments(parser)
+
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+CPU cost of returning a chat completion response.
+
+Builds ModelResponses of roughly 1 KB, 32 KB and 512 KB (tool calls with
+~1 KB of arguments each) and serves them from an in-process app through
+httpx's ASGI transport:
+
+* ``dict`` - the previous path: the route returns a dict and FastAPI validates
+             it against ``response_model=Dict[str, Any]``, walks it with
+             jsonable_encoder and encodes it with the stdlib encoder
+* ``raw``  - the route encodes the response once with completion_to_json and
+             returns it as a RawJSONResponse
+
+CPU time is measured with ``time.process_time`` and reported per response.
+
+Usage:
+    python benchmarks/bench_serialization.py --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import httpx
+from fastapi import FastAPI
+from litellm import ModelResponse
+
+from app.services.serialization import RawJSONResponse, completion_to_dict, completion_to_json
+
+SIZES = {"1KB": 1, "32KB": 32, "512KB": 512}
+
+
+def make_completion(kilobytes: int) -> ModelResponse:
+    arguments = json.dumps({"rows": [{"id": i, "name": f"item-{i}", "score": i / 7} for i in range(22)]})
+    return ModelResponse(
+        model="azure/gpt-4.1-mini",
+        choices=[{
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {"id": f"call_{i}", "type": "function", "function": {"name": "store_rows", "arguments": arguments}}
+                    for i in range(kilobytes)
+                ]
+            },
+            "finish_reason": "tool_calls"
+        }],
+        usage={"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+    )
+
+
+def build_app(completions: Dict[str, ModelResponse]) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/dict/{size}", response_model=Dict[str, Any])
+    async def as_dict(size: str):
+        return completion_to_dict(completions[size])
+
+    @app.post("/raw/{size}", response_model=Dict[str, Any])
+    async def as_raw(size: str):
+        return RawJSONResponse(completion_to_json(completions[size]))
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, total: int) -> float:
+    """CPU seconds per response"""
+    for _ in range(min(20, total)):
+        (await client.post(path)).raise_for_status()
+    start = time.process_time()
+    for _ in range(total):
+        (await client.post(path)).raise_for_status()
+    return (time.process_time() - start) / total
+
+
+async def main(args):
+    completions = {name: make_completion(kilobytes) for name, kilobytes in SIZES.items()}
+    app = build_app(completions)
+    print(f"{'size':<8} {'body':>9} {'dict us':>10} {'raw us':>10} {'speedup':>8}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in SIZES:
+            body_bytes = len((await client.post(f"/raw/{name}")).content)
+            total = max(10, args.requests // SIZES[name] ** 0.5)
+            before = await measure(client, f"/dict/{name}", int(total))
+            after = await measure(client, f"/raw/{name}", int(total))
+            print(f"{name:<8} {body_bytes:>9} {before * 1e6:>10.0f} {after * 1e6:>10.0f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chat completion response serialization")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per size at 1 KB, fewer for larger sizes")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Cold start: import time of app.main and time until a new server answers /health.
+
+* import time - ``python -X importtime -c "import app.main"``, best of a few
+                runs, with the heaviest imports listed
+* lazy check  - litellm, the provider SDKs and Phoenix must not be imported
+                by ``import app.main``; they load after startup
+* /health     - wall time from spawning ``uvicorn app.main:app`` until
+                ``/health`` answers 200, including interpreter startup
+
+With budgets set, the script exits with status 1 when one is exceeded, so CI
+can run it as a check.
+
+Usage:
+    python benchmarks/bench_startup.py --import-budget-ms 500 --health-budget-ms 1000
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+# Modules that take seconds to import and must stay out of the startup path
+LAZY_MODULES = ("litellm", "openai", "anthropic", "phoenix", "opentelemetry")
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def import_time() -> Tuple[float, List[Tuple[float, str]]]:
+    """(cumulative seconds to import app.main, [(cumulative seconds, module)] of its heaviest imports)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True
+    )
+    total = 0.0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        seconds = int(cumulative) / 1e6
+        depth = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == "app.main":
+            total = seconds
+        elif depth <= 2:
+            modules.append((seconds, name.strip()))
+    return total, sorted(modules, reverse=True)[:10]
+
+
+def eagerly_imported() -> List[str]:
+    code = (
+        "import sys, app.main; "
+        f"print('lazy:', *(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True)
+    # Other output (e.g. a tracing banner) is ignored
+    line = [line for line in result.stdout.splitlines() if line.startswith("lazy:")][-1]
+    return line.split()[1:]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_health(timeout: float = 30.0) -> float:
+    port = free_port()
+    started_at = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=child_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - started_at
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            time.sleep(0.01)
+        raise RuntimeError(f"/health did not answer within {timeout} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args) -> int:
+    failed = False
+    best, heaviest = min((import_time() for _ in range(args.runs)), key=lambda result: result[0])
+    print(f"import app.main: {best * 1000:.0f} ms (best of {args.runs})")
+    for seconds, name in heaviest:
+        print(f"  {seconds * 1000:>7.1f} ms  {name}")
+    if args.import_budget_ms and best * 1000 > args.import_budget_ms:
+        print(f"FAIL: import time exceeds the {args.import_budget_ms} ms budget")
+        failed = True
+
+    eager = eagerly_imported()
+    print(f"imported at startup (should be none): {', '.join(eager) or 'none'}")
+    if eager:
+        print("FAIL: modules that should load lazily are imported by app.main")
+        failed = True
+
+    if not args.skip_health:
+        health = min(time_to_health() for _ in range(args.runs))
+        print(f"spawn to /health: {health * 1000:.0f} ms (best of {args.runs})")
+        if args.health_budget_ms and health * 1000 > args.health_budget_ms:
+            print(f"FAIL: time to /health exceeds the {args.health_budget_ms} ms budget")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the proxy")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, default=0, help="Fail above this import time (0: no budget)")
+    parser.add_argument("--health-budget-ms", type=float, default=0, help="Fail above this time to /health (0: no budget)")
+    parser.add_argument("--skip-health", action="store_true", help="Only measure imports")
+
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of Phoenix tracing.
+
+Runs chat completions through LLMService against a mocked upstream that is
+wrapped in an LLM span carrying the prompt and completion, the way the
+OpenInference litellm instrumentation records them. Spans go to an exporter
+that encodes them as OTLP protobuf and then waits for a slow collector:
+
+* ``off``     - no tracing
+* ``simple``  - the previous setup: every span exported on the request path
+                with full payloads (Phoenix ``register`` defaults)
+* ``full``    - every trace kept, batched export and truncated payloads
+* ``sampled`` - as ``full`` with tail sampling; failed and slow requests are
+                always kept
+
+CPU per request (``time.process_time``, including the export thread) and
+latency are reported against ``off``.
+
+Usage:
+    python benchmarks/bench_tracing.py --requests 2000 --concurrency 20 --tail-sample-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from litellm import ModelResponse
+from opentelemetry.exporter.otlp.proto.common.trace_encoder import encode_spans
+from opentelemetry.sdk.trace import SpanLimits, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import NoOpTracer, Status, StatusCode
+
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.tracing import BatchExportProcessor, TailSamplingProcessor
+
+MODES = ("off", "simple", "full", "sampled")
+
+
+class CollectorExporter(SpanExporter):
+    """Encodes spans like the OTLP exporter, then waits ``latency`` seconds for the collector"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.bytes = 0
+
+    def export(self, spans):
+        self.bytes += len(encode_spans(spans).SerializeToString())
+        time.sleep(self.latency)
+        return SpanExportResult.SUCCESS
+
+
+def make_upstream(tracer, prompt_kb: int, error_every: int):
+    completion = "word " * (prompt_kb * 200)
+    calls = 0
+
+    async def fake_acompletion(**params):
+        nonlocal calls
+        calls += 1
+        with tracer.start_as_current_span("completion") as span:
+            if span.is_recording():
+                span.set_attribute("llm.model_name", params["model"])
+                span.set_attribute("input.value", json.dumps(params["messages"]))
+            await asyncio.sleep(0)
+            response = ModelResponse(
+                model=params["model"],
+                choices=[{"index": 0, "message": {"role": "assistant", "content": completion}, "finish_reason": "stop"}],
+                usage={"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+            )
+            if span.is_recording():
+                span.set_attribute("output.value", response.model_dump_json())
+                if error_every and calls % error_every == 0:
+                    span.set_status(Status(StatusCode.ERROR))
+            return response
+    return fake_acompletion
+
+
+def build_tracing(mode: str, args):
+    exporter = CollectorExporter(args.collector_ms / 1000)
+    if mode == "off":
+        return NoOpTracer(), None, exporter
+    if mode == "simple":
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        return provider.get_tracer("bench"), provider, exporter
+    provider = TracerProvider(span_limits=SpanLimits(max_span_attribute_length=args.max_attribute_length))
+    processor = BatchExportProcessor(exporter, max_queue_size=2048, max_batch_size=512, schedule_delay=0.5)
+    if mode == "sampled":
+        processor = TailSamplingProcessor(processor, args.tail_sample_rate, slow_threshold=5.0)
+    provider.add_span_processor(processor)
+    return provider.get_tracer("bench"), provider, exporter
+
+
+async def run(service: LLMService, args):
+    prompt = "lorem ipsum " * (args.prompt_kb * 85)
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+    latencies = []
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            request = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": f"{i} {prompt}"}])
+            start = time.perf_counter()
+            await service.create_chat_completion(request)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return latencies
+
+
+async def main(args):
+    # As PhoenixConfig.setup_tracing does: truncation is intended
+    logging.getLogger("opentelemetry.attributes").setLevel(logging.ERROR)
+    service = LLMService()
+    service.config.providers["azure"].max_concurrency = None
+    print(f"prompt/completion: {args.prompt_kb} KB, collector latency: {args.collector_ms:.0f} ms per export")
+    print(f"{'mode':<10} {'cpu us/req':>12} {'overhead':>10} {'p50 ms':>8} {'p99 ms':>8} {'exported KB':>12}")
+    with mock.patch.object(llm_service_module, "acompletion", make_upstream(NoOpTracer(), args.prompt_kb, 0)):
+        await run(service, args)  # warm up the service before the first measurement
+    baseline = None
+    for mode in MODES:
+        tracer, provider, exporter = build_tracing(mode, args)
+        with mock.patch.object(llm_service_module, "acompletion", make_upstream(tracer, args.prompt_kb, args.error_every)):
+            await run(service, argparse.Namespace(**{**vars(args), "requests": min(200, args.requests)}))  # warm up
+            cpu_start = time.process_time()
+            latencies = await run(service, args)
+            if provider is not None:
+                provider.shutdown()
+            cpu = (time.process_time() - cpu_start) / args.requests * 1e6
+        baseline = baseline if baseline is not None else cpu
+        latencies.sort()
+        print(
+            f"{mode:<10} {cpu:>12.0f} {cpu - baseline:>+10.0f} "
+            f"{statistics.median(latencies) * 1000:>8.2f} {latencies[int(len(latencies) * 0.99) - 1] * 1000:>8.2f} "
+            f"{exporter.bytes / 1024:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-request tracing overhead")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--prompt-kb", type=int, default=8, help="Approximate prompt and completion size")
+    parser.add_argument("--collector-ms", type=float, default=5.0, help="Simulated collector latency per export call")
+    parser.add_argument("--tail-sample-rate", type=float, default=0.1)
+    parser.add_argument("--error-every", type=int, default=100, help="Mark every Nth upstream call failed (0: never)")
+    parser.add_argument("--max-attribute-length", type=int, default=4096)
+
+    asyncio.run(main(parser.parse_args()))
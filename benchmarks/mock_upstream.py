@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Mock LLM upstream for benchmarks: OpenAI, Azure OpenAI and Anthropic
+compatible chat endpoints, plus a JWKS endpoint for locally signed tokens.
+
+* ``POST /v1/chat/completions``                           - OpenAI
+* ``POST /openai/deployments/{deployment}/chat/completions`` - Azure OpenAI
+* ``POST /v1/messages``                                   - Anthropic
+* ``GET /.well-known/jwks.json``                          - the keys in ``--jwks``
+* ``GET /stats``                                          - requests served and errors injected
+
+Every call waits for a latency drawn from ``--latency`` before answering
+(before the first chunk for streams), then generates ``--completion-tokens``
+tokens at ``--tokens-per-second``; non-streaming responses are sent once all
+tokens are generated. A share of calls (``--error-rate``) fail
+with one of the ``--error-status`` codes in the provider's error format.
+
+Latency distributions, in milliseconds:
+
+* ``fixed:50``          - always 50 ms
+* ``uniform:20:80``     - uniform between 20 and 80 ms
+* ``lognormal:50:0.5``  - median 50 ms, sigma 0.5 (long tail)
+
+Usage:
+    python benchmarks/mock_upstream.py --port 9000 --latency lognormal:50:0.5 --tokens-per-second 100 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ERROR_TYPES = {
+    400: ("invalid_request_error", "invalid_request_error"),
+    401: ("invalid_request_error", "authentication_error"),
+    429: ("rate_limit_exceeded", "rate_limit_error"),
+    500: ("server_error", "api_error"),
+    503: ("server_error", "overloaded_error"),
+}
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Latency sampler in seconds from a ``kind:params`` spec in milliseconds"""
+    kind, *params = spec.split(":")
+    try:
+        values = [float(param) for param in params]
+    except ValueError:
+        values = []
+    if kind == "fixed" and len(values) == 1:
+        seconds = values[0] / 1000
+        return lambda rng: seconds
+    if kind == "uniform" and len(values) == 2:
+        low, high = values[0] / 1000, values[1] / 1000
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal" and len(values) == 2:
+        mu, sigma = math.log(values[0] / 1000), values[1]
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Invalid latency distribution {spec}, expected fixed:MS, uniform:MIN_MS:MAX_MS or lognormal:MEDIAN_MS:SIGMA")
+
+
+def sse(data: Any, event: str = "") -> bytes:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def build_app(args) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(args.seed)
+    latency = parse_latency(args.latency)
+    error_statuses = [int(status) for status in args.error_status.split(",")]
+    token_interval = 1 / args.tokens_per_second if args.tokens_per_second > 0 else 0
+    jwks = {"keys": []}
+    if args.jwks:
+        with open(args.jwks) as f:
+            jwks = json.load(f)
+    stats: Dict[str, int] = {"requests": 0, "streams": 0, "errors": 0}
+
+    def prompt_tokens(messages) -> int:
+        # About 4 characters per token
+        return max(1, sum(len(str(message.get("content", ""))) for message in messages) // 4)
+
+    async def generate(body: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yield the completion tokens at the configured rate"""
+        completion_tokens = min(args.completion_tokens, body.get("max_tokens") or args.completion_tokens)
+        for i in range(completion_tokens):
+            if i and token_interval:
+                await asyncio.sleep(token_interval)
+            yield f"tok{i} "
+
+    def fail(api: str):
+        """The error response of a call chosen to fail, or None"""
+        if not args.error_rate or rng.random() >= args.error_rate:
+            return None
+        stats["errors"] += 1
+        status = rng.choice(error_statuses)
+        openai_type, anthropic_type = ERROR_TYPES.get(status, ("server_error", "api_error"))
+        message = f"Injected {status} error"
+        headers = {"retry-after": "1"} if status == 429 else {}
+        if api == "anthropic":
+            return JSONResponse({"type": "error", "error": {"type": anthropic_type, "message": message}}, status, headers)
+        return JSONResponse({"error": {"message": message, "type": openai_type, "code": status}}, status, headers)
+
+    async def openai_chat(request: Request, model: str) -> Any:
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(latency(rng))
+        error = fail("openai")
+        if error is not None:
+            return error
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = model or body.get("model", "mock")
+        usage_prompt = prompt_tokens(body.get("messages", []))
+
+        if not body.get("stream"):
+            text = "".join([token async for token in generate(body)])
+            completion_tokens = len(text.split())
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": usage_prompt, "completion_tokens": completion_tokens, "total_tokens": usage_prompt + completion_tokens},
+            })
+
+        stats["streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def events():
+            base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+            completion_tokens = 0
+            first = True
+            async for token in generate(body):
+                delta = {"role": "assistant", "content": token} if first else {"content": token}
+                first = False
+                completion_tokens += 1
+                yield sse({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            yield sse({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if include_usage:
+                usage = {"prompt_tokens": usage_prompt, "completion_tokens": completion_tokens, "total_tokens": usage_prompt + completion_tokens}
+                yield sse({**base, "choices": [], "usage": usage})
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def openai_completions(request: Request):
+        return await openai_chat(request, "")
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_completions(request: Request, deployment: str):
+        return await openai_chat(request, deployment)
+
+    @app.post("/v1/messages")
+    async def anthropic_messages(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(latency(rng))
+        error = fail("anthropic")
+        if error is not None:
+            return error
+        message_id = f"msg_{uuid.uuid4().hex}"
+        model = body.get("model", "mock")
+        input_tokens = prompt_tokens(body.get("messages", []))
+
+        if not body.get("stream"):
+            text = "".join([token async for token in generate(body)])
+            return JSONResponse({
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": len(text.split())},
+            })
+
+        stats["streams"] += 1
+
+        async def events():
+            message = {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": input_tokens, "output_tokens": 0},
+            }
+            yield sse({"type": "message_start", "message": message}, "message_start")
+            yield sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}, "content_block_start")
+            output_tokens = 0
+            async for token in generate(body):
+                output_tokens += 1
+                yield sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}, "content_block_delta")
+            yield sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+            yield sse({
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": output_tokens},
+            }, "message_delta")
+            yield sse({"type": "message_stop"}, "message_stop")
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/.well-known/jwks.json")
+    async def jwks_keys():
+        return jwks
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Mock behavior options, shared with the benchmarks that start the mock"""
+    parser.add_argument("--latency", default="fixed:50", help="Latency distribution before the response or first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Streaming token rate (0: as fast as possible)")
+    parser.add_argument("--completion-tokens", type=int, default=20, help="Tokens per completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls that fail")
+    parser.add_argument("--error-status", default="429,500,503", help="Comma separated status codes of injected errors")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI, Azure OpenAI and Anthropic upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--jwks", default=None, help="JSON file with the keys served at /.well-known/jwks.json")
+    add_arguments(parser)
+
+    args = parser.parse_args()
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning", access_log=False)
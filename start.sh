@@ -169,7 +169,7 @@ fi
 
 # Start FastAPI server
 echo -e "${BLUE}Starting FastAPI server...${NC}"
-poetry run uvicorn app.main:app --reload --port 8000 &
+poetry run python -m app.server --reload --port 8000 &
 
 # Store the PID
 echo $! > .fastapi.pid
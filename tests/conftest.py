@@ -0,0 +1,24 @@
+from typing import List, Tuple
+from litellm import ModelResponse
+from app.models import ChatCompletionRequest
+
+MODEL = "azure/gpt-4.1-mini"
+
+
+def make_request(content: str = "Hello!", **overrides) -> ChatCompletionRequest:
+    """Request to MODEL with one user message; ``overrides`` replace any field, e.g. ``messages``"""
+    params = {"model": MODEL, "messages": [{"role": "user", "content": content}]}
+    params.update(overrides)
+    return ChatCompletionRequest(**params)
+
+
+def make_messages(messages: List[Tuple[str, str]]) -> List[dict]:
+    return [{"role": role, "content": content} for role, content in messages]
+
+
+def make_response(content: str = "Test response", prompt_tokens: int = 10, completion_tokens: int = 20) -> ModelResponse:
+    return ModelResponse(
+        model=MODEL,
+        choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    )
@@ -0,0 +1,53 @@
+from unittest import mock
+from fastapi import FastAPI, HTTPException, Request
+from starlette.testclient import TestClient
+from app.middleware.auth_middleware import AuthMiddleware
+
+app = FastAPI()
+app.add_middleware(AuthMiddleware)
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+@app.get("/whoami")
+async def whoami(request: Request):
+    return request.state.user
+
+client = TestClient(app)
+
+
+async def fake_verify_token(token: str):
+    if token != "good-token":
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return {"sub": "client@clients"}
+
+
+def test_excluded_path_skips_auth():
+    response = client.get("/health")
+    assert response.status_code == 200
+
+
+def test_missing_authorization_header():
+    response = client.get("/whoami")
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Authorization header is missing"}
+
+
+def test_invalid_scheme():
+    response = client.get("/whoami", headers={"Authorization": "Basic abc"})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid authentication scheme"}
+
+
+def test_valid_token_sets_request_user():
+    with mock.patch("app.services.auth_service.AuthService.verify_token", side_effect=fake_verify_token):
+        response = client.get("/whoami", headers={"Authorization": "Bearer good-token"})
+    assert response.status_code == 200
+    assert response.json() == {"sub": "client@clients"}
+
+
+def test_invalid_token_is_rejected():
+    with mock.patch("app.services.auth_service.AuthService.verify_token", side_effect=fake_verify_token):
+        response = client.get("/whoami", headers={"Authorization": "Bearer bad-token"})
+    assert response.status_code == 401
@@ -0,0 +1,193 @@
+import asyncio
+import base64
+import time
+import jwt
+import pytest
+from unittest import mock
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from app.services.auth_service import AuthService
+from app.services.jwks_cache import JWKSCache
+from app.services.token_cache import TokenCache
+
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, byteorder="big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_jwks(*kids):
+    numbers = PRIVATE_KEY.public_key().public_numbers()
+    return {
+        "keys": [
+            {"kty": "RSA", "kid": kid, "use": "sig", "alg": "RS256", "n": b64url_uint(numbers.n), "e": b64url_uint(numbers.e)}
+            for kid in kids
+        ]
+    }
+
+
+def make_token(service: AuthService, kid: str = "key-1", **claims):
+    payload = {
+        "sub": "client@clients",
+        "aud": service.audience,
+        "iss": service.issuer,
+        "exp": int(time.time()) + 3600,
+    }
+    payload.update(claims)
+    return jwt.encode(payload, PRIVATE_KEY, algorithm="RS256", headers={"kid": kid})
+
+
+def test_keys_are_fetched_once():
+    cache = JWKSCache("https://example.test/jwks.json")
+    fetch = mock.AsyncMock(return_value=make_jwks("key-1"))
+
+    async def run():
+        with mock.patch.object(cache, "_fetch_jwks", fetch):
+            first = await cache.get_key("key-1")
+            second = await cache.get_key("key-1")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert isinstance(first, rsa.RSAPublicKey)
+    assert fetch.await_count == 1
+
+
+def test_workers_share_fetched_keys(tmp_path):
+    shared_path = str(tmp_path / "jwks.json")
+    caches = [JWKSCache("https://example.test/jwks.json", shared_path=shared_path) for _ in range(2)]
+    fetch = mock.AsyncMock(return_value=make_jwks("key-1"))
+
+    async def run():
+        keys = []
+        for cache in caches:
+            with mock.patch.object(cache, "_fetch_jwks", fetch):
+                keys.append(await cache.get_key("key-1"))
+        return keys
+
+    keys = asyncio.run(run())
+    assert all(isinstance(key, rsa.RSAPublicKey) for key in keys)
+    assert fetch.await_count == 1
+
+
+def test_unknown_kid_refetch_is_rate_limited():
+    cache = JWKSCache("https://example.test/jwks.json", min_refresh_interval=60)
+    fetch = mock.AsyncMock(return_value=make_jwks("key-1"))
+
+    async def run():
+        with mock.patch.object(cache, "_fetch_jwks", fetch):
+            await cache.get_key("key-1")
+            # Pretend the initial fetch happened long ago so one refetch is allowed
+            cache._last_attempt -= 120
+            results = [await cache.get_key("rotated") for _ in range(20)]
+        return results
+
+    results = asyncio.run(run())
+    assert results == [None] * 20
+    assert fetch.await_count == 2
+
+
+def test_stale_keys_are_served_when_refresh_fails():
+    cache = JWKSCache("https://example.test/jwks.json", ttl=0, min_refresh_interval=0)
+
+    async def run():
+        with mock.patch.object(cache, "_fetch_jwks", mock.AsyncMock(return_value=make_jwks("key-1"))):
+            await cache.get_key("key-1")
+        with mock.patch.object(cache, "_fetch_jwks", mock.AsyncMock(side_effect=ConnectionError("auth0 down"))):
+            key = await cache.get_key("key-1")
+            await cache._refresh_task
+        return key
+
+    assert asyncio.run(run()) is not None
+    assert "key-1" in cache._keys
+
+
+def test_verify_token_uses_cached_key():
+    service = AuthService()
+    fetch = mock.AsyncMock(return_value=make_jwks("key-1"))
+
+    async def run():
+        with mock.patch.object(service.jwks_cache, "_fetch_jwks", fetch):
+            return [await service.verify_token(make_token(service)) for _ in range(3)]
+
+    payloads = asyncio.run(run())
+    assert all(payload["sub"] == "client@clients" for payload in payloads)
+    assert fetch.await_count == 1
+
+
+def test_verify_token_rejects_unknown_kid():
+    service = AuthService()
+
+    async def run():
+        with mock.patch.object(service.jwks_cache, "_fetch_jwks", mock.AsyncMock(return_value=make_jwks("key-1"))):
+            await service.verify_token(make_token(service, kid="other"))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(run())
+    assert exc_info.value.status_code == 401
+
+
+def test_verified_tokens_skip_signature_check():
+    service = AuthService()
+    token = make_token(service)
+
+    async def run():
+        with mock.patch.object(service.jwks_cache, "_fetch_jwks", mock.AsyncMock(return_value=make_jwks("key-1"))):
+            await service.verify_token(token)
+            with mock.patch("app.services.auth_service.jwt.decode") as decode:
+                payload = await service.verify_token(token)
+        return payload, decode
+
+    payload, decode = asyncio.run(run())
+    assert payload["sub"] == "client@clients"
+    decode.assert_not_called()
+
+
+def test_token_cache_honors_exp_and_size():
+    cache = TokenCache(max_size=2)
+    cache.put("expired", {"sub": "a", "exp": time.time() - 1})
+    assert cache.get("expired") is None
+
+    cache.put("no-exp", {"sub": "b"})
+    assert cache.get("no-exp") is None
+
+    exp = time.time() + 60
+    for token in ("t1", "t2", "t3"):
+        cache.put(token, {"sub": token, "exp": exp})
+    assert len(cache) == 2
+    assert cache.get("t1") is None
+    assert cache.get("t3")["sub"] == "t3"
+
+
+def test_hs256_is_selected_from_header(monkeypatch):
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-secret-with-at-least-32-bytes")
+    service = AuthService()
+    token = jwt.encode(
+        {"sub": "local", "aud": service.audience, "iss": service.issuer, "exp": int(time.time()) + 60},
+        "test-secret-with-at-least-32-bytes",
+        algorithm="HS256",
+    )
+
+    with mock.patch.object(service.jwks_cache, "get_key") as get_key:
+        payload = asyncio.run(service.verify_token(token))
+
+    assert payload["sub"] == "local"
+    get_key.assert_not_called()
+
+
+def test_unsupported_algorithm_is_rejected():
+    service = AuthService()
+    token = jwt.encode({"sub": "x"}, None, algorithm="none")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(service.verify_token(token))
+    assert "Unsupported token algorithm" in exc_info.value.detail
+
+
+def test_jwks_url_can_be_overridden(monkeypatch):
+    monkeypatch.setenv("AUTH0_DOMAIN", "tenant.example.com")
+    assert AuthService().jwks_cache.jwks_url == "https://tenant.example.com/.well-known/jwks.json"
+    monkeypatch.setenv("AUTH0_JWKS_URL", "http://127.0.0.1:9000/.well-known/jwks.json")
+    assert AuthService().jwks_cache.jwks_url == "http://127.0.0.1:9000/.well-known/jwks.json"
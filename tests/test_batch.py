@@ -0,0 +1,99 @@
+import asyncio
+import json
+from unittest import mock
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+from app import routes
+from app.services.batch import iter_lines, parse_line, run_batch
+from conftest import make_response
+
+
+async def chunks_of(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_iter_lines_splits_across_chunks():
+    async def run():
+        return [item async for item in iter_lines(chunks_of(b'{"a":1}\n\n{"b":2}\n{"c":3}', 3), 1024)]
+
+    assert asyncio.run(run()) == [(1, b'{"a":1}'), (3, b'{"b":2}'), (4, b'{"c":3}')]
+
+
+def test_parse_line_formats():
+    assert parse_line(b'{"custom_id": "x", "messages": []}') == ("x", {"messages": []})
+    assert parse_line(b'{"custom_id": "y", "method": "POST", "body": {"messages": []}}') == ("y", {"messages": []})
+    assert parse_line(b'{"messages": []}') == (None, {"messages": []})
+
+
+def test_run_batch_bounds_concurrency_and_reads_lazily():
+    in_flight = 0
+    peak = 0
+    read = 0
+
+    async def lines():
+        nonlocal read
+        for number in range(1, 1001):
+            read += 1
+            yield number, b"{}"
+
+    async def handle(number, line):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001 * (number % 3))
+        in_flight -= 1
+        return {"line": number}
+
+    async def run():
+        stream = run_batch(lines(), handle, 8)
+        first = [await stream.__anext__() for _ in range(5)]
+        read_after_five = read
+        rest = [item async for item in stream]
+        return first + rest, read_after_five
+
+    results, read_after_five = asyncio.run(run())
+    assert sorted(json.loads(result)["line"] for result in results) == list(range(1, 1001))
+    assert peak <= 8
+    # Input is only read as results are consumed
+    assert read_after_five <= 5 + 8 * 2 + 1
+
+
+def test_batch_endpoint_streams_tagged_results():
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = TestClient(app)
+
+    async def complete(request, cache_control=None):
+        content = request.messages[0].content
+        if content == "fail":
+            raise Exception("upstream error")
+        return make_response(content.upper())
+
+    body = b"\n".join([
+        json.dumps({"custom_id": "first", "messages": [{"role": "user", "content": "hello"}]}).encode(),
+        json.dumps({"custom_id": "second", "body": {"messages": [{"role": "user", "content": "fail"}]}}).encode(),
+        b"not json",
+        json.dumps({"messages": [{"role": "user", "content": "bye"}], "stream": True}).encode(),
+    ])
+    with mock.patch.object(routes, "rate_limiter", None), \
+            mock.patch.object(routes.llm_service, "create_chat_completion", side_effect=complete) as create:
+        response = client.post("/models/azure/gpt-4.1-mini/batch?concurrency=2", content=body)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = {result["line"]: result for result in map(json.loads, response.text.splitlines())}
+    assert results[1]["id"] == "first"
+    assert results[1]["response"]["choices"][0]["message"]["content"] == "HELLO"
+    assert results[2]["id"] == "second" and results[2]["status"] == 500
+    assert results[3]["status"] == 400
+    assert results[4]["id"] == 4 and results[4]["status"] == 200
+    requests = [call.args[0] for call in create.call_args_list]
+    assert all(request.model == "azure/gpt-4.1-mini" and not request.stream for request in requests)
+
+
+def test_batch_endpoint_rejects_unknown_provider():
+    app = FastAPI()
+    app.include_router(routes.router)
+    response = TestClient(app).post("/models/nope/model/batch", content=b"{}")
+    assert response.status_code == 400
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from unittest import mock
+import pytest
+from app import batch_cli
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from conftest import make_response
+
+
+def write_input(path, contents):
+    path.write_text("\n".join(
+        json.dumps({"custom_id": f"req-{content}", "messages": [{"role": "user", "content": content}]})
+        for content in contents
+    ) + "\n")
+
+
+def run_cli(argv, upstream):
+    service = LLMService()
+    with mock.patch.object(service, "create_chat_completion", side_effect=upstream):
+        return asyncio.run(batch_cli.run(batch_cli.parse_args(argv), service))
+
+
+def test_runs_file_and_writes_results(tmp_path):
+    source = tmp_path / "prompts.jsonl"
+    write_input(source, ["a", "b", "c"])
+
+    async def upstream(request, cache_control=None):
+        return make_response(request.messages[0].content.upper())
+
+    progress = run_cli([str(source), "--model", "azure/gpt-4.1-mini", "--concurrency", "2"], upstream)
+
+    results = [json.loads(line) for line in (tmp_path / "prompts.results.jsonl").read_text().splitlines()]
+    assert sorted(result["id"] for result in results) == ["req-a", "req-b", "req-c"]
+    assert all(result["status"] == 200 for result in results)
+    assert progress.succeeded == 3
+    assert progress.tokens == 90
+    assert sum(progress.histogram) == 3
+    assert "req/s" in progress.status_line()
+    assert progress.histogram_lines()[0].startswith("Latency")
+
+
+def test_resume_skips_finished_lines(tmp_path):
+    source = tmp_path / "prompts.jsonl"
+    output = tmp_path / "out.jsonl"
+    write_input(source, ["a", "b", "c"])
+    # Line 1 finished, line 2 failed and line 3 was cut off mid-write
+    output.write_text(
+        json.dumps({"id": "req-a", "line": 1, "status": 200}) + "\n"
+        + json.dumps({"id": "req-b", "line": 2, "status": 500}) + "\n"
+        + '{"id": "req-c", "li'
+    )
+    calls = []
+
+    async def upstream(request, cache_control=None):
+        calls.append(request.messages[0].content)
+        return make_response("ok")
+
+    progress = run_cli([str(source), "-o", str(output), "--model", "azure/gpt-4.1-mini"], upstream)
+
+    assert sorted(calls) == ["b", "c"]
+    assert progress.skipped == 1
+    lines = output.read_text().splitlines()
+    assert len(lines) == 4
+    assert all(json.loads(line) for line in lines)
+
+
+def test_provider_limit_overrides_config(tmp_path):
+    source = tmp_path / "prompts.jsonl"
+    write_input(source, "abcdefgh")
+    service = LLMService()
+    in_flight = []
+    peak = 0
+
+    async def upstream(**params):
+        nonlocal peak
+        in_flight.append(params)
+        peak = max(peak, len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(params)
+        return make_response("ok")
+
+    args = batch_cli.parse_args([str(source), "--provider-limit", "azure=3", "--model", "azure/gpt-4.1-mini", "--concurrency", "8"])
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        progress = asyncio.run(batch_cli.run(args, service))
+
+    assert service.config.get_provider("azure").max_concurrency == 3
+    assert progress.succeeded == 8
+    assert peak == 3
+
+
+def test_provider_limit_rejects_unknown_provider(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        batch_cli.parse_args([str(tmp_path / "prompts.jsonl"), "--provider-limit", "nope=3"])
+    assert "Unknown provider in --provider-limit: nope" in capsys.readouterr().err
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from unittest import mock
+import pytest
+from app.config.config import CircuitBreakerSettings, Deployment, LoadBalancingSettings, RetrySettings
+from app.services import llm_service as llm_service_module
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryBudget, is_retryable
+from app.services.llm_service import LLMService
+from app.services.load_balancer import LoadBalancer
+from conftest import make_request, make_response
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"upstream returned {status_code}")
+        self.status_code = status_code
+
+
+def test_breaker_opens_on_error_rate_and_recovers_after_probe():
+    breaker = CircuitBreaker(CircuitBreakerSettings(window_size=4, min_calls=4, error_rate_threshold=0.5, open_seconds=30))
+    for error in (False, True, False, True):
+        breaker.record(0.1, error)
+    assert breaker.state == OPEN
+    assert not breaker.allows(0)
+    assert 29 < breaker.retry_after() <= 30
+
+    with mock.patch("app.services.circuit_breaker.time.monotonic", return_value=time.monotonic() + 31):
+        assert breaker.state == HALF_OPEN
+        assert breaker.allows(0)
+        assert not breaker.allows(1)
+        breaker.record(0.1, False)
+        assert breaker.state == CLOSED
+        assert breaker.health() == 1.0
+
+
+def test_breaker_opens_on_slow_calls_and_failed_probe_reopens():
+    breaker = CircuitBreaker(CircuitBreakerSettings(
+        window_size=4, min_calls=2, slow_call_ms=1000, slow_call_rate_threshold=1.0, open_seconds=30
+    ))
+    breaker.record(0.1, False)
+    assert breaker.state == CLOSED
+    breaker.record(2.0, False)
+    breaker.record(2.0, False)
+    assert breaker.state == CLOSED
+    breaker.record(2.0, False)
+    breaker.record(2.0, False)
+    assert breaker.state == OPEN
+
+    with mock.patch("app.services.circuit_breaker.time.monotonic", return_value=time.monotonic() + 31):
+        breaker.record(0.1, True)
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+
+
+def test_open_circuits_are_shared_between_workers(tmp_path):
+    settings = CircuitBreakerSettings(
+        window_size=2, min_calls=2, error_rate_threshold=0.5, open_seconds=30,
+        state_path=str(tmp_path / "circuits.sqlite")
+    )
+    workers = [LoadBalancer(LoadBalancingSettings(), settings) for _ in range(2)]
+    deployments = [Deployment(name="east")]
+
+    async def run():
+        for _ in range(2):
+            workers[0].finish("azure/m/east", workers[0].start("azure/m/east"), error=True)
+        assert workers[0].choose("azure/m", deployments) is None
+        assert workers[1].choose("azure/m", deployments) is not None
+        for worker in workers:
+            await worker.sync_circuits()
+        assert workers[1].choose("azure/m", deployments) is None
+        assert 29 < workers[1].retry_after("azure/m", deployments) <= 30
+        # Only the worker that saw the failures counts a trip
+        assert workers[1].snapshot()["azure/m/east"]["trips"] == 0
+        for worker in workers:
+            await worker.stop_sync()
+
+    asyncio.run(run())
+
+
+def test_retry_budget_and_backoff():
+    budget = RetryBudget(RetrySettings(budget_ratio=0.5, budget_burst=1, backoff_base_ms=100, backoff_max_ms=300))
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.deposit()
+    budget.deposit()
+    assert budget.try_spend()
+    for attempt in range(1, 6):
+        assert 0 <= budget.backoff(attempt) <= 0.3
+
+
+def test_is_retryable():
+    assert is_retryable(UpstreamError(429))
+    assert is_retryable(UpstreamError(503))
+    assert is_retryable(ConnectionError("reset"))
+    assert not is_retryable(UpstreamError(400))
+    assert not is_retryable(CircuitOpenError("down", 1.0))
+
+
+def test_retries_transient_errors():
+    service = LLMService()
+    upstream = mock.AsyncMock(side_effect=[UpstreamError(503), make_response("ok")])
+    with mock.patch.object(llm_service_module, "acompletion", upstream), \
+            mock.patch.object(service.retry_budget, "backoff", return_value=0):
+        response = asyncio.run(service.create_chat_completion(make_request()))
+    assert response.choices[0].message.content == "ok"
+    assert upstream.await_count == 2
+    assert service.retry_budget.retries == 1
+
+
+def test_client_errors_are_not_retried():
+    service = LLMService()
+    service.config.get_fallbacks = lambda provider_name, model_name: []
+    upstream = mock.AsyncMock(side_effect=UpstreamError(400))
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        with pytest.raises(Exception):
+            asyncio.run(service.create_chat_completion(make_request()))
+    assert upstream.await_count == 1
+
+
+def test_client_errors_do_not_open_the_circuit():
+    service = LLMService()
+    service.config.get_fallbacks = lambda provider_name, model_name: []
+    breaker = service.balancer.stats_for("azure/gpt-4.1-mini/default").breaker
+    upstream = mock.AsyncMock(side_effect=UpstreamError(400))
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        for _ in range(breaker.settings.min_calls * 2):
+            with pytest.raises(Exception):
+                asyncio.run(service.create_chat_completion(make_request()))
+    assert breaker.state == CLOSED
+    assert service.balancer.snapshot()["azure/gpt-4.1-mini/default"]["outstanding"] == 0
+
+
+def test_cancelled_call_is_not_a_passing_probe():
+    service = LLMService()
+    breaker = service.balancer.stats_for("azure/gpt-4.1-mini/default").breaker
+    for _ in range(breaker.settings.min_calls):
+        breaker.record(0.1, True)
+
+    async def slow(**params):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(service._call("azure", "azure/gpt-4.1-mini/default", {}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # Past open_seconds: the next call is a probe
+    breaker._opened_at -= breaker.settings.open_seconds + 1
+    assert breaker.state == HALF_OPEN
+    with mock.patch.object(llm_service_module, "acompletion", slow):
+        asyncio.run(run())
+    assert breaker.state == HALF_OPEN
+
+
+def test_open_circuit_fails_fast_without_upstream_call():
+    service = LLMService()
+    service.config.get_fallbacks = lambda provider_name, model_name: []
+    breaker = service.balancer.stats_for("azure/gpt-4.1-mini/default").breaker
+    for _ in range(breaker.settings.min_calls):
+        breaker.record(0.1, True)
+    upstream = mock.AsyncMock(return_value=make_response("ok"))
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        started_at = time.perf_counter()
+        with pytest.raises(CircuitOpenError) as error:
+            asyncio.run(service.create_chat_completion(make_request()))
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(service.create_chat_completion(make_request(stream=True)))
+        elapsed = time.perf_counter() - started_at
+
+    upstream.assert_not_awaited()
+    assert error.value.retry_after > 0
+    assert elapsed < 0.1
+    assert service.balancer.snapshot()["azure/gpt-4.1-mini/default"]["circuit"] == OPEN
+
+
+def test_open_circuit_falls_back_to_next_model():
+    service = LLMService()
+    breaker = service.balancer.stats_for("azure/gpt-4.1-mini/default").breaker
+    for _ in range(breaker.settings.min_calls):
+        breaker.record(0.1, True)
+    upstream = mock.AsyncMock(return_value=make_response("ok"))
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        asyncio.run(service.create_chat_completion(make_request()))
+    assert upstream.await_args.kwargs["model"] == "openai/gpt-4o-mini"
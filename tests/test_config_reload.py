@@ -0,0 +1,145 @@
+import asyncio
+import os
+import signal
+from unittest import mock
+import yaml
+from app.config.config import Config
+from app.config.reloader import ConfigReloader
+
+BASE_CONFIG = {
+    "providers": {
+        "azure": {
+            "api_base": "https://azure.example.com",
+            "api_version": "2024-10-21",
+            "models": [{"name": "gpt-4.1-mini", "fallbacks": ["openai/gpt-4o-mini"]}]
+        },
+        "openai": {"api_base": "https://api.openai.com/v1", "models": [{"name": "gpt-4o-mini"}]}
+    },
+    "reload": {"poll_seconds": 0.01}
+}
+
+
+def write_config(path, data):
+    with open(path, "w") as f:
+        yaml.safe_dump(data, f)
+    # Make the change visible even within the filesystem's mtime resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def load_config(path, data):
+    write_config(path, data)
+    with mock.patch.dict("os.environ", {"CONFIG_PATH": str(path)}):
+        return Config()
+
+
+def with_model(data, provider_name, model):
+    data = yaml.safe_load(yaml.safe_dump(data))
+    data["providers"][provider_name]["models"].append(model)
+    return data
+
+
+def test_lookups_are_indexed_and_params_resolved(tmp_path):
+    with mock.patch.dict("os.environ", {"AZURE_API_KEY": "azure-secret"}):
+        config = load_config(tmp_path / "config.yaml", BASE_CONFIG)
+    assert config.get_model("azure", "gpt-4.1-mini").name == "gpt-4.1-mini"
+    assert config.get_fallbacks("azure", "gpt-4.1-mini") == [("openai", "gpt-4o-mini")]
+    assert config.get_upstream_params("azure", "gpt-4.1-mini", "default") == {
+        "model": "azure/gpt-4.1-mini",
+        "api_base": "https://azure.example.com",
+        "api_version": "2024-10-21",
+        "api_key": "azure-secret"
+    }
+    # Unlisted models get a deployment built from the provider settings
+    assert config.get_upstream_params("openai", "gpt-4o", "default")["model"] == "openai/gpt-4o"
+
+
+def test_unlisted_models_add_no_entries(tmp_path):
+    config = load_config(tmp_path / "config.yaml", BASE_CONFIG)
+    routes = config.routes
+    sizes = (len(routes.deployments), len(routes.upstream_params))
+    for i in range(100):
+        assert config.get_upstream_params("openai", f"model-{i}", "default")["model"] == f"openai/model-{i}"
+        assert config.get_scope("openai", f"model-{i}") == "openai/*"
+    assert (len(routes.deployments), len(routes.upstream_params)) == sizes
+    assert config.get_scope("openai", "gpt-4o-mini") == "openai/gpt-4o-mini"
+
+
+def test_reload_swaps_in_new_routes(tmp_path):
+    path = tmp_path / "config.yaml"
+    config = load_config(path, BASE_CONFIG)
+    old_routes = config.routes
+    write_config(path, with_model(BASE_CONFIG, "azure", {"name": "gpt-4o", "context_length": 128000}))
+
+    assert config.changed()
+    assert config.reload()
+    assert config.get_model("azure", "gpt-4o").context_length == 128000
+    assert not config.changed()
+    # The previous table is untouched, so requests that hold it are unaffected
+    assert ("azure", "gpt-4o") not in old_routes.models
+
+
+def test_invalid_config_keeps_current_routes(tmp_path):
+    path = tmp_path / "config.yaml"
+    config = load_config(path, BASE_CONFIG)
+    routes = config.routes
+    write_config(path, with_model(BASE_CONFIG, "azure", {"name": "gpt-4o", "fallbacks": ["unknown/model"]}))
+
+    assert not config.reload()
+    assert config.routes is routes
+    # Reported once, until the file changes again
+    assert not config.changed()
+    write_config(path, BASE_CONFIG)
+    assert config.changed()
+
+
+def test_duplicate_deployment_names_are_rejected(tmp_path):
+    path = tmp_path / "config.yaml"
+    config = load_config(path, BASE_CONFIG)
+    deployments = [{"api_base": "https://east.example.com"}, {"api_base": "https://west.example.com"}]
+    write_config(path, with_model(BASE_CONFIG, "azure", {"name": "gpt-4o", "deployments": deployments}))
+
+    assert not config.reload()
+
+
+def test_restart_only_changes_are_reported_once(tmp_path, caplog):
+    path = tmp_path / "config.yaml"
+    config = load_config(path, BASE_CONFIG)
+    data = dict(BASE_CONFIG, reload={"poll_seconds": 5})
+    for model in ("gpt-4o", "gpt-4o-2"):
+        data = with_model(data, "azure", {"name": model})
+        write_config(path, data)
+        assert config.reload()
+    data["reload"] = {"poll_seconds": 10}
+    write_config(path, data)
+    assert config.reload()
+
+    warnings = [record.message for record in caplog.records if "take effect on restart" in record.message]
+    assert warnings == ["Config sections reload changed; they take effect on restart"] * 2
+
+
+def test_reloader_watches_file_and_sighup(tmp_path):
+    path = tmp_path / "config.yaml"
+    config = load_config(path, BASE_CONFIG)
+    reloader = ConfigReloader(config)
+
+    async def run():
+        reloader.start()
+        try:
+            write_config(path, with_model(BASE_CONFIG, "azure", {"name": "gpt-4o"}))
+            for _ in range(100):
+                if reloader.reloads:
+                    break
+                await asyncio.sleep(0.01)
+            assert config.get_model("azure", "gpt-4o")
+
+            os.kill(os.getpid(), signal.SIGHUP)
+            for _ in range(100):
+                if reloader.reloads == 2:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await reloader.stop()
+
+    asyncio.run(run())
+    assert reloader.stats() == {"reloads": 2, "failures": 0, "models": 3}
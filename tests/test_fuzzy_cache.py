@@ -0,0 +1,55 @@
+import time
+from app.services.fuzzy_cache import FuzzyIndex, MinHasher, normalize_tokens
+from conftest import make_request
+
+PROMPT = (
+    "Classify the sentiment of the following customer review as positive, negative or neutral. "
+    "Review: The delivery was quick and the packaging was intact, but the product stopped working "
+    "after two days and support never answered my emails. Report generated at {timestamp}."
+)
+
+
+def test_normalization_masks_timestamps_and_whitespace():
+    first = make_request(PROMPT.format(timestamp="2025-05-01T10:00:00Z"))
+    second = make_request("  " + PROMPT.format(timestamp="2025-05-02 11:30:15").upper().replace(" ", "   "))
+    assert normalize_tokens(first) == normalize_tokens(second)
+
+
+def test_signature_similarity_tracks_overlap():
+    hasher = MinHasher(num_perm=64)
+    base = normalize_tokens(make_request(PROMPT.format(timestamp="now")))
+    reworded = normalize_tokens(make_request(PROMPT.format(timestamp="now").replace("quick", "fast")))
+    unrelated = normalize_tokens(make_request("Translate this sentence into French: where is the train station?"))
+
+    assert MinHasher.similarity(hasher.signature(base), hasher.signature(base)) == 1.0
+    assert MinHasher.similarity(hasher.signature(base), hasher.signature(reworded)) > 0.6
+    assert MinHasher.similarity(hasher.signature(base), hasher.signature(unrelated)) < 0.2
+
+
+def test_index_returns_near_duplicates_only():
+    index = FuzzyIndex()
+    expires_at = time.time() + 60
+    index.put("k", make_request(PROMPT.format(timestamp="2025-05-01T10:00:00Z")), b"cached", expires_at)
+
+    assert index.get(make_request(PROMPT.format(timestamp="2025-06-01T09:00:00Z")), threshold=0.9) == b"cached"
+    assert index.get(make_request("Summarize the plot of Hamlet in one line."), threshold=0.9) is None
+    # Different sampling params live in a different namespace
+    assert index.get(make_request(PROMPT.format(timestamp="x"), temperature=0.5), threshold=0.5) is None
+
+
+def test_index_evicts_and_tracks_memory():
+    index = FuzzyIndex(max_entries=2)
+    expires_at = time.time() + 60
+    for i in range(3):
+        index.put(f"k{i}", make_request(f"prompt number {i} " + "filler " * i), b"x" * 100, expires_at)
+
+    assert len(index) == 2
+    footprint = index.memory_bytes()
+    assert footprint > 200
+    index.put("k3", make_request("one more prompt"), b"x" * 100, expires_at)
+    assert len(index) == 2
+    assert index.memory_bytes() == footprint
+
+    # Re-indexing the same exact key replaces the previous entry
+    index.put("k3", make_request("one more prompt"), b"x" * 100, expires_at)
+    assert len(index) == 2
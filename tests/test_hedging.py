@@ -0,0 +1,163 @@
+import asyncio
+from unittest import mock
+import pytest
+from app.config.config import Deployment, Model, RoutingTable
+from app.services import llm_service as llm_service_module
+from app.services.hedging import HedgeBudget, LatencyTracker, hedge
+from app.services.llm_service import LLMService
+from conftest import make_request, make_response
+
+
+def test_hedge_skipped_for_fast_primary():
+    async def fast():
+        return "primary"
+
+    async def alternate():
+        raise AssertionError("should not run")
+
+    allow = mock.Mock(return_value=True)
+    assert asyncio.run(hedge(fast, alternate, 0.05, allow)) == "primary"
+    allow.assert_not_called()
+
+
+def test_hedge_alternate_wins_and_primary_is_cancelled():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "primary"
+
+    async def alternate():
+        return "alternate"
+
+    async def run():
+        result = await hedge(slow, alternate, 0.01, lambda: True)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "alternate"
+    assert cancelled == [True]
+
+
+def test_hedge_uses_surviving_call_when_one_fails():
+    async def slow():
+        await asyncio.sleep(0.03)
+        return "primary"
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    assert asyncio.run(hedge(slow, failing, 0.01, lambda: True)) == "primary"
+
+
+def test_hedge_budget_caps_extra_calls():
+    budget = HedgeBudget(ratio=0.25, burst=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(4):
+        budget.deposit()
+    assert budget.try_spend()
+    assert budget.stats() == {"hedged_requests": 2, "hedges_denied": 1}
+
+
+def test_latency_tracker_percentile():
+    tracker = LatencyTracker()
+    for value in range(1, 101):
+        tracker.record(value / 100)
+    assert tracker.percentile(0.95) == 0.95
+    assert tracker.percentile(0.5) == 0.5
+
+
+def test_fallback_chain_on_error():
+    service = LLMService()
+    service.config.retries.max_retries = 0
+    calls = []
+
+    async def upstream(**params):
+        calls.append(params["model"])
+        if params["model"].startswith("azure/"):
+            raise RuntimeError("azure is down")
+        return make_response("from openai")
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        response = asyncio.run(service.create_chat_completion(make_request()))
+
+    assert calls == ["azure/gpt-4.1-mini", "openai/gpt-4o-mini"]
+    assert response.choices[0].message.content == "from openai"
+    assert service.fallbacks == 1
+
+
+def test_slow_deployment_is_hedged_on_another_deployment():
+    service = LLMService()
+    service.config.hedging.enabled = True
+    service.config.hedging.initial_delay_ms = 10
+    service.config.get_provider("azure").models.append(Model(name="multi", deployments=[
+        Deployment(name="slow", api_base="https://slow.example.com"),
+        Deployment(name="fast", api_base="https://fast.example.com"),
+    ]))
+    service.config.routes = RoutingTable(service.config.providers)
+    service.balancer.choose = lambda scope, deployments: deployments[0]
+
+    async def upstream(**params):
+        if params["api_base"] == "https://slow.example.com":
+            await asyncio.sleep(1)
+            return make_response("slow")
+        return make_response("fast")
+
+    async def run():
+        response = await service.create_chat_completion(make_request(model="azure/multi"))
+        await asyncio.sleep(0)
+        return response
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        response = asyncio.run(run())
+
+    assert response.choices[0].message.content == "fast"
+    assert service.hedge_budget.hedged == 1
+    assert service.balancer.snapshot()["azure/multi/slow"]["outstanding"] == 0
+
+
+def test_client_errors_do_not_fall_back():
+    service = LLMService()
+    calls = []
+
+    class BadRequest(Exception):
+        status_code = 400
+
+    async def upstream(**params):
+        calls.append(params["model"])
+        raise BadRequest("invalid messages")
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        with pytest.raises(Exception, match="invalid messages"):
+            asyncio.run(service.create_chat_completion(make_request()))
+
+    assert calls == ["azure/gpt-4.1-mini"]
+    assert service.fallbacks == 0
+
+
+def test_stream_falls_back_before_first_token():
+    service = LLMService()
+
+    async def chunks():
+        yield {"choices": [{"delta": {"content": "hi"}}]}
+
+    async def upstream(**params):
+        if params["model"].startswith("azure/"):
+            raise RuntimeError("azure is down")
+        return chunks()
+
+    async def run():
+        stream = await service.create_chat_completion(make_request(stream=True))
+        return [event async for event in stream]
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream), \
+            mock.patch.object(llm_service_module.SSEEncoder, "encode", lambda self, chunk: b"data: chunk\n\n"):
+        events = asyncio.run(run())
+
+    assert events == [b"data: chunk\n\n", llm_service_module.SSE_DONE]
+    assert service.fallbacks == 1
@@ -0,0 +1,163 @@
+import asyncio
+import socket
+from unittest import mock
+import httpcore
+import httpx
+from litellm import ModelResponse
+from app.config.config import HttpPoolSettings
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.http_pool import CachingResolver, HttpPool
+from app.services.jwks_cache import JWKSCache
+from app.services.llm_service import LLMService
+
+
+class FakeBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, refused=()):
+        self.connected = []
+        self.refused = set(refused)
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.connected.append(host)
+        if host in self.refused:
+            raise httpcore.ConnectError(f"{host} refused")
+        return mock.Mock(spec=httpcore.AsyncNetworkStream)
+
+
+def addrinfo(*addresses):
+    return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 443)) for address in addresses]
+
+
+def test_resolver_caches_dns_answers():
+    backend = FakeBackend()
+    resolver = CachingResolver(ttl=60, backend=backend)
+    with mock.patch("socket.getaddrinfo", return_value=addrinfo("10.0.0.1")) as getaddrinfo:
+        async def run():
+            for _ in range(3):
+                await resolver.connect_tcp("api.example.com", 443)
+            await resolver.connect_tcp("127.0.0.1", 443)
+        asyncio.run(run())
+
+    assert getaddrinfo.call_count == 1
+    assert backend.connected == ["10.0.0.1", "10.0.0.1", "10.0.0.1", "127.0.0.1"]
+    assert (resolver.hits, resolver.misses) == (2, 1)
+
+
+def test_resolver_tries_next_address_and_forgets_dead_entries():
+    backend = FakeBackend(refused={"10.0.0.1"})
+    resolver = CachingResolver(ttl=60, backend=backend)
+    with mock.patch("socket.getaddrinfo", return_value=addrinfo("10.0.0.1", "10.0.0.2")):
+        asyncio.run(resolver.connect_tcp("api.example.com", 443))
+    assert backend.connected == ["10.0.0.1", "10.0.0.2"]
+
+    backend.refused.add("10.0.0.2")
+    with mock.patch("socket.getaddrinfo", return_value=addrinfo("10.0.0.1", "10.0.0.2")):
+        try:
+            asyncio.run(resolver.connect_tcp("api.example.com", 443))
+        except httpcore.ConnectError:
+            pass
+        else:
+            raise AssertionError("Expected ConnectError")
+    assert resolver._cache == {}
+
+
+async def start_server():
+    """HTTP/1.1 keep-alive server that counts the connections it accepts"""
+    accepted = []
+
+    async def handle(reader, writer):
+        accepted.append(writer)
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            body = b"" if head.startswith(b"HEAD") else b"ok"
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n" + body)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, accepted, f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def test_pool_prewarms_and_reuses_connections():
+    async def run():
+        server, accepted, base_url = await start_server()
+        pool = HttpPool(HttpPoolSettings(http2=False, prewarm_connections=1))
+        try:
+            assert await pool.prewarm([base_url + "/v1", base_url + "/openai"]) == 1
+            assert len(accepted) == 1
+            for _ in range(5):
+                response = await pool.client.post(base_url + "/v1/chat/completions")
+                assert response.text == "ok"
+            assert len(accepted) == 1
+            assert pool.stats()["connections"] == 1
+        finally:
+            await pool.aclose()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_pools_connect_through_dns_cache():
+    # Guards the httpx/httpcore internals the pool relies on when upgrading them
+    pool = HttpPool(HttpPoolSettings())
+    transport = pool.transport.transport_for(httpx.URL("https://api.example.com/v1/chat/completions"))
+    assert transport._pool._network_backend is pool.resolver
+    assert pool.stats()["http2"]
+    asyncio.run(pool.aclose())
+
+
+def test_service_routes_upstream_calls_through_pool():
+    service = LLMService()
+    service.config.http_pool.prewarm = False
+    upstream = mock.AsyncMock(return_value=ModelResponse(model="claude"))
+
+    async def run():
+        await service.start(background=False)
+        try:
+            assert service.litellm.aclient_session is service.http_pool.client
+            with mock.patch.object(llm_service_module, "acompletion", upstream):
+                request = ChatCompletionRequest(model="anthropic/claude-2", messages=[{"role": "user", "content": "Hi"}])
+                await service.create_chat_completion(request)
+        finally:
+            await service.aclose()
+
+    asyncio.run(run())
+    assert upstream.call_args.kwargs["client"].client is service.http_pool.client
+    assert service.litellm.aclient_session is None
+
+
+def test_pool_is_not_used_before_litellm_is_loaded():
+    """Building the litellm handler imports litellm on the event loop, which must not race its import in a thread"""
+    service = LLMService()
+    service.config.http_pool.prewarm = False
+    loaded = asyncio.Event()
+
+    async def slow_load():
+        await loaded.wait()
+        return service.litellm
+
+    async def run():
+        with mock.patch.object(llm_service_module, "load_litellm", slow_load), \
+                mock.patch.object(service.http_pool, "litellm_handler") as handler:
+            await service.start()
+            _, _, params = service._route({"messages": []}, "anthropic", "claude-2")
+            assert "client" not in params
+            handler.assert_not_called()
+            loaded.set()
+            await service._warm_up_task
+            _, _, params = service._route({"messages": []}, "anthropic", "claude-2")
+            assert params["client"] is handler.return_value
+            await service.aclose()
+
+    asyncio.run(run())
+
+
+def test_jwks_fetch_uses_shared_client():
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"keys": []})))
+    cache = JWKSCache("https://example.test/jwks.json", client=client)
+    assert asyncio.run(cache._fetch_jwks()) == {"keys": []}
+    assert not client.is_closed
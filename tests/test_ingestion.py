@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from unittest import mock
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+from litellm import ModelResponse
+from app import routes
+from app.models import ChatCompletionRequest
+from app.services.batch import prepare_line
+from app.services.llm_service import LLMService
+
+
+def make_app():
+    app = FastAPI()
+    app.include_router(routes.router)
+    return app
+
+
+def test_route_decodes_body_into_request():
+    create = mock.AsyncMock(return_value=ModelResponse(model="gpt-4.1-mini"))
+    with mock.patch.object(routes, "rate_limiter", None), \
+            mock.patch.object(routes.llm_service, "create_chat_completion", create):
+        response = TestClient(make_app()).post(
+            "/models/azure/gpt-4.1-mini",
+            json={"model": "ignored/model", "messages": [{"role": "user", "content": "Hi"}], "max_tokens": 5}
+        )
+    assert response.status_code == 200
+    chat_request = create.call_args.args[0]
+    assert isinstance(chat_request, ChatCompletionRequest)
+    assert chat_request.model == "azure/gpt-4.1-mini"
+    assert chat_request.messages[0].content == "Hi"
+    assert chat_request.max_tokens == 5
+
+
+def test_route_rejects_invalid_body_with_body_locations():
+    client = TestClient(make_app())
+    with mock.patch.object(routes, "rate_limiter", None):
+        missing = client.post("/models/azure/gpt-4.1-mini", json={"model": "azure/gpt-4.1-mini", "messages": [{"role": "user"}]})
+        malformed = client.post("/models/azure/gpt-4.1-mini", content=b"{not json", headers={"content-type": "application/json"})
+    assert missing.status_code == 422
+    assert missing.json()["detail"][0]["loc"] == ["body", "messages", 0, "content"]
+    assert malformed.status_code == 422
+    assert malformed.json()["detail"][0]["type"] == "json_invalid"
+
+
+def test_openapi_documents_request_body():
+    schema = make_app().openapi()["paths"]["/models/{provider}/{model_id}"]["post"]["requestBody"]
+    body = schema["content"]["application/json"]["schema"]
+    assert "$ref" not in str(body)
+    assert body["properties"]["messages"]["items"]["required"] == ["role", "content"]
+
+
+def test_request_params_are_not_formatted_without_debug_logging():
+    service = LLMService()
+    request = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": "x" * 1000}])
+    upstream = mock.AsyncMock(return_value=ModelResponse(model="gpt-4.1-mini"))
+    logger = logging.getLogger("app.services.llm_service")
+    with mock.patch("app.services.llm_service.acompletion", upstream), \
+            mock.patch.object(logger, "isEnabledFor", return_value=False), \
+            mock.patch.object(logger, "debug") as debug:
+        asyncio.run(service.create_chat_completion(request))
+    assert not any("Request params" in str(call.args[0]) for call in debug.call_args_list)
+    # Message contents reach the upstream call without being copied
+    assert upstream.call_args.kwargs["messages"][0]["content"] is request.messages[0].content
+
+
+def test_prepare_line_overrides_without_copying():
+    result, request = prepare_line(3, b'{"custom_id": "a", "model": "x/y", "stream": true, "messages": [{"role": "user", "content": "Hi"}]}', model="azure/gpt-4.1-mini")
+    assert result == {"id": "a", "line": 3}
+    assert request.model == "azure/gpt-4.1-mini"
+    assert request.stream is False
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import pytest
+from unittest import mock
+import litellm
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from conftest import make_request, make_response
+
+
+def test_completion_uses_async_upstream():
+    """The upstream call is awaited rather than run synchronously on the loop"""
+    service = LLMService()
+    upstream = mock.AsyncMock(return_value=make_response())
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        response = asyncio.run(service.create_chat_completion(make_request()))
+
+    assert response.choices[0].message.content == "Test response"
+    params = upstream.await_args.kwargs
+    assert params["model"] == "azure/gpt-4.1-mini"
+    assert params["api_base"] == service.config.get_provider("azure").api_base
+
+
+def test_unsupported_params_are_dropped():
+    """OpenAI-only defaults such as presence_penalty must not fail calls to other providers"""
+    service = LLMService()
+    upstream = mock.AsyncMock(return_value=make_response())
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        asyncio.run(service.create_chat_completion(make_request(model="anthropic/claude-2")))
+
+    params = upstream.await_args.kwargs
+    assert params["model"] == "anthropic/claude-2"
+    assert params["presence_penalty"] == 0.0
+    assert params["drop_params"] is True
+
+
+def test_provider_concurrency_limit():
+    """No more than max_concurrency upstream calls are in flight per provider"""
+    service = LLMService()
+    service.config.providers["azure"].max_concurrency = 3
+    in_flight = 0
+    peak = 0
+
+    async def slow_upstream(**params):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return make_response()
+
+    async def run():
+        await asyncio.gather(*(service.create_chat_completion(make_request()) for _ in range(10)))
+
+    with mock.patch.object(llm_service_module, "acompletion", slow_upstream):
+        asyncio.run(run())
+
+    assert peak == 3
+
+
+def test_unknown_provider_raises():
+    service = LLMService()
+    with pytest.raises(Exception, match="not supported"):
+        asyncio.run(service.create_chat_completion(make_request(model="nope/model")))
+
+
+def test_streaming_yields_sse_events():
+    """Streaming requests relay upstream chunks as SSE events terminated by [DONE]"""
+    service = LLMService()
+
+    async def upstream(**params):
+        return await litellm.acompletion(
+            model="openai/gpt-4o",
+            messages=params["messages"],
+            stream=True,
+            mock_response='Hi "there"',
+        )
+
+    async def run():
+        stream = await service.create_chat_completion(make_request(stream=True))
+        return [event async for event in stream]
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        events = asyncio.run(run())
+
+    assert events[-1] == b"data: [DONE]\n\n"
+    payloads = [json.loads(event[len(b"data: "):]) for event in events[:-1]]
+    assert "".join(p["choices"][0]["delta"].get("content", "") for p in payloads) == 'Hi "there"'
+    assert payloads[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_streaming_error_is_reported_in_stream():
+    service = LLMService()
+    upstream = mock.AsyncMock(side_effect=RuntimeError("upstream down"))
+
+    async def run():
+        stream = await service.create_chat_completion(make_request(stream=True))
+        return [event async for event in stream]
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        events = asyncio.run(run())
+
+    error = json.loads(events[0][len(b"data: "):])
+    assert error["error"]["type"] == "streaming_error"
+    assert events[-1] == b"data: [DONE]\n\n"
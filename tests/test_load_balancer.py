@@ -0,0 +1,80 @@
+import asyncio
+from unittest import mock
+from app.config.config import Deployment, LoadBalancingSettings, Model, RoutingTable
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.load_balancer import LoadBalancer
+from conftest import make_response
+
+
+def test_least_outstanding_respects_weight():
+    balancer = LoadBalancer(LoadBalancingSettings())
+    deployments = [Deployment(name="a", weight=2), Deployment(name="b", weight=1)]
+    picks = []
+    for _ in range(3):
+        deployment = balancer.choose("azure/m", deployments)
+        balancer.start(f"azure/m/{deployment.name}")
+        picks.append(deployment.name)
+    assert sorted(picks) == ["a", "a", "b"]
+
+
+def test_ewma_prefers_faster_deployment_and_penalizes_errors():
+    balancer = LoadBalancer(LoadBalancingSettings(strategy="ewma", error_penalty_seconds=5.0))
+    deployments = [Deployment(name="fast"), Deployment(name="slow")]
+    with mock.patch("app.services.load_balancer.time.perf_counter", side_effect=[0.0, 0.05, 0.0, 0.5]):
+        balancer.finish("azure/m/fast", balancer.start("azure/m/fast"))
+        balancer.finish("azure/m/slow", balancer.start("azure/m/slow"))
+    assert balancer.choose("azure/m", deployments).name == "fast"
+
+    with mock.patch("app.services.load_balancer.time.perf_counter", side_effect=[0.0, 0.01]):
+        balancer.finish("azure/m/fast", balancer.start("azure/m/fast"), error=True)
+    assert balancer.choose("azure/m", deployments).name == "slow"
+    assert balancer.snapshot()["azure/m/fast"]["errors"] == 1
+
+
+def test_deployments_inherit_provider_settings():
+    service = LLMService()
+    provider = service.config.get_provider("azure")
+    provider.models.append(Model(name="multi", deployments=[
+        Deployment(name="east"),
+        Deployment(name="west", api_base="https://west.example.com", api_version="2024-10-21", api_key_env="WEST_KEY"),
+    ]))
+    service.config.routes = RoutingTable(service.config.providers)
+    east, west = service.config.get_deployments("azure", "multi")
+    assert east.api_base == provider.api_base
+    assert east.api_version == provider.api_version
+    assert east.api_key_env == "AZURE_API_KEY"
+    assert west.api_base == "https://west.example.com"
+    assert west.api_version == "2024-10-21"
+    assert west.model == "multi"
+
+
+def test_service_spreads_calls_across_deployments():
+    service = LLMService()
+    service.config.get_provider("azure").models.append(Model(name="multi", deployments=[
+        Deployment(name="east", api_base="https://east.example.com"),
+        Deployment(name="west", api_base="https://west.example.com", api_key_env="WEST_KEY"),
+    ]))
+    with mock.patch.dict("os.environ", {"WEST_KEY": "west-secret"}):
+        # Credentials are resolved when the routing table is built
+        service.config.routes = RoutingTable(service.config.providers)
+    api_bases = []
+
+    async def upstream(**params):
+        api_bases.append((params["api_base"], params.get("api_key")))
+        await asyncio.sleep(0.01)
+        return make_response("ok")
+
+    async def run():
+        request = ChatCompletionRequest(model="azure/multi", messages=[{"role": "user", "content": "Hi"}], temperature=0.7)
+        await asyncio.gather(*(service.create_chat_completion(request) for _ in range(4)))
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        asyncio.run(run())
+
+    assert api_bases.count(("https://west.example.com", "west-secret")) == 2
+    assert sum(1 for base, _ in api_bases if base == "https://east.example.com") == 2
+    snapshot = service.balancer.snapshot()
+    assert snapshot["azure/multi/east"]["outstanding"] == 0
+    assert snapshot["azure/multi/west"]["requests"] == 2
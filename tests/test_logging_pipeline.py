@@ -0,0 +1,96 @@
+import io
+import json
+import logging
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.config.config import LoggingSettings
+from app.middleware.access_log import AccessLogMiddleware
+from app.services.logging_pipeline import LoggingPipeline
+
+
+def pipeline_logger(pipeline: LoggingPipeline, name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [pipeline.handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def test_records_are_written_as_json_by_the_listener():
+    stream = io.StringIO()
+    pipeline = LoggingPipeline(LoggingSettings(), stream=stream)
+    logger = pipeline_logger(pipeline, "test.pipeline.json")
+
+    pipeline.start()
+    logger.info("%s took %.1f ms", "GET /health", 1.25, extra={"status": 200})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed")
+    pipeline.stop()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["message"] == "GET /health took 1.2 ms"
+    assert first["status"] == 200
+    assert first["level"] == "INFO"
+    assert first["logger"] == "test.pipeline.json"
+    assert second["level"] == "ERROR"
+    assert "ValueError: boom" in second["exception"]
+
+
+def test_info_records_are_sampled_per_logger():
+    stream = io.StringIO()
+    pipeline = LoggingPipeline(LoggingSettings(sample_rates={"test.sampled": 0.25}), stream=stream)
+    sampled = pipeline_logger(pipeline, "test.sampled.child")
+    other = pipeline_logger(pipeline, "test.unsampled")
+
+    pipeline.start()
+    for i in range(100):
+        sampled.info("sampled %d", i)
+        other.info("kept %d", i)
+    sampled.warning("always kept")
+    pipeline.stop()
+
+    messages = [json.loads(line)["message"] for line in stream.getvalue().splitlines()]
+    assert sum(message.startswith("sampled") for message in messages) == 25
+    assert messages[0] == "sampled 0"
+    assert sum(message.startswith("kept") for message in messages) == 100
+    assert "always kept" in messages
+    assert pipeline.stats()["sampled_out"] == 75
+
+
+def test_full_queue_drops_records_without_blocking():
+    stream = io.StringIO()
+    pipeline = LoggingPipeline(LoggingSettings(queue_size=5), stream=stream)
+    logger = pipeline_logger(pipeline, "test.pipeline.full")
+
+    # Nothing is written until the listener starts, so the queue fills up
+    for i in range(20):
+        logger.info("record %d", i)
+    assert pipeline.stats()["dropped"] == 15
+    pipeline.start()
+    pipeline.stop()
+    assert len(stream.getvalue().splitlines()) == 5
+
+
+def test_access_log_writes_one_line_per_request(caplog):
+    app = FastAPI()
+
+    @app.get("/models/list")
+    async def list_models(request: Request):
+        return {}
+
+    app.add_middleware(AccessLogMiddleware)
+
+    @app.middleware("http")
+    async def authenticate(request, call_next):
+        request.state.user = {"sub": "client@clients"}
+        return await call_next(request)
+
+    with caplog.at_level(logging.INFO, logger="app.access"):
+        TestClient(app).get("/models/list")
+
+    records = [record for record in caplog.records if record.name == "app.access"]
+    assert len(records) == 1
+    assert records[0].getMessage().startswith("GET /models/list 200")
+    assert (records[0].method, records[0].path, records[0].status, records[0].user) == ("GET", "/models/list", 200, "client@clients")
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import litellm
+from litellm import ModelResponse
+from app import routes
+from app.config.config import MetricsSettings
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.metrics import LLMMetrics
+
+# Not a process id on Linux (pid_max is at most 2**22)
+DEAD_PID = 2 ** 22 + 1
+
+
+class UpstreamError(Exception):
+    status_code = 429
+
+
+def sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"No sample {line_prefix} in\n{text}")
+
+
+def test_upstream_calls_are_recorded_per_deployment():
+    service = LLMService()
+    request = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": "Hi"}])
+    response = ModelResponse(model="gpt-4.1-mini", usage={"prompt_tokens": 5, "completion_tokens": 20, "total_tokens": 25})
+    upstream = mock.AsyncMock(side_effect=[response, UpstreamError("rate limited")])
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream), \
+            mock.patch.object(service.config.retries, "max_retries", 0):
+        asyncio.run(service.create_chat_completion(request))
+        try:
+            asyncio.run(service.create_chat_completion(request))
+        except Exception:
+            pass
+
+    text = service.metrics.render()
+    labels = 'provider="azure",model="gpt-4.1-mini",deployment="default"'
+    assert sample(text, f'llm_upstream_requests_total{{{labels},status="200"}}') == 1
+    assert sample(text, f'llm_upstream_requests_total{{{labels},status="429"}}') == 1
+    assert sample(text, f'llm_upstream_request_duration_seconds_count{{{labels}}}') == 2
+    assert sample(text, f'llm_upstream_request_duration_seconds_bucket{{{labels},le="+Inf"}}') == 2
+    assert sample(text, f'llm_tokens_total{{{labels},type="completion"}}') == 20
+    assert sample(text, f'llm_completion_tokens_per_second_count{{{labels}}}') == 1
+    assert sample(text, f'llm_upstream_in_flight{{{labels}}}') == 0
+
+
+def test_unlisted_models_share_one_label_set():
+    service = LLMService()
+    upstream = mock.AsyncMock(return_value=ModelResponse(usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}))
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        for i in range(20):
+            request = ChatCompletionRequest(model=f"openai/made-up-{i}", messages=[{"role": "user", "content": "Hi"}])
+            asyncio.run(service.create_chat_completion(request))
+
+    text = service.metrics.render()
+    assert sample(text, 'llm_upstream_requests_total{provider="openai",model="*",deployment="default",status="200"}') == 20
+    assert "made-up" not in text
+    assert upstream.await_args.kwargs["model"] == "openai/made-up-19"
+
+
+def test_streams_record_time_to_first_token():
+    service = LLMService()
+    request = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": "Hi"}], stream=True)
+
+    async def upstream(**params):
+        return await litellm.acompletion(model="openai/gpt-4o", messages=params["messages"], stream=True, mock_response="Hello there")
+
+    async def run():
+        stream = await service.create_chat_completion(request)
+        return [event async for event in stream]
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        asyncio.run(run())
+
+    text = service.metrics.render()
+    labels = 'provider="azure",model="gpt-4.1-mini",deployment="default"'
+    assert sample(text, f'llm_time_to_first_token_seconds_count{{{labels}}}') == 1
+    assert sample(text, f'llm_upstream_requests_total{{{labels},status="200"}}') == 1
+    assert sample(text, f'llm_upstream_in_flight{{{labels}}}') == 0
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = LLMMetrics(MetricsSettings())
+    labels = metrics.labels("openai/gpt-4o/default")
+    for value in (0.05, 0.3, 0.3, 200):
+        metrics.latency.observe(labels, value)
+
+    text = metrics.render()
+    prefix = 'llm_upstream_request_duration_seconds_bucket{provider="openai",model="gpt-4o",deployment="default",le='
+    assert sample(text, prefix + '"0.1"}') == 1
+    assert sample(text, prefix + '"0.25"}') == 1
+    assert sample(text, prefix + '"0.5"}') == 3
+    assert sample(text, prefix + '"120"}') == 3
+    assert sample(text, prefix + '"+Inf"}') == 4
+    assert sample(text, 'llm_upstream_request_duration_seconds_sum{provider="openai",model="gpt-4o",deployment="default"}') == 200.65
+
+
+def test_workers_are_summed_from_shared_directory(tmp_path):
+    settings = MetricsSettings(multiprocess_dir=str(tmp_path))
+    worker = LLMMetrics(settings)
+    labels = worker.labels("openai/gpt-4o/default")
+    worker.requests.inc(labels + ("200",), 3)
+    worker.in_flight.inc(labels, 2)
+
+    other = LLMMetrics(settings)
+    other.requests.inc(labels + ("200",), 4)
+    other.in_flight.inc(labels, 5)
+    # A worker of this server that has exited, and one of a server that is gone
+    with open(tmp_path / f"{os.getppid()}-{DEAD_PID}.json", "w") as f:
+        json.dump(other.snapshot(), f)
+    stale = tmp_path / f"{DEAD_PID}-123.json"
+    with open(stale, "w") as f:
+        json.dump(other.snapshot(), f)
+
+    text = worker.render()
+    labels_text = 'provider="openai",model="gpt-4o",deployment="default"'
+    # Counters of exited workers keep counting, their gauges do not
+    assert sample(text, f'llm_upstream_requests_total{{{labels_text},status="200"}}') == 7
+    assert sample(text, f'llm_upstream_in_flight{{{labels_text}}}') == 2
+    assert not stale.exists()
+    assert (tmp_path / f"{os.getppid()}-{os.getpid()}.json").exists()
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    app = FastAPI()
+    app.include_router(routes.router)
+    routes.llm_service.metrics.cache_lookup("azure/gpt-4.1-mini", "hit")
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE llm_upstream_request_duration_seconds histogram" in response.text
+    assert sample(response.text, 'llm_cache_requests_total{provider="azure",model="gpt-4.1-mini",result="hit"}') >= 1
+
+
+def test_concurrent_snapshot_writes_and_broken_directory(tmp_path):
+    metrics = LLMMetrics(MetricsSettings(multiprocess_dir=str(tmp_path / "metrics")))
+    metrics.requests.inc(metrics.labels("openai/gpt-4o/default") + ("200",))
+
+    async def run():
+        # Periodic flushes racing scrapes
+        await asyncio.gather(*(
+            asyncio.to_thread(metrics.write_snapshot if i % 2 else metrics.render, metrics.snapshot())
+            for i in range(50)
+        ))
+    asyncio.run(run())
+    assert os.listdir(tmp_path / "metrics") == [f"{os.getppid()}-{os.getpid()}.json"]
+
+    # The shared directory turned into a file
+    metrics.settings.multiprocess_dir = str(tmp_path / "metrics" / f"{os.getppid()}-{os.getpid()}.json")
+    text = metrics.render()
+    assert sample(text, 'llm_upstream_requests_total{provider="openai",model="gpt-4o",deployment="default",status="200"}') == 1
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from unittest import mock
+import pytest
+from app.config.config import PreflightSettings
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.preflight import ContextWindowExceededError, Preflight, TokenCounter
+from conftest import make_messages, make_request
+
+
+def test_token_counts_are_memoized():
+    counter = TokenCounter()
+    system_prompt = "You are a helpful assistant. " * 2000
+    first = counter.count_text(system_prompt, "o200k_base")
+    assert first > 10000
+
+    started_at = time.perf_counter()
+    for _ in range(100):
+        assert counter.count_text(system_prompt, "o200k_base") == first
+    assert (time.perf_counter() - started_at) / 100 < 0.001
+    assert counter.stats() == {"entries": 1, "hits": 100, "misses": 1}
+
+
+def test_approximate_tokenizer_and_unknown_encoding():
+    counter = TokenCounter()
+    assert counter.count_text("x" * 40, "approx") == 10
+    assert counter.count_text("x" * 40, "no-such-encoding") == 10
+
+
+def test_reject_strategy():
+    preflight = Preflight(PreflightSettings(min_completion_tokens=10))
+    request = make_request("x" * 400)
+    with pytest.raises(ContextWindowExceededError) as error:
+        preflight.check(request, 100, "approx", "reject")
+    assert error.value.prompt_tokens == 107
+
+
+def test_drop_oldest_and_keep_system():
+    preflight = Preflight(PreflightSettings(min_completion_tokens=10))
+    request = make_request(messages=make_messages([("system", "s" * 160), ("user", "a" * 160), ("assistant", "b" * 160), ("user", "c" * 40)]))
+
+    dropped = preflight.check(request, 120, "approx", "drop_oldest")
+    assert [message.content[0] for message in dropped.messages] == ["a", "b", "c"]
+
+    kept = preflight.check(request, 120, "approx", "keep_system")
+    assert [message.content[0] for message in kept.messages] == ["s", "b", "c"]
+
+    with pytest.raises(ContextWindowExceededError):
+        preflight.check(make_request("x" * 4000), 120, "approx", "keep_system")
+
+
+def test_max_tokens_is_clamped():
+    preflight = Preflight(PreflightSettings(min_completion_tokens=10))
+    request = make_request("x" * 40, max_tokens=1000)
+    checked = preflight.check(request, 100, "approx", "reject")
+    assert checked.max_tokens == 100 - (10 + 4 + 3)
+    assert preflight.check(make_request("hi", max_tokens=5), 100, "approx", "reject").max_tokens == 5
+
+
+def test_oversized_prompt_never_reaches_upstream():
+    service = LLMService()
+    service.config.get_model("azure", "gpt-4.1-mini").context_length = 1000
+    upstream = mock.AsyncMock()
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        with pytest.raises(ContextWindowExceededError):
+            asyncio.run(service.create_chat_completion(make_request("word " * 5000)))
+    upstream.assert_not_awaited()
+
+
+def test_large_prompts_are_encoded_off_the_event_loop():
+    counter = TokenCounter()
+    small = "You are a helpful assistant. "
+    large = "The quick brown fox. " * 5000
+
+    async def run():
+        with mock.patch("asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            await counter.prefetch([small], "o200k_base")
+            # Loading the encoder only
+            assert to_thread.call_count == 1
+            await counter.prefetch([small, large], "o200k_base")
+            assert to_thread.call_count == 2
+            await counter.prefetch([small, large], "o200k_base")
+            assert to_thread.call_count == 2
+
+    asyncio.run(run())
+    assert counter.stats() == {"entries": 2, "hits": 0, "misses": 2}
+    assert counter.count_text(large, "o200k_base") > 10000
+    assert counter.stats()["hits"] == 1
+
+
+def test_service_loads_configured_tokenizers_on_start():
+    service = LLMService()
+    service.config.http_pool.enabled = False
+    tokenizers = {model.tokenizer for model in service.config.routes.models.values() if model.context_length}
+
+    async def run():
+        with mock.patch.object(service.preflight.counter, "load") as load:
+            await service.start(background=False)
+            await service.aclose()
+        return load
+
+    load = asyncio.run(run())
+    load.assert_called_once_with(tokenizers)
@@ -0,0 +1,145 @@
+import asyncio
+from unittest import mock
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+from litellm import ModelResponse
+from app import routes
+from app.config.config import Quota, RateLimitSettings
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.rate_limiter import MemoryBucketStore, RateLimiter, SQLiteBucketStore, streamed_tokens, tenant_of
+from app.services.streaming import SSEEncoder
+from conftest import make_request
+
+
+def test_requests_per_minute_bucket_refills():
+    store = MemoryBucketStore()
+    bucket = [("tenant:rpm", 2.0, 1.0)]
+    assert store.take(bucket, 0.0)[0]
+    assert store.take(bucket, 0.0)[0]
+    allowed, _, retry_after = store.take(bucket, 0.0)
+    assert not allowed
+    assert retry_after == pytest.approx(30.0)
+    assert store.take(bucket, 30.0)[0]
+
+
+def test_denied_request_spends_nothing():
+    store = MemoryBucketStore()
+    buckets = [("tenant:rpm", 10.0, 1.0), ("tenant:tpm", 100.0, 80.0)]
+    assert store.take(buckets, 0.0)[0]
+    allowed, levels, _ = store.take(buckets, 0.0)
+    assert not allowed
+    assert levels == [9.0, 20.0]
+
+
+def test_cost_above_capacity_allowed_once_bucket_is_full():
+    store = MemoryBucketStore()
+    bucket = [("tenant:tpm", 100.0, 500.0)]
+    allowed, levels, _ = store.take(bucket, 0.0)
+    assert allowed
+    assert levels == [-400.0]
+    assert not store.take(bucket, 60.0)[0]
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "ratelimits.sqlite")
+    worker_a, worker_b = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    bucket = [("tenant:rpm", 3.0, 1.0)]
+    results = [store.take(bucket, 0.0)[0] for store in (worker_a, worker_b, worker_a, worker_b)]
+    assert results == [True, True, True, False]
+    worker_a.adjust("tenant:rpm", 3.0, -1.0, 0.0)
+    assert worker_b.take(bucket, 0.0)[0]
+    worker_a.close()
+    worker_b.close()
+
+
+def test_limiter_estimates_and_reconciles_tokens():
+    limiter = RateLimiter(RateLimitSettings(enabled=True, default=Quota(requests_per_minute=10, tokens_per_minute=1000)))
+    request = make_request("x" * 400, max_tokens=100)
+    estimated = limiter.estimate_tokens(request)
+    assert estimated == 200
+
+    async def run():
+        first = await limiter.check("acme", estimated)
+        await limiter.reconcile("acme", estimated, 50)
+        return first, await limiter.check("acme", estimated)
+
+    with mock.patch("app.services.rate_limiter.time.time", return_value=1000.0):
+        first, second = asyncio.run(run())
+    assert first.remaining_tokens == 800
+    assert second.remaining_tokens == 750
+    assert second.remaining_requests == 8
+    headers = second.headers()
+    assert headers["x-ratelimit-limit-tokens"] == "1000"
+    assert headers["x-ratelimit-remaining-requests"] == "8"
+    assert "Retry-After" not in headers
+
+
+def test_tenant_quota_override_and_tenant_key():
+    settings = RateLimitSettings(default=Quota(requests_per_minute=10), tenants={"client@clients": Quota(requests_per_minute=1)})
+    limiter = RateLimiter(settings)
+    assert limiter.quota_for("client@clients").requests_per_minute == 1
+    assert limiter.quota_for("other").requests_per_minute == 10
+    assert tenant_of({"sub": "client@clients", "azp": "client"}) == "client@clients"
+    assert tenant_of({"azp": "client"}) == "client"
+    assert tenant_of(None) == "anonymous"
+
+
+def test_route_returns_429_with_retry_after():
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = TestClient(app)
+    limiter = RateLimiter(RateLimitSettings(enabled=True, default=Quota(requests_per_minute=1)))
+    completion = ModelResponse(
+        model="azure/gpt-4.1-mini",
+        choices=[{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+        usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    )
+    body = {"model": "azure/gpt-4.1-mini", "messages": [{"role": "user", "content": "Hi"}]}
+
+    with mock.patch.object(routes, "rate_limiter", limiter), \
+            mock.patch.object(routes.llm_service, "create_chat_completion", mock.AsyncMock(return_value=completion)):
+        first = client.post("/models/azure/gpt-4.1-mini", json=body)
+        second = client.post("/models/azure/gpt-4.1-mini", json=body)
+
+    assert first.status_code == 200
+    assert first.headers["x-ratelimit-limit-requests"] == "1"
+    assert first.headers["x-ratelimit-remaining-requests"] == "0"
+    assert second.status_code == 429
+    assert int(second.headers["retry-after"]) >= 59
+
+
+def test_failed_requests_are_refunded_and_streams_reconciled():
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = TestClient(app)
+    limiter = RateLimiter(RateLimitSettings(enabled=True, default=Quota(tokens_per_minute=1000)))
+    body = {"model": "azure/gpt-4.1-mini", "messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 100}
+
+    async def stream():
+        yield b'data: {"choices":[{"index":0,"delta":{"content":"hi"}}]}\n\n'
+        yield b'data: {"choices":[],"usage":{"prompt_tokens":100,"completion_tokens":20,"total_tokens":120}}\n\n'
+        yield b"data: [DONE]\n\n"
+
+    with mock.patch.object(routes, "rate_limiter", limiter), \
+            mock.patch("app.services.rate_limiter.time.time", return_value=1000.0):
+        with mock.patch.object(routes.llm_service, "create_chat_completion", mock.AsyncMock(side_effect=CircuitOpenError("down", 5))):
+            failed = client.post("/models/azure/gpt-4.1-mini", json=body)
+        with mock.patch.object(routes.llm_service, "create_chat_completion", mock.AsyncMock(return_value=stream())):
+            streamed = client.post("/models/azure/gpt-4.1-mini", json={**body, "stream": True})
+            streamed.read()
+        after = asyncio.run(limiter.check("anonymous", 0))
+
+    assert failed.status_code == 503
+    assert streamed.status_code == 200
+    # Only the 120 tokens reported by the stream were charged
+    assert after.remaining_tokens == 880
+
+
+def test_streamed_tokens():
+    usage_event = b'data: {"choices":[],"usage":{"total_tokens":42}}\n\n'
+    error_event = SSEEncoder.encode_event({"error": {"message": "down", "type": "streaming_error"}})
+    assert streamed_tokens(usage_event, 5, 200) == 42
+    assert streamed_tokens(b'data: {"choices":[]}\n\n', 5, 200) == 200
+    assert streamed_tokens(error_event, 1, 200) == 0
+    assert streamed_tokens(None, 0, 200) == 0
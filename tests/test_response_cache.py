@@ -0,0 +1,108 @@
+import asyncio
+import time
+from unittest import mock
+from app.config.config import CacheSettings
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.response_cache import DiskTier, MemoryTier, ResponseCache, cache_key, parse_cache_control
+from conftest import make_request, make_response
+
+
+def test_cache_key_is_canonical():
+    first = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": "hi"}], temperature=0)
+    same = ChatCompletionRequest(temperature=0, messages=[{"content": "hi", "role": "user"}], model="azure/gpt-4.1-mini", stream=False)
+    different = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": "hi"}], temperature=0.5)
+
+    assert cache_key(first) == cache_key(same)
+    assert cache_key(first) != cache_key(different)
+
+
+def test_parse_cache_control():
+    assert parse_cache_control(None) == (True, True)
+    assert parse_cache_control("no-cache") == (False, True)
+    assert parse_cache_control("max-age=0, no-store") == (False, False)
+
+
+def test_memory_tier_evicts_by_size_and_ttl():
+    tier = MemoryTier(max_bytes=10)
+    expires_at = time.time() + 60
+    tier.put("a", expires_at, b"1234")
+    tier.put("b", expires_at, b"5678")
+    tier.get("a")  # a becomes most recently used
+    tier.put("c", expires_at, b"90ab")
+
+    assert tier.get("b") is None
+    assert tier.get("a") is not None
+    assert tier.size_bytes == 8
+
+    tier.put("old", time.time() - 1, b"x")
+    assert tier.get("old") is None
+    assert tier.size_bytes == 8
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    settings = CacheSettings(enabled=True, disk_path=str(tmp_path / "responses.sqlite"))
+
+    async def run():
+        await ResponseCache(settings).put("key", b"payload", ttl=60)
+        return await ResponseCache(settings).get("key")
+
+    assert asyncio.run(run()) == b"payload"
+
+
+def test_disk_tier_drops_soonest_expiring_when_over_size(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    tier = DiskTier(path, max_bytes=250)
+    now = time.time()
+    for i, ttl in enumerate((300, 100, 400)):
+        tier.put(f"key-{i}", now + ttl, b"x" * 100)
+    # The bound holds on every write, whichever worker wrote before
+    DiskTier(path, max_bytes=250).put("key-3", now + 200, b"x" * 100)
+    tier.put("key-0", now + 300, b"x" * 50)
+
+    assert tier.get("key-1") is None
+    assert tier.get("key-3") is None
+    assert tier.get("key-0") is not None
+    assert tier.get("key-2") is not None
+    assert tier._stored_bytes() == 150
+
+
+def test_service_serves_repeated_deterministic_requests_from_cache():
+    service = LLMService()
+    service.response_cache = ResponseCache(CacheSettings(enabled=True))
+    upstream = mock.AsyncMock(side_effect=lambda **params: make_response())
+
+    async def run():
+        first = await service.create_chat_completion(make_request(temperature=0))
+        second = await service.create_chat_completion(make_request(temperature=0))
+        bypass = await service.create_chat_completion(make_request(temperature=0), cache_control="no-cache")
+        sampled = await service.create_chat_completion(make_request(temperature=0.7))
+        return first, second, bypass, sampled
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        first, second, bypass, sampled = asyncio.run(run())
+
+    assert upstream.await_count == 3
+    assert first._hidden_params["cache_status"] == "MISS"
+    assert second._hidden_params["cache_status"] == "HIT"
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert bypass._hidden_params["cache_status"] == "BYPASS"
+    assert "cache_status" not in sampled._hidden_params
+
+
+def test_service_serves_near_duplicates_from_fuzzy_tier():
+    service = LLMService()
+    service.response_cache = ResponseCache(CacheSettings(enabled=True, fuzzy={"enabled": True}))
+    upstream = mock.AsyncMock(side_effect=lambda **params: make_response())
+    prompt = "Extract the invoice number and total from this email sent at {}: invoice INV-2231, total due 410 EUR."
+
+    async def run():
+        await service.create_chat_completion(make_request(temperature=0, messages=[{"role": "user", "content": prompt.format("2025-05-01 10:00")}]))
+        return await service.create_chat_completion(make_request(temperature=0, messages=[{"role": "user", "content": prompt.format("2025-05-03 18:45")}]))
+
+    with mock.patch.object(llm_service_module, "acompletion", upstream):
+        response = asyncio.run(run())
+
+    assert upstream.await_count == 1
+    assert response._hidden_params["cache_status"] == "HIT-FUZZY"
@@ -0,0 +1,63 @@
+import json
+from unittest import mock
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from starlette.testclient import TestClient
+from litellm import ModelResponse
+from app import routes
+from app.services.serialization import RawJSONResponse, completion_to_dict, completion_to_json, dumps
+
+
+def make_tool_call_response():
+    return ModelResponse(
+        model="azure/gpt-4.1-mini",
+        choices=[{
+            "index": 0,
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "call_1",
+                    "type": "function",
+                    "function": {"name": "lookup", "arguments": json.dumps({"query": "é" * 100})}
+                }]
+            },
+            "finish_reason": "tool_calls"
+        }],
+        usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    )
+
+
+def test_dumps_matches_fastapi_encoding():
+    body = completion_to_dict(make_tool_call_response())
+    assert json.loads(dumps(body)) == jsonable_encoder(body)
+
+
+def test_completion_to_json_matches_dict():
+    completion = make_tool_call_response()
+    assert json.loads(completion_to_json(completion)) == jsonable_encoder(completion_to_dict(completion))
+
+
+def test_raw_response_passes_bytes_through():
+    response = RawJSONResponse(b'{"a":1}', headers={"X-Cache": "HIT"})
+    assert response.body == b'{"a":1}'
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["content-length"] == "7"
+    assert response.headers["x-cache"] == "HIT"
+
+
+def test_route_returns_raw_json_with_headers():
+    app = FastAPI()
+    app.include_router(routes.router)
+    completion = make_tool_call_response()
+    completion._hidden_params["cache_status"] = "MISS"
+    with mock.patch.object(routes, "rate_limiter", None), \
+            mock.patch.object(routes.llm_service, "create_chat_completion", mock.AsyncMock(return_value=completion)):
+        response = TestClient(app).post(
+            "/models/azure/gpt-4.1-mini",
+            json={"model": "azure/gpt-4.1-mini", "messages": [{"role": "user", "content": "Hi"}]}
+        )
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json() == jsonable_encoder(completion_to_dict(completion))
+    assert response.json()["choices"][0]["message"]["tool_calls"][0]["function"]["name"] == "lookup"
@@ -0,0 +1,88 @@
+import os
+from unittest import mock
+import yaml
+from app import server
+from app.config.config import Config, SHARED_DISK_MAX_BYTES, STATE_DIR_ENV
+
+
+def write_config(path, data):
+    with open(path, "w") as f:
+        yaml.safe_dump(data, f)
+    return str(path)
+
+
+def test_workers_keep_unset_state_in_the_shared_directory(tmp_path):
+    config_path = write_config(tmp_path / "config.yaml", {
+        "providers": {},
+        "rate_limits": {"state_path": "/var/lib/llm-proxy/ratelimits.sqlite"},
+    })
+    state_dir = str(tmp_path / "state")
+    with mock.patch.dict("os.environ", {"CONFIG_PATH": config_path, STATE_DIR_ENV: state_dir}):
+        config = Config()
+
+    assert config.cache.disk_path == os.path.join(state_dir, "responses.sqlite")
+    assert config.cache.disk_max_bytes == SHARED_DISK_MAX_BYTES
+    assert config.circuit_breaker.state_path == os.path.join(state_dir, "circuits.sqlite")
+    assert config.metrics.multiprocess_dir == os.path.join(state_dir, "metrics")
+    # Explicitly configured locations are kept
+    assert config.rate_limits.state_path == "/var/lib/llm-proxy/ratelimits.sqlite"
+
+
+def test_single_process_has_no_shared_state(tmp_path):
+    config_path = write_config(tmp_path / "config.yaml", {"providers": {}})
+    with mock.patch.dict("os.environ", {"CONFIG_PATH": config_path}):
+        os.environ.pop(STATE_DIR_ENV, None)
+        config = Config()
+
+    assert config.state_dir is None
+    assert config.cache.disk_path is None
+    assert config.circuit_breaker.state_path is None
+
+
+def test_launcher_shares_a_state_directory_between_workers(tmp_path):
+    config_path = write_config(tmp_path / "config.yaml", {
+        "providers": {},
+        "server": {"workers": 4, "state_dir": str(tmp_path / "shm")},
+    })
+    # A directory left behind by a server that was killed
+    stale = tmp_path / "shm" / f"{server.STATE_DIR_PREFIX}999999999"
+    stale.mkdir(parents=True)
+    seen = {}
+
+    def run(app, **options):
+        seen.update(options, state_dir=os.environ.get(STATE_DIR_ENV))
+        assert os.path.isdir(seen["state_dir"])
+
+    with mock.patch.dict("os.environ", {"CONFIG_PATH": config_path}), \
+            mock.patch.object(server.uvicorn, "run", side_effect=run):
+        assert server.main(["--port", "9100"]) == 0
+        assert STATE_DIR_ENV not in os.environ
+
+    assert seen["workers"] == 4
+    assert seen["port"] == 9100
+    assert seen["state_dir"] == str(tmp_path / "shm" / f"{server.STATE_DIR_PREFIX}{os.getpid()}")
+    assert not os.path.exists(seen["state_dir"])
+    assert not stale.exists()
+
+
+def test_reload_runs_a_single_worker_without_shared_state(tmp_path):
+    config_path = write_config(tmp_path / "config.yaml", {"providers": {}, "server": {"workers": 0}})
+    with mock.patch.dict("os.environ", {"CONFIG_PATH": config_path}), \
+            mock.patch.object(server.uvicorn, "run") as run:
+        server.main(["--reload"])
+
+    assert run.call_args.kwargs["workers"] == 1
+    assert run.call_args.kwargs["reload"] is True
+    assert STATE_DIR_ENV not in os.environ
+
+
+def test_default_workers_follow_the_container_cpu_quota(tmp_path):
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text("150000 100000\n")
+    with mock.patch.object(server, "CGROUP_CPU_MAX", str(cpu_max)), \
+            mock.patch.object(server.os, "process_cpu_count", return_value=64, create=True):
+        assert server.cgroup_cpu_limit() == 1.5
+        assert server.default_workers() == 2
+        cpu_max.write_text("max 100000\n")
+        assert server.cgroup_cpu_limit() is None
+        assert server.default_workers() == server.MAX_AUTO_WORKERS
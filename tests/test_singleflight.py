@@ -0,0 +1,144 @@
+import asyncio
+from unittest import mock
+from litellm import ModelResponse
+from app.models import ChatCompletionRequest
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["result"] * 10
+    assert calls == 1
+    assert flight.stats()["coalescing_ratio"] == 0.9
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def run():
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("result", True)
+
+
+def test_shared_call_is_cancelled_when_nobody_waits():
+    flight = SingleFlight()
+    cancelled = False
+
+    async def run():
+        async def fetch():
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+
+        waiter = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert cancelled
+
+
+def test_stream_fans_out_to_late_subscribers():
+    flight = SingleFlight()
+    opened = 0
+
+    async def source():
+        nonlocal opened
+        opened += 1
+        for i in range(3):
+            await asyncio.sleep(0.005)
+            yield i
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [item async for item in flight.stream("key", source)]
+
+    async def run():
+        return await asyncio.gather(consume(0), consume(0), consume(0.007))
+
+    assert asyncio.run(run()) == [[0, 1, 2]] * 3
+    assert opened == 1
+
+
+def test_stream_is_paced_by_its_slowest_subscriber():
+    flight = SingleFlight(max_buffered=4)
+    pulled = 0
+
+    async def source():
+        nonlocal pulled
+        for i in range(1000):
+            pulled += 1
+            yield i
+
+    async def run():
+        stream = flight.stream("key", source)
+        first = await stream.__anext__()
+        await asyncio.sleep(0.01)
+        pulled_while_idle = pulled
+        # The first items were dropped from the buffer: a new caller gets its own stream
+        late = [item async for item in flight.stream("key", source)]
+        await stream.aclose()
+        return first, pulled_while_idle, late
+
+    first, pulled_while_idle, late = asyncio.run(run())
+    assert first == 0
+    assert pulled_while_idle <= 5
+    assert late == list(range(1000))
+    assert flight.stats()["upstream_calls"] == 2
+
+
+def test_service_coalesces_identical_deterministic_requests():
+    service = LLMService()
+    service.response_cache = None
+    service.singleflight = SingleFlight()
+
+    async def upstream(**params):
+        await asyncio.sleep(0.01)
+        return ModelResponse(
+            model="azure/gpt-4.1-mini",
+            choices=[{"index": 0, "message": {"role": "assistant", "content": "shared"}, "finish_reason": "stop"}],
+        )
+
+    request = ChatCompletionRequest(model="azure/gpt-4.1-mini", messages=[{"role": "user", "content": "Hi"}], temperature=0)
+
+    async def run():
+        return await asyncio.gather(*(service.create_chat_completion(request.model_copy()) for _ in range(5)))
+
+    upstream_mock = mock.AsyncMock(side_effect=upstream)
+    with mock.patch.object(llm_service_module, "acompletion", upstream_mock):
+        responses = asyncio.run(run())
+
+    assert upstream_mock.await_count == 1
+    assert all(response.choices[0].message.content == "shared" for response in responses)
+    assert len({id(response) for response in responses}) == 5
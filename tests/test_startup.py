@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_app_import_does_not_load_heavy_modules():
+    """litellm, the provider SDKs and Phoenix load after startup, not on import"""
+    code = "import sys, app.main; print(*sorted(m for m in ('litellm', 'openai', 'phoenix', 'opentelemetry') if m in sys.modules))"
+    env = {**os.environ, "LITELLM_LOCAL_MODEL_COST_MAP": "True"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,82 @@
+import threading
+import time
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+from app.services.tracing import BatchExportProcessor, TailSamplingProcessor
+
+
+class BlockedExporter(SpanExporter):
+    """Exporter that hangs until released, like an unreachable collector"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.exported = []
+
+    def export(self, spans):
+        self.release.wait()
+        self.exported.extend(spans)
+        return SpanExportResult.SUCCESS
+
+
+def test_tail_sampling_keeps_errors_and_slow_traces():
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingProcessor(BatchExportProcessor(exporter), sample_rate=0.0, slow_threshold=0.05)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer("test")
+
+    for _ in range(5):
+        with tracer.start_as_current_span("fast"):
+            with tracer.start_as_current_span("child"):
+                pass
+    with tracer.start_as_current_span("failed"):
+        with tracer.start_as_current_span("child") as child:
+            child.set_status(Status(StatusCode.ERROR))
+    with tracer.start_as_current_span("slow"):
+        time.sleep(0.06)
+    provider.force_flush()
+
+    names = sorted(span.name for span in exporter.get_finished_spans())
+    assert names == ["child", "failed", "slow"]
+    assert processor.stats()["kept"] == 2
+    assert processor.stats()["sampled_out"] == 5
+    assert processor.stats()["pending"] == 0
+    provider.shutdown()
+
+
+def test_tail_sample_rate_keeps_a_share_of_traces():
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingProcessor(BatchExportProcessor(exporter), sample_rate=0.25, slow_threshold=60)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer("test")
+
+    for _ in range(2000):
+        with tracer.start_as_current_span("request"):
+            pass
+    provider.force_flush()
+
+    assert 400 < len(exporter.get_finished_spans()) < 600
+    provider.shutdown()
+
+
+def test_full_export_queue_drops_spans_without_blocking():
+    exporter = BlockedExporter()
+    processor = BatchExportProcessor(exporter, max_queue_size=10, max_batch_size=5, schedule_delay=0.01)
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer("test")
+
+    start = time.monotonic()
+    for _ in range(100):
+        with tracer.start_as_current_span("request"):
+            pass
+    assert time.monotonic() - start < 1
+
+    stats = processor.stats()
+    assert stats["dropped"] >= 80
+    exporter.release.set()
+    provider.shutdown()
+    assert len(exporter.exported) + processor.stats()["dropped"] == 100
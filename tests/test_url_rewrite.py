@@ -51,6 +51,15 @@ async def list_models():
     service = MockLLMService()
     return service.get_supported_models()
 
+@app.get("/models/{path:path}")
+async def echo_url(request: Request):
+    """Echo the URL as seen by the route, after any rewrite"""
+    query_params = parse_qs(urlparse(str(request.url)).query, keep_blank_values=True)
+    return {
+        "url": str(request.url),
+        "query_params": {key: values[0] if len(values) == 1 else values for key, values in query_params.items()}
+    }
+
 @app.post("/models/{provider}/{model_id}")
 async def create_chat_completion(
     request: Request,
@@ -79,6 +88,7 @@ def test_create_chat_completion():
     response = client.post(
         "/models/azure/gpt-4.1-mini",
         json={
+            "model": "azure/gpt-4.1-mini",
             "messages": [
                 {"role": "user", "content": "Hello!"}
             ]
@@ -171,4 +181,23 @@ def test_complex_url():
     assert response.status_code == 200
     data = response.json()
     assert data["url"].endswith("/models/openai/gpt-4/chat/completions/stream?session=abc&id=test&format=json")
-    assert data["query_params"] == {"session": "abc", "id": "test", "format": "json"} 
\ No newline at end of file
+    assert data["query_params"] == {"session": "abc", "id": "test", "format": "json"}
+
+def test_query_values_with_slashes_are_kept():
+    """Test that only known route suffixes are moved into the path"""
+    for url, query_params in (
+        ("/models/openai/gpt-4?client_secret=ab/cd", {"client_secret": "ab/cd"}),
+        ("/models/openai/gpt-4?redirect=https://x/y", {"redirect": "https://x/y"}),
+        ("/models/openai/gpt-4?token=YWJj/ZGVm+Zw==", {"token": "YWJj/ZGVm Zw=="}),
+        ("/models/openai?session=abc/chat/completions", {"session": "abc/chat/completions"}),
+    ):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()["query_params"] == query_params
+        assert response.json()["url"].split("?")[0].endswith(url.split("?")[0])
+
+def test_batch_suffix():
+    """Test URL with the batch route after the query parameters"""
+    response = client.get("/models/openai/gpt-4?session=abc/batch")
+    assert response.status_code == 200
+    assert response.json()["url"].endswith("/models/openai/gpt-4/batch?session=abc")